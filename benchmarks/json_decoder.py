@@ -0,0 +1,155 @@
+"""
+Compare the decoding of JSON response bodies: the former str based parsing
+(resp.text then json.loads) with the bytes based decoders of pyensemblrest.
+
+    python benchmarks/json_decoder.py
+"""
+
+import gc
+import json
+import time
+from typing import Any, Callable
+
+from requests import Response
+
+from pyensemblrest.decoders import HAS_ORJSON, orjson_decoder, stdlib_decoder
+
+
+def vep_payload(variants: int) -> list[dict[str, Any]]:
+    """A getVariantConsequencesByMultipleIds like response"""
+
+    return [
+        {
+            "id": "rs%d" % (56116432 + i),
+            "input": "rs%d" % (56116432 + i),
+            "seq_region_name": "9",
+            "start": 133256042 + i,
+            "end": 133256042 + i,
+            "strand": 1,
+            "allele_string": "C/T",
+            "assembly_name": "GRCh38",
+            "most_severe_consequence": "missense_variant",
+            "transcript_consequences": [
+                {
+                    "gene_id": "ENSG00000097007",
+                    "gene_symbol": "ABL1",
+                    "transcript_id": "ENST%011d" % (318560 + j),
+                    "consequence_terms": ["missense_variant"],
+                    "impact": "MODERATE",
+                    "biotype": "protein_coding",
+                    "amino_acids": "T/M",
+                    "codons": "aCg/aTg",
+                    "protein_start": 315,
+                    "protein_end": 315,
+                    "sift_score": 0.01,
+                    "polyphen_score": 0.998,
+                    "strand": 1,
+                    "variant_allele": "T",
+                }
+                for j in range(8)
+            ],
+        }
+        for i in range(variants)
+    ]
+
+
+def variation_payload(variants: int) -> dict[str, Any]:
+    """A getVariationByMultipleIds like response"""
+
+    return {
+        "rs%d" % (56116432 + i): {
+            "name": "rs%d" % (56116432 + i),
+            "source": "Variants (including SNPs and indels) imported from dbSNP",
+            "var_class": "SNP",
+            "most_severe_consequence": "missense_variant",
+            "MAF": 0.0002,
+            "minor_allele": "T",
+            "ambiguity": "Y",
+            "synonyms": ["COSM%d" % i, "CM%06d" % i],
+            "evidence": ["Frequency", "Cited", "ESP", "ExAC", "gnomAD"],
+            "mappings": [
+                {
+                    "location": "9:%d-%d" % (133256042 + i, 133256042 + i),
+                    "assembly_name": "GRCh38",
+                    "seq_region_name": "9",
+                    "start": 133256042 + i,
+                    "end": 133256042 + i,
+                    "strand": 1,
+                    "allele_string": "C/T",
+                    "coord_system": "chromosome",
+                    "ancestral_allele": "C",
+                }
+            ],
+        }
+        for i in range(variants)
+    }
+
+
+def response(content: bytes, encoding: str | None = "utf-8") -> Response:
+    """
+    A response as requests builds it for a JSON body. Without encoding,
+    resp.text detects the charset of the body
+    """
+
+    resp = Response()
+    resp._content = content
+    resp.status_code = 200
+    resp.headers["Content-Type"] = "application/json"
+    resp.encoding = encoding
+
+    return resp
+
+
+def best_of(func: Callable[[], Any], repeat: int = 5) -> float:
+    """The best time of repeat calls, without garbage collection as timeit"""
+
+    times = []
+    gc.disable()
+
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    finally:
+        gc.enable()
+
+    return min(times)
+
+
+def main() -> None:
+    decoders: dict[str, Callable[[bytes], Any]] = {
+        "json.loads(resp.text)": lambda content: json.loads(response(content).text),
+        "  without charset": lambda content: json.loads(response(content, None).text),
+        "stdlib_decoder(resp.content)": lambda content: stdlib_decoder(
+            response(content).content
+        ),
+    }
+
+    if HAS_ORJSON:
+        decoders["orjson_decoder(resp.content)"] = lambda content: orjson_decoder(
+            response(content).content
+        )
+
+    payloads = {
+        "VEP, 5000 variants": vep_payload(5000),
+        "variation, 20000 ids": variation_payload(20000),
+    }
+
+    for name, payload in payloads.items():
+        content = json.dumps(payload).encode()
+        print("%s (%.1f MB)" % (name, len(content) / 1e6))
+
+        baseline = None
+
+        for label, decode in decoders.items():
+            elapsed = best_of(lambda: decode(content))
+            baseline = baseline or elapsed
+            print(
+                "  %-30s %8.1f ms  x%.1f" % (label, elapsed * 1e3, baseline / elapsed)
+            )
+
+
+if __name__ == "__main__":
+    main()
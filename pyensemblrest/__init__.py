@@ -10,14 +10,18 @@ __email__ = "gawbul@gmail.com"
 __status__ = "beta"
 
 __all__ = [
+    "AsyncEnsemblRest",
     "EnsemblRest",
+    "EnsemblRestCircuitOpen",
     "EnsemblRestError",
     "EnsemblRestRateLimitError",
     "EnsemblRestServiceUnavailable",
 ]
 
+from .async_ensemblrest import AsyncEnsemblRest
 from .ensemblrest import EnsemblRest
 from .exceptions import (
+    EnsemblRestCircuitOpen,
     EnsemblRestError,
     EnsemblRestRateLimitError,
     EnsemblRestServiceUnavailable,
@@ -0,0 +1,481 @@
+import asyncio
+import inspect
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable, Iterator, cast
+
+from requests import Response
+
+# import ensemblrest modules
+from .cache import CacheEntry, ResponseCache
+from .coalesce import Coalescer
+from .ensembl_config import ensembl_api_table
+from .ensemblrest import EnsemblRequest, EnsemblRest, FakeResponse, MapResult
+from .exceptions import EnsemblRestError, EnsemblRestServiceUnavailable
+from .hedge import Hedger
+from .mirrors import Mirror
+from .ratelimit import RateLimiter
+from .streaming import ChunkWriter
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# asyncio EnsEMBL REST API object
+class AsyncEnsemblRest(EnsemblRest):
+    """
+    An asyncio flavour of EnsemblRest. Every api_table entry is exposed as a
+    coroutine with the same name and arguments as the EnsemblRest method.
+    Up to max_concurrency requests are in flight at once, sharing the
+    connection pool of a single requests session and the rate limiter.
+    """
+
+    # class initialisation function
+    def __init__(
+        self,
+        api_table: dict[str, Any] = ensembl_api_table,
+        max_concurrency: int = 15,
+        rate_limiter: RateLimiter | None = None,
+        coalescer: Coalescer | None = None,
+        cache: ResponseCache | None = None,
+        **kwargs: dict[str, Any],
+    ) -> None:
+        # size the connection pool to the number of concurrent requests
+        super(AsyncEnsemblRest, self).__init__(
+            api_table,
+            pool_maxsize=max_concurrency,
+            rate_limiter=rate_limiter,
+            coalescer=coalescer,
+            cache=cache,
+            **kwargs,
+        )
+
+        # the maximum number of requests in flight
+        self.max_concurrency = max_concurrency
+
+        # blocking socket I/O is done by these workers, never by the event loop.
+        # There is room for a hedge of each request
+        self.executor = ThreadPoolExecutor(
+            max_workers=2 * max_concurrency, thread_name_prefix="pyensemblrest"
+        )
+
+        # the items of a streamed response read at once by a worker
+        self.stream_batch: int = 100
+
+        # created on first use, inside the running event loop
+        self.__semaphore: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> "AsyncEnsemblRest":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the worker threads and the connection pool"""
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    # dynamic api registration function
+    def register_api_func(self, api_call: str, api_table: dict[str, Any]) -> Any:
+        async def api_func(**kwargs: dict[str, Any]) -> Any:
+            return await self.call_api_func(api_call, api_table, **kwargs)
+
+        return api_func
+
+    async def map(  # type: ignore[override]
+        self,
+        method_name: str,
+        iterable_of_kwargs: Iterable[dict[str, Any]],
+        max_workers: int | None = None,
+        ordered: bool = True,
+    ) -> AsyncIterator[MapResult]:
+        """
+        Call method_name once for each kwargs dictionary, with up to max_workers
+        calls (max_concurrency by default) in progress. Yield a MapResult for each
+        call, in input order or as calls finish. Errors are recorded in
+        MapResult.error instead of stopping the batch.
+        """
+
+        func = getattr(self, method_name)
+        workers = asyncio.Semaphore(max_workers or self.max_concurrency)
+
+        async def call(index: int, kwargs: dict[str, Any]) -> MapResult:
+            try:
+                async with workers:
+                    return MapResult(index, kwargs, await func(**kwargs))
+
+            except Exception as e:
+                logger.warning("%s(%s) failed: %s" % (method_name, kwargs, e))
+                return MapResult(index, kwargs, error=e)
+
+        # don't read the whole input: keep a bounded number of calls pending
+        max_pending = (max_workers or self.max_concurrency) * 2
+        pending: deque[asyncio.Task[MapResult]] = deque()
+
+        try:
+            for index, kwargs in enumerate(iterable_of_kwargs):
+                pending.append(asyncio.ensure_future(call(index, dict(kwargs))))
+
+                if len(pending) >= max_pending:
+                    for result in await self.__collect(pending, ordered):
+                        yield result
+
+            while pending:
+                for result in await self.__collect(pending, ordered):
+                    yield result
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def __collect(
+        pending: deque[asyncio.Task[MapResult]], ordered: bool
+    ) -> list[MapResult]:
+        """Wait for the oldest pending call, or for any call if not ordered"""
+
+        if ordered:
+            return [await pending.popleft()]
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        for task in done:
+            pending.remove(task)
+
+        return [task.result() for task in done]
+
+    # dynamic api call function
+    async def call_api_func(
+        self, api_call: str, api_table: dict[str, Any], **kwargs: dict[str, Any]
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+
+        # decode results in another form, as records or columns
+        output: Any = kwargs.pop("output", None)
+
+        if output is not None:
+            # before spending a request
+            self._check_output(api_call, output)
+
+            if self._stream_output(api_call, output, kwargs):
+                kwargs["stream"] = cast(Any, True)
+
+            content = self._output(
+                api_call,
+                output,
+                await self.call_api_func(api_call, api_table, **kwargs),
+            )
+
+            # columns of streamed results are built as they are read
+            if inspect.isawaitable(content):
+                return await content
+
+            return content
+
+        # streamed and raw responses are neither batched, split nor cached
+        target: Any = kwargs.pop("stream_to", None)
+
+        if target is not None or kwargs.get("stream") or kwargs.get("raw"):
+            request = self._build_request(api_call, api_table, kwargs)
+
+            if target is None:
+                return await self.__fetch(
+                    request, self._request_key(request), api_table[api_call]
+                )
+
+            # write the body to a file as it is read, from the workers
+            request = replace(request, stream=True, raw=True)
+            raw = await self.__fetch(
+                request, self._request_key(request), api_table[api_call]
+            )
+
+            with ChunkWriter(target) as writer:
+                async for chunk in cast(AsyncIterator[bytes], raw.content):
+                    await loop.run_in_executor(self.executor, writer.write, chunk)
+
+            return writer.written
+
+        # send single identifiers with those of other tasks, in a POST request,
+        # unless cached under their own request. Batches are dispatched from
+        # the coalescer thread
+        spec = self._coalesce_spec(api_call, api_table, kwargs)
+
+        if spec is not None:
+            entry = await self.__cached(
+                self._build_request(api_call, api_table, dict(kwargs))
+            )
+
+            if entry is not None and entry.fresh:
+                return entry.content
+
+            return await asyncio.wrap_future(
+                self._coalesce(
+                    api_call,
+                    api_table,
+                    spec,
+                    kwargs,
+                    lambda name, kwargs: asyncio.run_coroutine_threadsafe(
+                        self.call_api_func(name, api_table, **kwargs), loop
+                    ).result(),
+                )
+            )
+
+        # split POST requests larger than the endpoint allows
+        chunks = self._split_post(api_call, api_table, kwargs)
+
+        if chunks:
+            results = await asyncio.gather(
+                *[self.call_api_func(api_call, api_table, **chunk) for chunk in chunks]
+            )
+
+            return self._merge_chunks(list(results))
+
+        request = self._build_request(api_call, api_table, kwargs)
+        key = self._request_key(request)
+        entry = await self.__cached(request)
+
+        if entry is not None and entry.fresh:
+            return entry.content
+
+        if self.single_flight is None:
+            return await self.__fetch(request, key, api_table[api_call], entry)
+
+        # identical requests in flight share a single response
+        future, leader = self.single_flight.join(key)
+
+        if not leader:
+            logger.debug("Waiting for the call in flight: %s" % key)
+            return await asyncio.wrap_future(future)
+
+        try:
+            content = await self.__fetch(request, key, api_table[api_call], entry)
+
+        except BaseException as e:
+            self.single_flight.finish(key, future, error=e)
+            raise
+
+        self.single_flight.finish(key, future, content)
+
+        return content
+
+    async def __cached(self, request: EnsemblRequest) -> CacheEntry | None:
+        """Return the cache entry of a request in the current release, if any"""
+
+        if self.cache is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+
+        # cache reads and writes may touch a database: not in the event loop
+        if self.release_check_interval is not None:
+            await loop.run_in_executor(self.executor, self._check_release)
+
+        return await loop.run_in_executor(
+            self.executor, self._cache_get, self._request_key(request)
+        )
+
+    async def __fetch(
+        self,
+        request: EnsemblRequest,
+        key: str,
+        func: dict[str, Any],
+        entry: CacheEntry | None = None,
+    ) -> Any:
+        """
+        Send a request, retrying on known errors, then decode and cache it. An
+        expired cache entry is revalidated with a conditional request
+        """
+
+        loop = asyncio.get_running_loop()
+        request = self._conditional(request, entry)
+
+        while True:
+            request, resp = await self.__get_response(request)
+
+            self._record_response(resp)
+
+            # a streamed response retried or raised gives its connection back
+            if request.stream and resp.status_code >= 300:
+                await loop.run_in_executor(self.executor, self._release, resp)
+
+            # parse status code
+            try:
+                if not self._check_retry(resp):
+                    break
+
+            except EnsemblRestError:
+                if self.cache is not None:
+                    await loop.run_in_executor(
+                        self.executor, self._cache_error, key, func, resp
+                    )
+
+                raise
+
+            request = replace(request, attempt=request.attempt + 1)
+
+            if request.attempt > self.max_attempts:
+                raise self._retries_exhausted(resp)
+
+            if not self._spend_retry():
+                raise self._retries_exhausted(resp, "Retry budget exhausted")
+
+            # sleep a while, as the retry policy says
+            to_sleep = self._retry_delay(resp, request.attempt)
+
+            logger.debug(
+                "Retrying %s request (%s/%s) in %s: url = '%s'"
+                % (
+                    request.method,
+                    request.attempt,
+                    self.max_attempts,
+                    to_sleep,
+                    request.url,
+                )
+            )
+            await asyncio.sleep(to_sleep)
+
+        if request.raw:
+            return self._raw(
+                resp,
+                self.__iterate(self._chunks(resp)) if request.stream else resp.content,
+            )
+
+        if request.stream:
+            return self.__iterate(self._stream(resp, request.content_type))
+
+        if resp.status_code == 304 and entry is not None:
+            content = entry.content
+        else:
+            content = self._decode(resp, request.content_type)
+
+        if self.cache is not None:
+            await loop.run_in_executor(
+                self.executor, self._cache_set, key, func, content, resp, entry
+            )
+
+        return content
+
+    async def __iterate(self, items: Iterator[Any]) -> AsyncIterator[Any]:
+        """Read items in worker threads, stream_batch items at once"""
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await loop.run_in_executor(
+                self.executor, lambda: list(islice(items, self.stream_batch))
+            )
+
+            if not batch:
+                return
+
+            for item in batch:
+                yield item
+
+    # A function to get reponse from ensembl REST api
+    async def __get_response(
+        self, request: EnsemblRequest
+    ) -> tuple[EnsemblRequest, Response | FakeResponse]:
+        """Send a request in a worker thread. Return the request sent and response"""
+
+        if self.mirrors is None:
+            return request, await self.__send_with(request, self.rate_limiter)
+
+        # fail over to another mirror when one is unavailable, and retry
+        # elsewhere than the mirror of the last attempt
+        failed: list[Mirror] = []
+        error: EnsemblRestServiceUnavailable | None = None
+        avoid = self.mirrors.find(request.url) if request.attempt else None
+
+        while True:
+            mirror = self.mirrors.choose(exclude=failed, avoid=avoid)
+
+            if mirror is None:
+                raise error or EnsemblRestServiceUnavailable("No mirror available")
+
+            try:
+                sent = self._on_mirror(request, mirror)
+                return sent, await self.__send_with(sent, mirror.rate_limiter)
+
+            except EnsemblRestServiceUnavailable as e:
+                logger.warning("%s unavailable: %s" % (mirror.base_url, e))
+                failed.append(mirror)
+                error = e
+
+            finally:
+                self.mirrors.release(mirror)
+
+    async def __send_with(
+        self, request: EnsemblRequest, rate_limiter: RateLimiter
+    ) -> Response | FakeResponse:
+        """Send a request once the circuit and the rate limiter allow it"""
+
+        # fail fast if the endpoint group is failing
+        self._check_circuit(request)
+
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.__semaphore:
+            # wait for a token without blocking the event loop
+            to_sleep = rate_limiter.reserve()
+
+            if to_sleep > 0:
+                logger.debug("waiting %s" % to_sleep)
+                await asyncio.sleep(to_sleep)
+
+            if self.hedger is not None and request.method == "GET":
+                return await self.__send_hedged(request, self.hedger, rate_limiter)
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._send, request)
+
+    async def __send_hedged(
+        self, request: EnsemblRequest, hedger: Hedger, rate_limiter: RateLimiter
+    ) -> Response | FakeResponse:
+        """
+        Send a GET request, and a duplicate of it if it didn't answer within
+        the latency percentile of the hedger. Return the first response
+        """
+
+        loop = asyncio.get_running_loop()
+        delay = hedger.delay()
+        first = loop.run_in_executor(self.executor, self._send, request)
+
+        if delay is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=delay)
+
+        if done or not hedger.spend():
+            return await first
+
+        logger.debug(
+            "Hedging GET request after %.3f seconds: url = '%s'" % (delay, request.url)
+        )
+
+        # the duplicate is a request as any other
+        to_sleep = rate_limiter.reserve()
+
+        if to_sleep > 0:
+            await asyncio.sleep(to_sleep)
+
+        second = loop.run_in_executor(self.executor, self._send, request)
+
+        done, pending = await asyncio.wait(
+            {first, second}, return_when=asyncio.FIRST_COMPLETED
+        )
+
+        # prefer a response to an error
+        winner = min(done, key=lambda future: future.exception() is not None)
+
+        if winner.exception() is not None and pending:
+            return await pending.pop()
+
+        for future in pending:
+            future.add_done_callback(self._discard)
+
+        return winner.result()
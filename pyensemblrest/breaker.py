@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Hashable
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+# circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+# Circuit object
+class Circuit(object):
+    """The state and the recent outcomes of the requests sharing a key"""
+
+    def __init__(self) -> None:
+        self.state = CLOSED
+        self.outcomes: deque[tuple[float, bool]] = deque()
+
+        # when it opened, or when its probe was sent
+        self.opened = 0.0
+
+
+# CircuitBreaker object
+class CircuitBreaker(object):
+    """
+    A thread-safe circuit breaker for each key. A circuit opens when at least
+    failure_rate of the requests done in the last window seconds failed, as
+    long as there were min_requests of them. Requests of an open circuit fail
+    at once. After cooldown seconds, a single probe request is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    A probe lost for cooldown seconds is replaced by another one.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        min_requests: int = 10,
+        window: float = 60,
+        cooldown: float = 30,
+    ) -> None:
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.circuits: dict[Hashable, Circuit] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        """Return True if a request of key can be sent"""
+
+        with self.lock:
+            circuit = self.circuits.get(key)
+
+            if circuit is None or circuit.state == CLOSED:
+                return True
+
+            now = time.monotonic()
+
+            # a single probe at once
+            if now - circuit.opened < self.cooldown:
+                return False
+
+            if circuit.state == OPEN:
+                logger.info("Circuit %s half-open: probing" % (key,))
+                circuit.state = HALF_OPEN
+
+            circuit.opened = now
+            return True
+
+    def record(self, key: Hashable, success: bool) -> None:
+        """Record the outcome of a request of key"""
+
+        with self.lock:
+            circuit = self.circuits.setdefault(key, Circuit())
+            now = time.monotonic()
+
+            if circuit.state == HALF_OPEN:
+                if success:
+                    logger.info("Circuit %s closed" % (key,))
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+                else:
+                    self.__open(key, circuit, now)
+
+                return
+
+            # late responses of an open circuit
+            if circuit.state == OPEN:
+                return
+
+            circuit.outcomes.append((now, success))
+
+            while circuit.outcomes and circuit.outcomes[0][0] < now - self.window:
+                circuit.outcomes.popleft()
+
+            failures = sum(1 for _, ok in circuit.outcomes if not ok)
+
+            if len(
+                circuit.outcomes
+            ) >= self.min_requests and failures >= self.failure_rate * len(
+                circuit.outcomes
+            ):
+                self.__open(key, circuit, now)
+
+    def __open(self, key: Hashable, circuit: Circuit, now: float) -> None:
+        """Open a circuit. Call with lock held"""
+
+        logger.warning(
+            "Circuit %s open: failing requests for %s seconds" % (key, self.cooldown)
+        )
+        circuit.state = OPEN
+        circuit.opened = now
+        circuit.outcomes.clear()
+
+    def retry_in(self, key: Hashable) -> float:
+        """Return the seconds left before an open circuit is probed"""
+
+        with self.lock:
+            circuit = self.circuits.get(key)
+
+            if circuit is None or circuit.state != OPEN:
+                return 0
+
+            return max(0, self.cooldown - (time.monotonic() - circuit.opened))
+
+    @property
+    def states(self) -> dict[Hashable, str]:
+        """The state of each circuit"""
+
+        with self.lock:
+            return {key: circuit.state for key, circuit in self.circuits.items()}
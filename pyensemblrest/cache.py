@@ -0,0 +1,341 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# CacheEntry object
+@dataclass
+class CacheEntry:
+    """
+    A decoded response, the time it expires at and the release it belongs to.
+    Negative entries hold the error message of a request instead. The ETag and
+    Last-Modified headers of a response are kept to revalidate it once expired
+    """
+
+    content: Any
+    expires: float
+    namespace: str = ""
+    error: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires > time.time()
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """The headers of a conditional request for this entry"""
+
+        headers = {}
+
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+# ResponseCache object
+class ResponseCache(object):
+    """
+    Base class for response caches. Entries are decoded responses keyed by
+    request, valid for ttl seconds unless the endpoint sets its own cache_ttl.
+    Entries are stored in the current namespace, the Ensembl data release,
+    and only entries of the current namespace are returned. Expired entries
+    are kept until evicted, so that they can be revalidated.
+    """
+
+    def __init__(self, ttl: float = 3600) -> None:
+        self.ttl = ttl
+        self.namespace = ""
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str, stale: bool = False) -> CacheEntry | None:
+        """
+        Return the fresh entry of a key, if any. With stale, expired entries
+        which can be revalidated are returned too
+        """
+
+        entry = self._get(key)
+
+        with self.lock:
+            if entry is None or entry.namespace != self.namespace:
+                self.misses += 1
+                return None
+
+            if entry.fresh:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            return entry if stale and entry.validators else None
+
+    def set(
+        self,
+        key: str,
+        content: Any,
+        ttl: float | None = None,
+        error: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> CacheEntry:
+        """Store a response, or the error of a request, for ttl seconds or the cache ttl"""
+
+        entry = CacheEntry(
+            content,
+            self.__expires(ttl),
+            self.namespace,
+            error,
+            etag,
+            last_modified,
+        )
+        self._set(key, entry)
+
+        return entry
+
+    def refresh(self, key: str, entry: CacheEntry, ttl: float | None = None) -> None:
+        """Keep a revalidated entry for ttl seconds more, or the cache ttl"""
+
+        entry.expires = self.__expires(ttl)
+        self._refresh(key, entry)
+
+    def __expires(self, ttl: float | None) -> float:
+        return time.time() + (self.ttl if ttl is None else ttl)
+
+    def set_namespace(self, namespace: str) -> None:
+        """Switch to a new namespace, removing entries of any other"""
+
+        if namespace == self.namespace:
+            return
+
+        logger.info(
+            "Cache namespace changed from '%s' to '%s'" % (self.namespace, namespace)
+        )
+        self.namespace = namespace
+        self._invalidate(namespace)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Hit and miss counters"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def _get(self, key: str) -> CacheEntry | None:
+        raise NotImplementedError
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    def _refresh(self, key: str, entry: CacheEntry) -> None:
+        """Store the new expiry time of an entry"""
+        self._set(key, entry)
+
+    def _invalidate(self, namespace: str) -> None:
+        """Remove every entry not in namespace"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+# MemoryCache object
+class MemoryCache(ResponseCache):
+    """
+    A thread-safe in-memory cache holding up to maxsize entries. The least
+    recently used entries are evicted first. Decoded responses are shared by
+    every caller getting them from the cache, so don't modify them.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600) -> None:
+        super(MemoryCache, self).__init__(ttl)
+        self.maxsize = maxsize
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def _get(self, key: str) -> CacheEntry | None:
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+            return entry
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def _invalidate(self, namespace: str) -> None:
+        with self.lock:
+            self.entries = OrderedDict(
+                (key, entry)
+                for key, entry in self.entries.items()
+                if entry.namespace == namespace
+            )
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# SQLiteCache object
+class SQLiteCache(ResponseCache):
+    """
+    A persistent cache stored in a SQLite database, shared by every process
+    and every run using the same path. Responses are stored as compressed
+    JSON. The database runs in WAL mode, so readers don't block each other
+    nor the writer. When it grows over max_size bytes of compressed responses,
+    the least recently used entries are evicted.
+    """
+
+    # reading an entry refreshes its access time at most this often, in seconds
+    touch_interval = 60
+
+    # the size of the database is checked every evict_every writes
+    evict_every = 100
+
+    def __init__(self, path: str, max_size: int = 1024**3, ttl: float = 86400) -> None:
+        super(SQLiteCache, self).__init__(ttl)
+        self.path = path
+        self.max_size = max_size
+        self.writes = 0
+        self.local = threading.local()
+
+        with self.connection as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, content BLOB, expires REAL, "
+                "accessed REAL, size INTEGER, namespace TEXT, error TEXT, "
+                "etag TEXT, last_modified TEXT)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """A connection for the current thread and process"""
+
+        connection: sqlite3.Connection | None = getattr(self.local, "connection", None)
+
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+
+        return connection
+
+    def _get(self, key: str) -> CacheEntry | None:
+        row = self.connection.execute(
+            "SELECT content, expires, accessed, namespace, error, etag, "
+            "last_modified FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        content, expires, accessed, namespace, error, etag, last_modified = row
+        now = time.time()
+
+        if now - accessed > self.touch_interval:
+            with self.connection as connection:
+                connection.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+
+        return CacheEntry(
+            json.loads(zlib.decompress(content)),
+            expires,
+            namespace,
+            error,
+            etag,
+            last_modified,
+        )
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        content = zlib.compress(json.dumps(entry.content).encode())
+
+        with self.connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    content,
+                    entry.expires,
+                    time.time(),
+                    len(content),
+                    entry.namespace,
+                    entry.error,
+                    entry.etag,
+                    entry.last_modified,
+                ),
+            )
+
+        with self.lock:
+            self.writes += 1
+            evict = self.writes % self.evict_every == 0
+
+        if evict:
+            self.evict()
+
+    def _refresh(self, key: str, entry: CacheEntry) -> None:
+        # don't compress the content again
+        with self.connection as connection:
+            connection.execute(
+                "UPDATE entries SET expires = ?, accessed = ? WHERE key = ?",
+                (entry.expires, time.time(), key),
+            )
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond max_size bytes"""
+
+        with self.connection as connection:
+            deleted = connection.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM ("
+                "SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total "
+                "FROM entries) WHERE total > ?)",
+                (self.max_size,),
+            ).rowcount
+
+        if deleted:
+            logger.debug("Evicted %s entries from %s" % (deleted, self.path))
+
+    def _invalidate(self, namespace: str) -> None:
+        with self.connection as connection:
+            connection.execute("DELETE FROM entries WHERE namespace != ?", (namespace,))
+
+    def clear(self) -> None:
+        with self.connection as connection:
+            connection.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        row = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return int(row[0])
@@ -0,0 +1,180 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+# A dispatch function gets a batch of items and returns the result of each item.
+# Results which are exceptions are raised to the callers waiting for them
+Dispatch = Callable[[list[Any]], dict[Any, Any]]
+
+
+# Batch object
+class Batch(object):
+    """Items waiting to be dispatched together, with the futures of their callers"""
+
+    def __init__(self, dispatch: Dispatch, max_size: int) -> None:
+        self.dispatch = dispatch
+        self.max_size = max_size
+        self.items: dict[Any, list[Future[Any]]] = {}
+        self.timer: threading.Timer | None = None
+        self.flushed = False
+
+
+# Coalescer object
+class Coalescer(object):
+    """
+    Buffer single items submitted by concurrent callers for up to window
+    seconds, or until max_size items are waiting, then dispatch them as a
+    single batch and hand its results back to each caller's future. Items are
+    grouped by a key: only items of the same group are dispatched together.
+    """
+
+    def __init__(self, window: float = 0.01, max_size: int = 200) -> None:
+        self.window = window
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.batches: dict[Hashable, Batch] = {}
+
+    def submit(
+        self,
+        group: Hashable,
+        item: Any,
+        dispatch: Dispatch,
+        max_size: int | None = None,
+    ) -> Future[Any]:
+        """Add an item to the batch of its group. Return a future of its result"""
+
+        future: Future[Any] = Future()
+
+        with self.lock:
+            batch = self.batches.get(group)
+
+            if batch is None:
+                batch = Batch(dispatch, min(self.max_size, max_size or self.max_size))
+                self.batches[group] = batch
+                batch.timer = self.__start(self.window, group, batch)
+
+            # the same item submitted twice is dispatched once
+            batch.items.setdefault(item, []).append(future)
+
+            if len(batch.items) >= batch.max_size:
+                # the next items go to a new batch
+                del self.batches[group]
+
+                # never dispatch from the caller thread, it could be an event loop
+                batch.timer.cancel()  # type: ignore[union-attr]
+                batch.timer = self.__start(0, group, batch)
+
+        return future
+
+    def __start(self, delay: float, group: Hashable, batch: Batch) -> threading.Timer:
+        """Flush a batch after delay seconds, from another thread"""
+
+        timer = threading.Timer(delay, self.flush, args=(group, batch))
+        timer.daemon = True
+        timer.start()
+
+        return timer
+
+    def flush(self, group: Hashable, batch: Batch) -> None:
+        """Dispatch a batch and set the results of its futures"""
+
+        with self.lock:
+            # already flushed, by its window timer or once full
+            if batch.flushed:
+                return
+
+            batch.flushed = True
+
+            if self.batches.get(group) is batch:
+                del self.batches[group]
+
+        logger.debug("Dispatching %s coalesced items" % len(batch.items))
+
+        try:
+            results = batch.dispatch(list(batch.items))
+
+        except Exception as e:
+            for futures in batch.items.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for item, futures in batch.items.items():
+            result = results.get(item, KeyError(item))
+
+            for future in futures:
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+# SingleFlight object
+class SingleFlight(object):
+    """
+    Share a single call between concurrent callers of the same key. The first
+    caller makes the call, the others wait for its result or its exception.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, Future[Any]] = {}
+
+    def join(self, key: Hashable) -> tuple[Future[Any], bool]:
+        """
+        Return the future of the call in flight for key, and True if there was
+        none: the caller must then make the call and finish it
+        """
+
+        with self.lock:
+            future = self.calls.get(key)
+
+            if future is not None:
+                return future, False
+
+            future = Future()
+            self.calls[key] = future
+
+            return future, True
+
+    def finish(
+        self,
+        key: Hashable,
+        future: Future[Any],
+        result: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Hand the result of a call to its waiting callers"""
+
+        with self.lock:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def call(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Call func, unless a call of the same key is in flight. Return its result"""
+
+        future, leader = self.join(key)
+
+        if not leader:
+            logger.debug("Waiting for the call in flight: %s" % key)
+            return future.result()
+
+        try:
+            result = func()
+
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+
+        self.finish(key, future, result)
+
+        return result
@@ -0,0 +1,315 @@
+import importlib
+import math
+from array import array
+from typing import Any, AsyncIterator, Iterable, Iterator, TypeAlias
+
+# The typecode of columns whose type doesn't depend on their first value
+column_types = {
+    "start": "q",
+    "end": "q",
+    "strand": "b",
+    "r2": "f",
+    "d_prime": "f",
+    "MAF": "f",
+}
+
+# Endpoints whose results are long arrays, worth streaming into columns
+streamed_endpoints = frozenset(
+    [
+        "getLdId",
+        "getLdPairwise",
+        "getLdRegion",
+        "getOverlapById",
+        "getOverlapByRegion",
+        "getOverlapByTranslation",
+    ]
+)
+
+# Typecodes of floating point arrays
+FLOATS = "fd"
+
+
+# Categorical object
+class Categorical(object):
+    """
+    Dictionary encoded strings: the code of each value in categories, -1 for
+    missing values
+    """
+
+    __slots__ = ("codes", "categories", "index")
+
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.categories: list[str] = []
+        self.index: dict[str, int] = {}
+
+    def append(self, value: str | None) -> None:
+        if value is None:
+            self.codes.append(-1)
+            return
+
+        code = self.index.get(value)
+
+        if code is None:
+            if not isinstance(value, str):
+                raise TypeError("Categorical values are strings")
+
+            code = self.index[value] = len(self.categories)
+            self.categories.append(value)
+
+        self.codes.append(code)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, position: int) -> str | None:
+        code = self.codes[position]
+        return None if code == -1 else self.categories[code]
+
+    def __iter__(self) -> Iterator[str | None]:
+        categories = self.categories
+
+        for code in self.codes:
+            yield None if code == -1 else categories[code]
+
+
+# A column is a typed array, dictionary encoded strings, or any values
+Column: TypeAlias = "array[Any] | Categorical | list[Any]"
+
+
+# Columns object
+class Columns(object):
+    """
+    A table built row by row from JSON objects. Integers and floats go to
+    typed arrays (float64 with NaN for missing values of integer columns),
+    strings are dictionary encoded, other values are kept in lists. The
+    columns of column_types have a fixed type, as int64 start and end.
+    """
+
+    def __init__(self, types: dict[str, str] | None = None) -> None:
+        self.types = column_types if types is None else types
+        self.columns: dict[str, Column] = {}
+        self.length = 0
+
+    def append(self, row: dict[str, Any]) -> None:
+        """Add a row"""
+
+        if not isinstance(row, dict):
+            raise ValueError("Can't build columns of %s" % type(row).__name__)
+
+        columns = self.columns
+
+        for name, value in row.items():
+            column = columns.get(name)
+
+            if column is None:
+                column = columns[name] = self.__column(name, value)
+
+            # typed columns reject values of other types, but bools
+            if value.__class__ is not bool:
+                try:
+                    column.append(value)
+                    continue
+
+                except (TypeError, OverflowError):
+                    pass
+
+            columns[name] = self.__append(column, value)
+
+        self.length += 1
+
+        # fill the columns of other rows
+        if len(row) < len(columns):
+            for name, column in columns.items():
+                if len(column) < self.length:
+                    columns[name] = self.__append(column, None)
+
+    def extend(self, rows: Iterable[dict[str, Any]]) -> "Columns":
+        """Add rows. Return the table"""
+
+        for row in rows:
+            self.append(row)
+
+        return self
+
+    def __column(self, name: str, value: Any) -> Column:
+        """A new column for a value, filled with missing values"""
+
+        column: Column
+
+        if name in self.types:
+            column = array(self.types[name])
+        elif isinstance(value, bool):
+            column = []
+        elif isinstance(value, int):
+            column = array("q")
+        elif isinstance(value, float):
+            column = array("d")
+        elif isinstance(value, str):
+            column = Categorical()
+        else:
+            column = []
+
+        for _ in range(self.length):
+            column = self.__append(column, None)
+
+        return column
+
+    @staticmethod
+    def __append(column: Column, value: Any) -> Column:
+        """Append a value to a column. Return the column, changed if needed"""
+
+        if isinstance(column, list):
+            column.append(value)
+            return column
+
+        if isinstance(column, Categorical):
+            if value is None or isinstance(value, str):
+                column.append(value)
+                return column
+
+        elif column.typecode in FLOATS:
+            if value is None:
+                column.append(math.nan)
+                return column
+
+            # LD endpoints give r2 and d_prime as strings
+            if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+                try:
+                    column.append(float(value))
+                    return column
+                except (ValueError, OverflowError):
+                    pass
+
+        elif isinstance(value, bool):
+            pass
+
+        elif isinstance(value, int):
+            # int8 columns grow to int64, larger integers are kept as they are
+            if column.typecode != "q":
+                column = array("q", column)
+
+            try:
+                column.append(value)
+                return column
+            except OverflowError:
+                pass
+
+        elif value is None or isinstance(value, float):
+            # missing integers are NaN, as in pandas
+            floats = array("d", column)
+            floats.append(math.nan if value is None else value)
+            return floats
+
+        # any other value: keep values as they are
+        values = list(column)
+        values.append(value)
+        return values
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        """Yield the rows of the table as dictionaries"""
+
+        names = self.names
+        columns = [self.columns[name] for name in names]
+
+        for position in range(self.length):
+            yield {name: column[position] for name, column in zip(names, columns)}
+
+    def to_numpy(self) -> dict[str, Any]:
+        """
+        Return a NumPy array for each column, sharing the memory of typed
+        arrays, dictionary encoded strings as their codes. Needs numpy
+        """
+
+        numpy = importlib.import_module("numpy")
+        arrays = {}
+
+        for name, column in self.columns.items():
+            if isinstance(column, Categorical):
+                arrays[name] = numpy.frombuffer(column.codes, dtype=numpy.int32)
+            elif isinstance(column, list):
+                arrays[name] = _objects(numpy, column)
+            else:
+                arrays[name] = numpy.frombuffer(column, dtype=column.typecode)
+
+        return arrays
+
+    def to_pandas(self) -> Any:
+        """
+        Return a pandas DataFrame, with categorical columns for dictionary
+        encoded strings. Needs pandas
+        """
+
+        pandas = importlib.import_module("pandas")
+        numpy = importlib.import_module("numpy")
+        data = {}
+
+        for name, column in self.columns.items():
+            if isinstance(column, Categorical):
+                data[name] = pandas.Categorical.from_codes(
+                    numpy.frombuffer(column.codes, dtype=numpy.int32),
+                    categories=column.categories,
+                )
+            elif isinstance(column, list):
+                data[name] = _objects(numpy, column)
+            else:
+                data[name] = numpy.frombuffer(column, dtype=column.typecode)
+
+        return pandas.DataFrame(data, copy=False)
+
+
+def _objects(numpy: Any, values: list[Any]) -> Any:
+    """A NumPy array of objects, lists values included"""
+
+    objects = numpy.empty(len(values), dtype=object)
+
+    for position, value in enumerate(values):
+        objects[position] = value
+
+    return objects
+
+
+def to_columns(api_call: str, content: Any) -> Any:
+    """
+    Build the table of the content of an endpoint: an array or an iterator of
+    objects, the objects of multiple identifier endpoints, or a single object.
+    Asynchronous iterators give a coroutine
+    """
+
+    if isinstance(content, AsyncIterator):
+        return _acolumns(content)
+
+    if isinstance(content, dict):
+        if api_call.endswith("ByMultipleIds"):
+            content = [value for value in content.values() if value is not None]
+        else:
+            content = [content]
+
+    if not isinstance(content, (list, Iterator)):
+        raise ValueError("Can't build columns of %s" % type(content).__name__)
+
+    return Columns().extend(content)
+
+
+async def _acolumns(content: AsyncIterator[dict[str, Any]]) -> Columns:
+    """Build the table of the items of an asynchronous iterator"""
+
+    columns = Columns()
+
+    async for row in content:
+        columns.append(row)
+
+    return columns
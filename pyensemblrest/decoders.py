@@ -0,0 +1,28 @@
+import json
+from typing import Any, Callable
+
+# orjson parses JSON bytes several times faster than the standard library
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover
+    HAS_ORJSON = False
+
+# A JSON decoder gets the bytes of a response body and returns its content
+JSONDecoder = Callable[[bytes], Any]
+
+
+def stdlib_decoder(content: bytes) -> Any:
+    """Decode JSON bytes with the standard library"""
+    return json.loads(content)
+
+
+def orjson_decoder(content: bytes) -> Any:
+    """Decode JSON bytes with orjson"""
+    return orjson.loads(content)
+
+
+def default_decoder() -> JSONDecoder:
+    """Return the fastest JSON decoder installed"""
+    return orjson_decoder if HAS_ORJSON else stdlib_decoder
@@ -7,6 +7,16 @@ ensembl_default_url = "https://rest.ensembl.org"
 
 # Ensembl API lookup table
 # Specifies the functions relevant to the Ensembl REST server
+# POST endpoints with a "max_post_size" accept at most that many values of their
+# post parameter: longer lists are split in chunks of this size
+# GET endpoints with a "coalesce" entry have a POST twin "endpoint" taking a list of
+# their "parameter" as "post_parameter". The POST response is a dictionary keyed by
+# identifier, or a list of items holding the identifier in their "key" field.
+# "as_list" GET endpoints return the items of their identifier in a list, others
+# return the item, or a list if there are several. Requests with one of the
+# "uncoalesced" parameters are never coalesced
+# Endpoints with a "cache_ttl" keep their responses cached for that many seconds,
+# overriding the ttl of the response cache. A cache_ttl of 0 is never cached
 ensembl_api_table: dict[str, Any] = {
     # Archive
     "getArchiveById": {
@@ -21,6 +31,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["id"],
+        "max_post_size": 1000,
     },
     # Comparative Genomics
     "getCafeGeneTreeById": {
@@ -107,6 +118,7 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/analysis/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoAssembly": {
         "doc": """List the currently available assemblies for a species, along with toplevel sequences, """
@@ -114,12 +126,14 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/assembly/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoAssemblyRegion": {
         "doc": "Returns information about the specified toplevel sequence region for the given species.",
         "url": "/info/assembly/{{species}}/{{region_name}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoBiotypes": {
         "doc": """List the functional classifications of gene models that Ensembl associates with a particular species. """
@@ -127,6 +141,7 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/biotypes/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoBiotypesByGroup": {
         "doc": """Without argument the list of available biotype groups is returned. With :group argument provided, list the properties of biotypes within that group. """
@@ -134,6 +149,7 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/biotypes/groups/{{group}}/{{object_type}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoBiotypesByName": {
         "doc": """List the properties of biotypes with a given name. """
@@ -141,18 +157,21 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/biotypes/name/{{name}}/{{object_type}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoComparaMethods": {
         "doc": "List all compara analyses available (an analysis defines the type of comparative data).",
         "url": "/info/compara/methods",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoComparaSpeciesSets": {
         "doc": "List all collections of species analysed with the specified compara method.",
         "url": "/info/compara/species_sets/{{methods}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoComparas": {
         "doc": """Lists all available comparative genomics databases and their data release. """
@@ -160,6 +179,7 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/comparas",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoData": {
         "doc": """Shows the data releases available on this REST server. """
@@ -167,102 +187,119 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/info/data",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoEgVersion": {
         "doc": "Returns the Ensembl Genomes version of the databases backing this service",
         "url": "/info/eg_version",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoExternalDbs": {
         "doc": "Lists all available external sources for a species.",
         "url": "/info/external_dbs/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoDivisions": {
         "doc": "Get list of all Ensembl divisions for which information is available",
         "url": "/info/divisions",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoGenomesByName": {
         "doc": "Find information about a given genome",
         "url": "/info/genomes/{{name}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoGenomesByAccession": {
         "doc": "Find information about genomes containing a specified INSDC accession",
         "url": "/info/genomes/accession/{{accession}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoGenomesByAssembly": {
         "doc": "Find information about a genome with a specified assembly",
         "url": "/info/genomes/assembly/{{assembly_id}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoGenomesByDivision": {
         "doc": "Find information about all genomes in a given division. May be large for Ensembl Bacteria.",
         "url": "/info/genomes/division/{{division}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoGenomesByTaxonomy": {
         "doc": "Find information about all genomes beneath a given node of the taxonomy",
         "url": "/info/genomes/taxonomy/{{taxon_name}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoPing": {
         "doc": "Checks if the service is alive.",
         "url": "/info/ping",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 0,
     },
     "getInfoRest": {
         "doc": "Shows the current version of the Ensembl REST API.",
         "url": "/info/rest",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoSoftware": {
         "doc": "Shows the current version of the Ensembl API used by the REST server.",
         "url": "/info/software",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoSpecies": {
         "doc": "Lists all available species, their aliases, available adaptor groups and data release.",
         "url": "/info/species",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoVariationBySpecies": {
         "doc": "List the variation sources used in Ensembl for a species.",
         "url": "/info/variation/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoVariationConsequenceTypes": {
         "doc": "Lists all variant consequence types.",
         "url": "/info/variation/consequence_types",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoVariationPopulationIndividuals": {
         "doc": "List all individuals for a population from a species",
         "url": "/info/variation/populations/{{species}}/{{population_name}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     "getInfoVariationPopulations": {
         "doc": "List all populations for a species",
         "url": "/info/variation/populations/{{species}}",
         "method": "GET",
         "content_type": "application/json",
+        "cache_ttl": 86400,
     },
     # Linkage Disequilibrium
     "getLdId": {
@@ -290,6 +327,11 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/lookup/id/{{id}}",
         "method": "GET",
         "content_type": "application/json",
+        "coalesce": {
+            "endpoint": "getLookupByMultipleIds",
+            "parameter": "id",
+            "post_parameter": "ids",
+        },
     },
     "getLookupByMultipleIds": {
         "doc": """Find the species and database for several identifiers. """
@@ -298,6 +340,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["ids"],
+        "max_post_size": 1000,
     },
     "getLookupBySymbol": {
         "doc": "Find the species and database for a symbol in a linked external database",
@@ -312,6 +355,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["symbols"],
+        "max_post_size": 1000,
     },
     # Mapping
     "getMapCdnaToRegion": {
@@ -452,6 +496,13 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/sequence/id/{{id}}",
         "method": "GET",
         "content_type": "application/json",
+        "coalesce": {
+            "endpoint": "getSequenceByMultipleIds",
+            "parameter": "id",
+            "post_parameter": "ids",
+            "key": "query",
+            "uncoalesced": ["multiple_sequences"],
+        },
     },
     "getSequenceByMultipleIds": {
         "doc": "Request multiple types of sequence by a stable identifier list.",
@@ -459,6 +510,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["ids"],
+        "max_post_size": 50,
     },
     "getSequenceByRegion": {
         "doc": """Returns the genomic sequence of the specified region of the given species. """
@@ -473,6 +525,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["regions"],
+        "max_post_size": 50,
     },
     # Transcript Haplotypes
     "getTranscriptHaplotypes": {
@@ -494,12 +547,20 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["hgvs_notations"],
+        "max_post_size": 200,
     },
     "getVariantConsequencesById": {
         "doc": "Fetch variant consequences based on a variant identifier",
         "url": "/vep/{{species}}/id/{{id}}",
         "method": "GET",
         "content_type": "application/json",
+        "coalesce": {
+            "endpoint": "getVariantConsequencesByMultipleIds",
+            "parameter": "id",
+            "post_parameter": "ids",
+            "key": "input",
+            "as_list": True,
+        },
     },
     "getVariantConsequencesByMultipleIds": {
         "doc": "Fetch variant consequences for multiple ids",
@@ -507,6 +568,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["ids"],
+        "max_post_size": 200,
     },
     "getVariantConsequencesByRegion": {
         "doc": "Fetch variant consequences",
@@ -520,6 +582,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["variants"],
+        "max_post_size": 200,
     },
     # Variation
     "getVariationRecoderById": {
@@ -536,6 +599,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["ids"],
+        "max_post_size": 200,
     },
     "getVariationById": {
         "doc": """Uses a variant identifier (e.g. rsID) to return the variation features """
@@ -543,6 +607,11 @@ ensembl_api_table: dict[str, Any] = {
         "url": "/variation/{{species}}/{{id}}",
         "method": "GET",
         "content_type": "application/json",
+        "coalesce": {
+            "endpoint": "getVariationByMultipleIds",
+            "parameter": "id",
+            "post_parameter": "ids",
+        },
     },
     "getVariationByPMCID": {
         "doc": """Uses a variant identifier (e.g. rsID) to return the variation features """
@@ -565,6 +634,7 @@ ensembl_api_table: dict[str, Any] = {
         "method": "POST",
         "content_type": "application/json",
         "post_parameters": ["ids"],
+        "max_post_size": 200,
     },
     # Variation GA4GH
     "getGA4GHBeacon": {
@@ -760,6 +830,11 @@ ensembl_http_status_codes: dict[int, Any] = {
         "OK",
         "Request was a success. Only process data from the service when you receive this code",
     ),
+    304: (
+        "Not Modified",
+        "The response cached by the client is still valid. "
+        "Only sent to conditional requests, with If-None-Match or If-Modified-Since headers",
+    ),
     400: (
         "Bad Request",
         "Occurs during exceptional circumstances such as the service is unable to find an ID. "
@@ -793,12 +868,23 @@ ensembl_http_status_codes: dict[int, Any] = {
         "the REST server could have problems. Try to do the query with curl. "
         "If your data input and query are correct, contact the Ensembl team",
     ),
+    502: (
+        "Bad Gateway",
+        "A proxy in front of the service got an invalid response; retry after a pause",
+    ),
     503: (
         "Service Unavailable",
         "The service is temporarily down; retry after a pause",
     ),
+    504: (
+        "Gateway Timeout",
+        "A proxy in front of the service timed out; retry after a pause",
+    ),
 }
 
+# Name and message of status codes missing from ensembl_http_status_codes
+ensembl_unknown_status = ("Unknown", "The service returned an unexpected status code")
+
 # Set the user agent
 ensembl_user_agent = "pyEnsemblRest v" + __version__
 ensembl_header = {"User-Agent": ensembl_user_agent}
@@ -810,3 +896,13 @@ ensembl_known_errors = [
     "Something went wrong while fetching from LDFeatureContainerAdaptor",
     "%s timeout" % ensembl_user_agent,
 ]
+
+# 400 errors matching one of these patterns (ignoring case) won't change until
+# the next release, such as unknown or retired identifiers. They may be cached
+ensembl_not_found_errors = [
+    r"not found",
+    r"could not (find|fetch)",
+    r"cannot find",
+    r"no (valid )?\w+ found",
+    r"invalid",
+]
@@ -1,14 +1,34 @@
+import hashlib
 import json
 import logging
 import re
+import threading
 import time
-from typing import Any
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    cast,
+)
 
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
 from requests.structures import CaseInsensitiveDict
 
 # import ensemblrest modules
+from .breaker import CircuitBreaker
+from .cache import CacheEntry, ResponseCache
+from .coalesce import Coalescer, SingleFlight
+from .columnar import streamed_endpoints, to_columns
+from .decoders import JSONDecoder, default_decoder
 from .ensembl_config import (
     ensembl_api_table,
     ensembl_content_type,
@@ -16,13 +36,22 @@ from .ensembl_config import (
     ensembl_header,
     ensembl_http_status_codes,
     ensembl_known_errors,
+    ensembl_not_found_errors,
+    ensembl_unknown_status,
     ensembl_user_agent,
 )
 from .exceptions import (
+    EnsemblRestCircuitOpen,
     EnsemblRestError,
     EnsemblRestRateLimitError,
     EnsemblRestServiceUnavailable,
 )
+from .hedge import Hedger
+from .mirrors import Mirror, MirrorPool
+from .ratelimit import RateLimiter, get_shared_rate_limiter
+from .records import endpoint_records, to_records
+from .retry import RetryBudget, RetryPolicy
+from .streaming import ChunkWriter, iter_fasta, iter_json, iter_text
 
 # Logger instance
 logger = logging.getLogger(__name__)
@@ -40,21 +69,89 @@ class FakeResponse(object):
         self.status_code = status_code
         self.text: str = text
 
+    @property
+    def content(self) -> bytes:
+        return self.text.encode()
+
+    def iter_content(
+        self, chunk_size: int = 1, decode_unicode: bool = False
+    ) -> Iterator[bytes]:
+        content = self.content
+
+        for start in range(0, len(content), chunk_size):
+            yield content[start : start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+# EnsemblRequest object
+@dataclass(frozen=True)
+class EnsemblRequest:
+    """An immutable description of a single EnsEMBL REST request"""
+
+    method: str
+    url: str
+    content_type: str | dict[str, Any] = ensembl_content_type
+    params: dict[str, Any] = field(default_factory=dict)
+    data: dict[Any, Any] = field(default_factory=dict)
+    attempt: int = 0
+    validators: dict[str, str] = field(default_factory=dict)
+    group: str = ""
+    path: str = ""
+    stream: bool = False
+    raw: bool = False
+
+    @property
+    def headers(self) -> dict[str, Any]:
+        return {"Content-Type": self.content_type, **self.validators}
+
+
+# MapResult object
+class MapResult(NamedTuple):
+    """The outcome of a single call done by EnsemblRest.map"""
+
+    position: int
+    kwargs: dict[str, Any]
+    result: Any = None
+    error: Exception | None = None
+
+
+# RawResponse object
+class RawResponse(NamedTuple):
+    """
+    The undecoded body of a response, with its status and rate limits. The
+    body is an iterator of bytes for streamed requests
+    """
+
+    content: bytes | Iterator[bytes] | AsyncIterator[bytes]
+    status_code: int
+    content_type: str
+    rate_reset: int | None = None
+    rate_limit: int | None = None
+    rate_remaining: int | None = None
+    retry_after: float | None = None
+    rate_period: int | None = None
+
 
 # EnsEMBL REST API object
 class EnsemblRest(object):
     # class initialisation function
     def __init__(
-        self, api_table: dict[str, Any] = ensembl_api_table, **kwargs: dict[str, Any]
+        self,
+        api_table: dict[str, Any] = ensembl_api_table,
+        pool_maxsize: int = 32,
+        rate_limiter: RateLimiter | None = None,
+        coalescer: Coalescer | None = None,
+        cache: ResponseCache | None = None,
+        **kwargs: dict[str, Any],
     ) -> None:
         # read args variable into object as session_args
         self.session_args: dict[str, Any] = kwargs or {}
 
-        # In order to rate limit the requests, like https://github.com/Ensembl/ensembl-rest/wiki/Example-Python-Client
-        self.reqs_per_sec: int = 15
-        self.req_count: int = 0
-        self.last_req: float = 0
-        self.wall_time: int = 1
+        # In order to rate limit the requests, every client shares the same
+        # token bucket unless a rate limiter is provided
+        self.rate_limiter: RateLimiter = rate_limiter or get_shared_rate_limiter()
 
         # get rate limit parameters, if provided
         self.rate_reset: int | None = None
@@ -63,33 +160,137 @@ class EnsemblRest(object):
         self.rate_period: int | None = None
         self.retry_after: float | None = None
 
-        # to record the last parameters used (in order to redo the query with an ensembl known error)
-        self.last_url: str = ""
-        self.last_headers: CaseInsensitiveDict[str] | dict[str, Any] = {}
-        self.last_params: dict[str, Any] = {}
-        self.last_data: dict[Any, Any] = {}
-        self.last_method: str = ""
-        self.last_attempt: int = 0
-        self.last_response: Response | FakeResponse = Response()
+        # to record the last request and response of each thread, for debug intent
+        self.__local = threading.local()
 
         # the maximum number of attempts
         self.max_attempts: int = 5
 
+        # which failed responses are retried, and when
+        self.retry_policy = RetryPolicy()
+
+        # cap retries to a share of successful requests. Disabled if None
+        self.retry_budget: RetryBudget | None = None
+
+        # send a duplicate of slow GET requests. Disabled if None
+        self.hedger: Hedger | None = None
+        self.__hedge_executor: ThreadPoolExecutor | None = None
+        self.__hedge_workers = 2 * pool_maxsize
+        self.__hedge_lock = threading.Lock()
+
+        # stop sending requests to failing endpoint groups. Disabled if None
+        self.circuit_breaker: CircuitBreaker | None = None
+
         # setting a timeout
         self.timeout: int = 60
 
+        # the number of chunks of a large POST request sent at once
+        self.chunk_workers: int = 4
+
+        # parse JSON response bodies, with orjson if it is installed
+        self.json_decoder: JSONDecoder = default_decoder()
+
+        # the bytes read at once from streamed responses
+        self.stream_chunk_size: int = 64 * 1024
+
+        # batch single identifier requests of concurrent callers, if provided
+        self.coalescer = coalescer
+
+        # cache decoded responses, if provided
+        self.cache = cache
+
+        # concurrent identical requests share one response. Disabled if None
+        self.single_flight: SingleFlight | None = SingleFlight()
+
+        # cache "not found" errors for that many seconds. Disabled if None
+        self.negative_cache_ttl: float | None = None
+
+        # check the Ensembl data release every release_check_interval seconds,
+        # dropping cached responses of other releases. Disabled if None
+        self.release_check_interval: float | None = None
+        self.__release_checked = float("-inf")
+        self.__release_lock = threading.Lock()
+
+        # equivalent servers, if base_url is a list of them
+        self.mirrors: MirrorPool | None = None
+
         # set default values if those values are not provided
         self.__set_default()
 
-        # setup requests session
+        # setup requests session. Threads share its connection pool
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         # update headers
         self.__update_headers()
 
         # add class methods relying api_table
+        self.api_table = api_table
         self.__add_methods(api_table)
 
+    @property
+    def reqs_per_sec(self) -> float:
+        """The rate of requests allowed by the rate limiter"""
+        return self.rate_limiter.rate
+
+    @reqs_per_sec.setter
+    def reqs_per_sec(self, rate: float) -> None:
+        self.rate_limiter.rate = rate
+
+    @property
+    def last_request(self) -> EnsemblRequest:
+        """The last request sent by the current thread"""
+        request: EnsemblRequest = getattr(
+            self.__local, "request", EnsemblRequest("", "")
+        )
+        return request
+
+    @last_request.setter
+    def last_request(self, request: EnsemblRequest) -> None:
+        self.__local.request = request
+
+    @property
+    def last_response(self) -> Response | FakeResponse:
+        """The last response received by the current thread"""
+        response: Response | FakeResponse = getattr(
+            self.__local, "response", Response()
+        )
+        return response
+
+    @last_response.setter
+    def last_response(self, response: Response | FakeResponse) -> None:
+        self.__local.response = response
+
+    @property
+    def last_url(self) -> str:
+        return self.last_request.url
+
+    @property
+    def last_headers(self) -> dict[str, Any]:
+        return self.last_request.headers
+
+    @property
+    def last_params(self) -> dict[str, Any]:
+        return self.last_request.params
+
+    @property
+    def last_data(self) -> dict[Any, Any]:
+        return self.last_request.data
+
+    @property
+    def last_method(self) -> str:
+        return self.last_request.method
+
+    @property
+    def last_attempt(self) -> int:
+        return self.last_request.attempt
+
+    @last_attempt.setter
+    def last_attempt(self, attempt: int) -> None:
+        self.last_request = replace(self.last_request, attempt=attempt)
+
     def __set_default(self) -> None:
         """Set default values"""
 
@@ -102,6 +303,14 @@ class EnsemblRest(object):
         if "base_url" not in self.session_args:
             self.session_args["base_url"] = default_base_url
 
+        # send requests to several mirrors
+        if isinstance(self.session_args["base_url"], (list, tuple, MirrorPool)):
+            mirrors = self.session_args["base_url"]
+            self.mirrors = (
+                mirrors if isinstance(mirrors, MirrorPool) else MirrorPool(mirrors)
+            )
+            self.session_args["base_url"] = self.mirrors.mirrors[0].base_url
+
         if "headers" not in self.session_args:
             self.session_args["headers"] = default_headers
 
@@ -147,6 +356,66 @@ class EnsemblRest(object):
     def register_api_func(self, api_call: str, api_table: dict[str, Any]) -> Any:
         return lambda **kwargs: self.call_api_func(api_call, api_table, **kwargs)
 
+    def map(
+        self,
+        method_name: str,
+        iterable_of_kwargs: Iterable[dict[str, Any]],
+        max_workers: int = 8,
+        ordered: bool = True,
+    ) -> Iterator[MapResult]:
+        """
+        Call method_name once for each kwargs dictionary, using up to max_workers
+        threads under the rate limit of this client. Yield a MapResult for each
+        call, in input order or as calls finish. Errors are recorded in
+        MapResult.error instead of stopping the batch.
+        """
+
+        func = getattr(self, method_name)
+
+        def call(index: int, kwargs: dict[str, Any]) -> MapResult:
+            try:
+                return MapResult(index, kwargs, func(**kwargs))
+
+            except Exception as e:
+                logger.warning("%s(%s) failed: %s" % (method_name, kwargs, e))
+                return MapResult(index, kwargs, error=e)
+
+        # don't read the whole input: keep a bounded number of calls pending
+        max_pending = max_workers * 2
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pyensemblrest"
+        )
+        pending: deque[Future[MapResult]] = deque()
+
+        try:
+            for index, kwargs in enumerate(iterable_of_kwargs):
+                pending.append(executor.submit(call, index, dict(kwargs)))
+
+                if len(pending) >= max_pending:
+                    yield from self.__collect(pending, ordered)
+
+            while pending:
+                yield from self.__collect(pending, ordered)
+
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def __collect(
+        pending: deque[Future[MapResult]], ordered: bool
+    ) -> Iterator[MapResult]:
+        """Wait for the oldest pending call, or for any call if not ordered"""
+
+        if ordered:
+            yield pending.popleft().result()
+            return
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
     @staticmethod
     def __check_params(func: Any, kwargs: Any) -> list[Any]:
         """Check for mandatory parameters"""
@@ -166,10 +435,12 @@ class EnsemblRest(object):
 
         return mandatory_params
 
-    # dynamic api call function
-    def call_api_func(
-        self, api_call: str, api_table: dict[str, Any], **kwargs: dict[str, Any]
-    ) -> Any:
+    # build a request object relying on api_table
+    def _build_request(
+        self, api_call: str, api_table: dict[str, Any], kwargs: dict[str, Any]
+    ) -> EnsemblRequest:
+        """Resolve an api_table entry and its arguments into an EnsemblRequest"""
+
         # build url from api_table kwargs
         func = api_table[api_call]
 
@@ -177,15 +448,19 @@ class EnsemblRest(object):
         mandatory_params = self.__check_params(func, kwargs)
 
         # resolving urls
-        url = re.sub(
+        path = re.sub(
             r"\{\{(?P<m>[a-zA-Z1-9_]+)\}\}",
             lambda m: "%s" % kwargs.get(m.group(1)),
-            self.session.base_url + func["url"],  # type: ignore[attr-defined]
+            func["url"],
         )
+        url = self.session.base_url + path  # type: ignore[attr-defined]
 
         # debug
         logger.debug("Resolved url: '%s'" % url)
 
+        # the endpoint group, as "vep" for "/vep/{{species}}/hgvs/{{hgvs_notation}}"
+        group = func["url"].strip("/").split("/")[0]
+
         # Now I have to remove mandatory params from kwargs
         for param in mandatory_params:
             del kwargs[param]
@@ -202,6 +477,10 @@ class EnsemblRest(object):
             content_type = kwargs["content_type"]
             del kwargs["content_type"]
 
+        # read the response as it comes, and leave it undecoded
+        stream = bool(kwargs.pop("stream", False))
+        raw = bool(kwargs.pop("raw", False))
+
         # check the request type (GET or POST?)
         if func["method"] == "GET":
             logger.debug(
@@ -209,15 +488,16 @@ class EnsemblRest(object):
                 % (url, {"Content-Type": content_type}, kwargs)
             )
 
-            # record this request
-            self.last_url = url
-            self.last_headers = {"Content-Type": content_type}
-            self.last_params = kwargs
-            self.last_data = {}
-            self.last_method = "GET"
-            self.last_attempt = 0
-
-            resp = self.__get_response()
+            return EnsemblRequest(
+                "GET",
+                url,
+                content_type,
+                params=kwargs,
+                group=group,
+                path=path,
+                stream=stream,
+                raw=raw,
+            )
 
         elif func["method"] == "POST":
             # in a POST request, separate post parameters from other parameters
@@ -234,78 +514,680 @@ class EnsemblRest(object):
                 % (url, {"Content-Type": content_type}, kwargs, data)
             )
 
-            # record this request
-            self.last_url = url
-            self.last_headers = {"Content-Type": content_type}
-            self.last_params = kwargs
-            self.last_data = data
-            self.last_method = "POST"
-            self.last_attempt = 0
-
-            resp = self.__get_response()
+            return EnsemblRequest(
+                "POST",
+                url,
+                content_type,
+                params=kwargs,
+                data=data,
+                group=group,
+                path=path,
+                stream=stream,
+                raw=raw,
+            )
 
         else:
             raise NotImplementedError(
                 "Method '%s' not yet implemented" % (func["method"])
             )
 
+    # dynamic api call function
+    def call_api_func(
+        self, api_call: str, api_table: dict[str, Any], **kwargs: dict[str, Any]
+    ) -> Any:
+        # decode results in another form, as records or columns
+        output: Any = kwargs.pop("output", None)
+
+        if output is not None:
+            # before spending a request
+            self._check_output(api_call, output)
+
+            if self._stream_output(api_call, output, kwargs):
+                kwargs["stream"] = cast(Any, True)
+
+            return self._output(
+                api_call, output, self.call_api_func(api_call, api_table, **kwargs)
+            )
+
+        # streamed and raw responses are neither batched, split nor cached
+        target: Any = kwargs.pop("stream_to", None)
+
+        if target is not None or kwargs.get("stream") or kwargs.get("raw"):
+            request = self._build_request(api_call, api_table, kwargs)
+
+            if target is None:
+                return self.__fetch(
+                    request, self._request_key(request), api_table[api_call]
+                )
+
+            # write the body to a file as it is read
+            request = replace(request, stream=True, raw=True)
+            raw = self.__fetch(request, self._request_key(request), api_table[api_call])
+
+            with ChunkWriter(target) as writer:
+                for chunk in cast(Iterator[bytes], raw.content):
+                    writer.write(chunk)
+
+            return writer.written
+
+        # send single identifiers with those of other callers, in a POST
+        # request, unless cached under their own request
+        spec = self._coalesce_spec(api_call, api_table, kwargs)
+
+        if spec is not None:
+            self._check_release()
+            request = self._build_request(api_call, api_table, dict(kwargs))
+            entry = self._cache_get(self._request_key(request))
+
+            if entry is not None and entry.fresh:
+                return entry.content
+
+            return self._coalesce(
+                api_call,
+                api_table,
+                spec,
+                kwargs,
+                lambda name, kwargs: self.call_api_func(name, api_table, **kwargs),
+            ).result()
+
+        # split POST requests larger than the endpoint allows
+        chunks = self._split_post(api_call, api_table, kwargs)
+
+        if chunks:
+            with ThreadPoolExecutor(
+                max_workers=min(len(chunks), self.chunk_workers),
+                thread_name_prefix="pyensemblrest",
+            ) as executor:
+                results = list(
+                    executor.map(
+                        lambda chunk: self.call_api_func(api_call, api_table, **chunk),
+                        chunks,
+                    )
+                )
+
+            return self._merge_chunks(results)
+
+        request = self._build_request(api_call, api_table, kwargs)
+
+        # look for a cached response of the current release
+        self._check_release()
+        key = self._request_key(request)
+        entry = self._cache_get(key)
+
+        if entry is not None and entry.fresh:
+            return entry.content
+
+        # identical requests in flight share a single response
+        if self.single_flight is not None:
+            return self.single_flight.call(
+                key, lambda: self.__fetch(request, key, api_table[api_call], entry)
+            )
+
+        return self.__fetch(request, key, api_table[api_call], entry)
+
+    def _stream_output(
+        self, api_call: str, output: str, kwargs: dict[str, Any]
+    ) -> bool:
+        """
+        Whether to stream a response by default: columns of overlap and LD
+        arrays are built as they are parsed, unless responses may be cached or
+        coalesced, which streamed ones can't
+        """
+
+        return (
+            output == "columns"
+            and api_call in streamed_endpoints
+            and "stream" not in kwargs
+            and "raw" not in kwargs
+            and self.cache is None
+            and self.coalescer is None
+        )
+
+    @staticmethod
+    def _check_output(api_call: str, output: str) -> None:
+        """Raise ValueError if an endpoint can't give an output form"""
+
+        if output not in ("records", "columns"):
+            raise ValueError("Unknown output '%s'" % output)
+
+        if output == "records" and api_call not in endpoint_records:
+            raise ValueError("No records for %s results" % api_call)
+
+    @staticmethod
+    def _output(api_call: str, output: str, content: Any) -> Any:
+        """Convert the content of an endpoint to an output form"""
+
+        if output == "records":
+            return to_records(api_call, content)
+
+        if output == "columns":
+            return to_columns(api_call, content)
+
+        raise ValueError("Unknown output '%s'" % output)
+
+    def __fetch(
+        self,
+        request: EnsemblRequest,
+        key: str,
+        func: dict[str, Any],
+        entry: CacheEntry | None = None,
+    ) -> Any:
+        """
+        Send a request, then parse and cache its response. An expired cache
+        entry is revalidated with a conditional request
+        """
+
+        request = self._conditional(request, entry)
+        resp = self.__get_response(request)
+
         # call response and return content
-        return self.parseResponse(resp, content_type)
+        try:
+            content = self.parseResponse(resp, request.content_type, request, entry)
+
+        except EnsemblRestError:
+            self._cache_error(key, func, self.last_response)
+            raise
+
+        if request.stream or request.raw:
+            return content
+
+        self._cache_set(key, func, content, self.last_response, entry)
+
+        return content
+
+    def _check_release(self) -> None:
+        """
+        Switch the cache namespace to the current Ensembl data release, if it
+        hasn't been checked for release_check_interval seconds
+        """
+
+        if self.cache is None or self.release_check_interval is None:
+            return
+
+        with self.__release_lock:
+            now = time.monotonic()
+
+            if now - self.__release_checked < self.release_check_interval:
+                return
+
+            self.__release_checked = now
+
+            # never from the cache
+            func = self.api_table.get("getInfoData", ensembl_api_table["getInfoData"])
+            request = self._build_request("getInfoData", {"getInfoData": func}, {})
+
+            try:
+                resp = self.__get_response(request)
+                content = self.parseResponse(resp, request.content_type, request)
+
+            except EnsemblRestError as e:
+                logger.warning("Can't check the Ensembl data release: %s" % e)
+                return
+
+            releases = content.get("releases", []) if isinstance(content, dict) else []
+            self.cache.set_namespace(",".join(str(release) for release in releases))
+
+    @staticmethod
+    def _request_key(request: EnsemblRequest) -> str:
+        """Identify a request by its url, sorted params, POST data and content type"""
+
+        description = json.dumps(
+            [
+                request.method,
+                request.url,
+                request.params,
+                request.data,
+                request.content_type,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> CacheEntry | None:
+        """
+        Return the cache entry of a request, if any: a fresh one, or an expired
+        one to revalidate. Raise cached errors
+        """
+
+        if self.cache is None:
+            return None
+
+        entry = self.cache.get(key, stale=True)
+
+        if entry is not None and entry.fresh:
+            logger.debug("Cache hit: %s" % key)
+
+            if entry.error is not None:
+                raise EnsemblRestError(entry.error, error_code=400)
+
+        return entry
+
+    def _cache_set(
+        self,
+        key: str,
+        func: dict[str, Any],
+        content: Any,
+        resp: Response | FakeResponse | None = None,
+        entry: CacheEntry | None = None,
+    ) -> None:
+        """
+        Cache a decoded response with its validators, if any, for the cache_ttl
+        of its endpoint if set. A 304 response refreshes the revalidated entry
+        """
+
+        if self.cache is None:
+            return
+
+        ttl = func.get("cache_ttl")
+
+        if ttl == 0:
+            return
+
+        if resp is None:
+            self.cache.set(key, content, ttl)
+            return
+
+        if resp.status_code == 304 and entry is not None:
+            logger.debug("Cache entry revalidated: %s" % key)
+            self.cache.refresh(key, entry, ttl)
+            return
+
+        self.cache.set(
+            key,
+            content,
+            ttl,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+
+    @staticmethod
+    def _conditional(
+        request: EnsemblRequest, entry: CacheEntry | None
+    ) -> EnsemblRequest:
+        """Make a GET request conditional on the validators of an expired entry"""
+
+        if entry is None or request.method != "GET" or not entry.validators:
+            return request
+
+        return replace(request, validators=entry.validators)
+
+    def _cache_error(
+        self, key: str, func: dict[str, Any], resp: Response | FakeResponse
+    ) -> None:
+        """
+        Cache the error of a request for negative_cache_ttl seconds, if the
+        response is a 400 which won't change until the next release
+        """
+
+        if (
+            self.cache is None
+            or self.negative_cache_ttl is None
+            or resp.status_code != 400
+        ):
+            return
+
+        try:
+            message = json.loads(resp.text).get("error")
+
+        except (ValueError, AttributeError):
+            return
+
+        if isinstance(message, str):
+            self._cache_not_found(key, func, message)
+
+    def _cache_not_found(self, key: str, func: dict[str, Any], message: str) -> None:
+        """Cache a 400 error message, if it says something wasn't found"""
+
+        if (
+            self.cache is None
+            or self.negative_cache_ttl is None
+            or func.get("cache_ttl") == 0
+            or message in ensembl_known_errors
+        ):
+            return
+
+        if any(
+            re.search(pattern, message, re.IGNORECASE)
+            for pattern in ensembl_not_found_errors
+        ):
+            logger.debug("Caching error '%s': %s" % (message, key))
+            self.cache.set(key, None, self.negative_cache_ttl, error=message)
+
+    def _coalesce_spec(
+        self, api_call: str, api_table: dict[str, Any], kwargs: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        """The coalesce entry of a request which can be sent in a batch, or None"""
+
+        spec: dict[str, Any] | None = api_table[api_call].get("coalesce")
+
+        if (
+            self.coalescer is None
+            or spec is None
+            or spec["parameter"] not in kwargs
+            or "content_type" in kwargs
+            or any(name in kwargs for name in spec.get("uncoalesced", []))
+        ):
+            return None
+
+        return spec
+
+    def _coalesce(
+        self,
+        api_call: str,
+        api_table: dict[str, Any],
+        spec: dict[str, Any],
+        kwargs: dict[str, Any],
+        send: Callable[[str, dict[str, Any]], Any],
+    ) -> Future[Any]:
+        """
+        Submit a single identifier request to the coalescer. Return a future of
+        its result. Results are cached under the request of each identifier
+        """
+
+        coalescer = cast(Coalescer, self.coalescer)
+        func = api_table[api_call]
+        kwargs = dict(kwargs)
+        item = kwargs.pop(spec["parameter"])
+
+        # only requests with the same other parameters are sent together
+        group = (spec["endpoint"], json.dumps(kwargs, sort_keys=True, default=str))
+
+        def dispatch(items: list[Any]) -> dict[Any, Any]:
+            response = send(
+                spec["endpoint"], dict(kwargs, **{spec["post_parameter"]: items})
+            )
+            results = self._fan_out(spec, items, response)
+
+            if self.cache is not None:
+                for item, result in results.items():
+                    request = self._build_request(
+                        api_call, api_table, dict(kwargs, **{spec["parameter"]: item})
+                    )
+                    key = self._request_key(request)
+
+                    if isinstance(result, Exception):
+                        self._cache_not_found(key, func, self._not_found(item))
+                    else:
+                        self._cache_set(key, func, result)
+
+            return results
+
+        return coalescer.submit(
+            group,
+            item,
+            dispatch,
+            max_size=api_table[spec["endpoint"]].get("max_post_size"),
+        )
+
+    @staticmethod
+    def _not_found(item: Any) -> str:
+        """The error of an identifier missing from a batch response"""
+        return "ID '%s' not found" % item
+
+    @staticmethod
+    def _fan_out(
+        spec: dict[str, Any], items: list[Any], response: Any
+    ) -> dict[Any, Any]:
+        """Find the result of each identifier in the response to a batch request"""
+
+        found: dict[Any, list[Any]] = {}
+
+        if "key" in spec:
+            # an identifier may have several items
+            for result in response:
+                if isinstance(result, dict):
+                    found.setdefault(result.get(spec["key"]), []).append(result)
+        else:
+            for key, result in response.items():
+                if result is not None:
+                    found[key] = [result]
+
+        results: dict[Any, Any] = {}
+
+        for item in items:
+            result = found.get(item)
+
+            if result is None:
+                # as the GET endpoint would do
+                results[item] = EnsemblRestError(
+                    EnsemblRest._not_found(item), error_code=400
+                )
+            elif spec.get("as_list") or len(result) > 1:
+                results[item] = result
+            else:
+                results[item] = result[0]
+
+        return results
+
+    @staticmethod
+    def _split_post(
+        api_call: str, api_table: dict[str, Any], kwargs: dict[str, Any]
+    ) -> list[dict[str, Any]]:
+        """Split the post parameter into chunks of max_post_size values"""
+
+        func = api_table[api_call]
+
+        if "max_post_size" not in func:
+            return []
+
+        size = func["max_post_size"]
+        key = func["post_parameters"][0]
+        values = kwargs.get(key)
+
+        if not isinstance(values, list) or len(values) <= size:
+            return []
+
+        logger.debug("Splitting %s %s in chunks of %s" % (len(values), key, size))
+
+        return [
+            dict(kwargs, **{key: values[i : i + size]})
+            for i in range(0, len(values), size)
+        ]
+
+    @staticmethod
+    def _merge_chunks(results: list[Any]) -> Any:
+        """Merge the responses to each chunk of a POST request"""
+
+        if all(isinstance(result, dict) for result in results):
+            merged: dict[Any, Any] = {}
+            for result in results:
+                merged.update(result)
+            return merged
+
+        if all(isinstance(result, list) for result in results):
+            return [item for result in results for item in result]
+
+        if all(isinstance(result, str) for result in results):
+            return "".join(results)
+
+        return results
 
     # A function to get reponse from ensembl REST api
-    def __get_response(self) -> Response | FakeResponse:
+    def __get_response(self, request: EnsemblRequest) -> Response | FakeResponse:
         """Call session get and post method. Return response"""
 
-        # updating last_req time
-        self.last_req = time.time()
+        if self.mirrors is None:
+            return self.__send_with(request, self.rate_limiter)
+
+        # fail over to another mirror when one is unavailable, and retry
+        # elsewhere than the mirror of the last attempt
+        failed: list[Mirror] = []
+        error: EnsemblRestServiceUnavailable | None = None
+        avoid = self.mirrors.find(self.last_request.url) if request.attempt else None
+
+        while True:
+            mirror = self.mirrors.choose(exclude=failed, avoid=avoid)
+
+            if mirror is None:
+                raise error or EnsemblRestServiceUnavailable("No mirror available")
+
+            try:
+                return self.__send_with(
+                    self._on_mirror(request, mirror), mirror.rate_limiter
+                )
+
+            except EnsemblRestServiceUnavailable as e:
+                logger.warning("%s unavailable: %s" % (mirror.base_url, e))
+                failed.append(mirror)
+                error = e
+
+            finally:
+                self.mirrors.release(mirror)
+
+    def __send_with(
+        self, request: EnsemblRequest, rate_limiter: RateLimiter
+    ) -> Response | FakeResponse:
+        """Send a request once the circuit and the rate limiter allow it"""
+
+        # record this request
+        self.last_request = request
+
+        # fail fast if the endpoint group is failing
+        self._check_circuit(request)
+
+        # wait for a token (according to EnsEMBL rest specification)
+        rate_limiter.acquire()
 
-        # Increment the request counter to rate limit requests
-        self.req_count += 1
+        if self.hedger is not None and request.method == "GET":
+            return self.__send_hedged(request, self.hedger, rate_limiter)
 
-        # Evaluating the numer of request in a second (according to EnsEMBL rest specification)
-        if self.req_count >= self.reqs_per_sec:
-            delta = time.time() - self.last_req
+        return self._send(request)
 
-            # sleep upto wall_time
-            if delta < self.wall_time:
-                to_sleep = self.wall_time - delta
-                logger.debug("waiting %s" % to_sleep)
-                time.sleep(to_sleep)
+    @staticmethod
+    def _on_mirror(request: EnsemblRequest, mirror: Mirror) -> EnsemblRequest:
+        """Address a request to a mirror"""
+        return replace(request, url=mirror.base_url + request.path)
+
+    def check_mirrors(self) -> dict[str, bool]:
+        """Ping every mirror, taking down those not answering. Return their state"""
+
+        if self.mirrors is None:
+            return {}
+
+        func = self.api_table.get("getInfoPing", ensembl_api_table["getInfoPing"])
+        request = self._build_request("getInfoPing", {"getInfoPing": func}, {})
+        states = {}
+
+        for mirror in self.mirrors.mirrors:
+            try:
+                resp = self._send(self._on_mirror(request, mirror))
+                states[mirror.base_url] = resp.status_code == 200
+
+            except EnsemblRestError:
+                states[mirror.base_url] = False
+
+            if not states[mirror.base_url]:
+                self.mirrors.take_down(mirror)
+
+        return states
+
+    def __hedge_pool(self) -> ThreadPoolExecutor:
+        """The threads sending hedged requests, started by the first one"""
+
+        with self.__hedge_lock:
+            if self.__hedge_executor is None:
+                self.__hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.__hedge_workers,
+                    thread_name_prefix="pyensemblrest-hedge",
+                )
+
+            return self.__hedge_executor
+
+    def __send_hedged(
+        self, request: EnsemblRequest, hedger: Hedger, rate_limiter: RateLimiter
+    ) -> Response | FakeResponse:
+        """
+        Send a GET request, and a duplicate of it if it didn't answer within
+        the latency percentile of the hedger. Return the first response
+        """
+
+        delay = hedger.delay()
+
+        if delay is None:
+            return self._send(request)
+
+        executor = self.__hedge_pool()
+        first = executor.submit(self._send, request)
+        done, _ = wait([first], timeout=delay)
+
+        if done or not hedger.spend():
+            return first.result()
+
+        logger.debug(
+            "Hedging GET request after %.3f seconds: url = '%s'" % (delay, request.url)
+        )
+
+        # the duplicate is a request as any other
+        rate_limiter.acquire()
+        second = executor.submit(self._send, request)
+
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+
+        # prefer a response to an error
+        winner = min(done, key=lambda future: future.exception() is not None)
+
+        if winner.exception() is not None and pending:
+            return pending.pop().result()
+
+        for future in pending:
+            future.add_done_callback(self._discard)
+
+        return winner.result()
+
+    @staticmethod
+    def _discard(future: Any) -> None:
+        """Close the response of a request which lost a race, freeing its connection"""
+
+        if future.cancelled() or future.exception() is not None:
+            return
 
-            self.req_count = 0
+        close = getattr(future.result(), "close", None)
+
+        if close is not None:
+            close()
+
+    def _send(self, request: EnsemblRequest) -> Response | FakeResponse:
+        """Send a request through the session. Return response"""
 
         # my response
         resp: Response | FakeResponse = Response()
+        start = time.monotonic()
 
         # deal with exceptions
         try:
             # another request using the correct method
-            if self.last_method == "GET":
+            if request.method == "GET":
                 resp = self.session.get(
-                    self.last_url,
-                    headers=self.last_headers,
-                    params=self.last_params,
+                    request.url,
+                    headers=request.headers,
+                    params=request.params,
                     timeout=self.timeout,
+                    stream=request.stream,
                 )
-            elif self.last_method == "POST":
+            elif request.method == "POST":
                 # post parameters are load as POST data, other parameters are url parameters as GET requests
                 resp = self.session.post(
-                    self.last_url,
-                    headers=self.last_headers,
-                    data=json.dumps(self.last_data),
-                    params=self.last_params,
+                    request.url,
+                    headers=request.headers,
+                    data=json.dumps(request.data),
+                    params=request.params,
                     timeout=self.timeout,
+                    stream=request.stream,
                 )
             # other methods are verifiedby others functions
 
         except requests.ConnectionError as e:
+            self._record_outcome(request, False, time.monotonic() - start)
             raise EnsemblRestServiceUnavailable(e)
 
         except requests.Timeout as e:
-            logger.error("%s request timeout: %s" % (self.last_method, e))
+            logger.error("%s request timeout: %s" % (request.method, e))
+            self._record_outcome(request, False, time.monotonic() - start)
 
             # create a fake response in order to redo the query
-            resp = FakeResponse(
+            return FakeResponse(
                 headers=self.last_response.headers,
                 status_code=400,
                 text=json.dumps(
@@ -313,22 +1195,132 @@ class EnsemblRest(object):
                 ),
             )
 
+        # server errors count as failures, client errors don't
+        self._record_outcome(
+            request, resp.status_code < 500, time.monotonic() - start, resp
+        )
+
         # return response
         return resp
 
+    @staticmethod
+    def _circuit_key(request: EnsemblRequest) -> str:
+        """The circuit of a request: its endpoint group on its server"""
+
+        url = urllib.parse.urlsplit(request.url)
+        return "%s://%s/%s" % (url.scheme, url.netloc, request.group)
+
+    def _check_circuit(self, request: EnsemblRequest) -> None:
+        """Raise EnsemblRestCircuitOpen if the circuit of a request is open"""
+
+        if self.circuit_breaker is None:
+            return
+
+        key = self._circuit_key(request)
+
+        if not self.circuit_breaker.allow(key):
+            raise EnsemblRestCircuitOpen(
+                "Too many failed requests to %s: retry in %.0f seconds"
+                % (key, self.circuit_breaker.retry_in(key))
+            )
+
+    def _record_outcome(
+        self,
+        request: EnsemblRequest,
+        success: bool,
+        latency: float,
+        resp: Response | FakeResponse | None = None,
+    ) -> None:
+        """Pass the outcome of a request to the circuit breaker, hedger and mirrors"""
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(self._circuit_key(request), success)
+
+        # GET latencies decide when to hedge
+        if self.hedger is not None and request.method == "GET" and resp is not None:
+            self.hedger.record(latency)
+
+        if self.mirrors is None:
+            return
+
+        mirror = self.mirrors.find(request.url)
+
+        if mirror is None:
+            return
+
+        self.mirrors.record(mirror, success, latency)
+
+        # each mirror has its own rate limits
+        if resp is not None:
+            rate_reset, rate_limit, rate_remaining, retry_after, _ = (
+                self._get_rate_limit(resp.headers)
+            )
+            mirror.rate_limiter.update(
+                rate_reset=rate_reset,
+                rate_limit=rate_limit,
+                rate_remaining=rate_remaining,
+                retry_after=retry_after,
+            )
+
     # A function to deal with a generic response
     def parseResponse(
         self,
         resp: Response | FakeResponse,
         content_type: str | dict[str, Any] = "application/json",
+        request: EnsemblRequest | None = None,
+        entry: CacheEntry | None = None,
     ) -> Any:
-        """Deal with a generic REST response"""
+        """
+        Deal with a generic REST response. Retry request on known errors. A 304
+        response returns the content of the cache entry it revalidated, a
+        streamed response an iterator over its content, and a raw request a
+        RawResponse
+        """
+
+        streamed = request is not None and request.stream
+
+        # don't format whole bodies for nothing, nor read streamed ones
+        if not streamed and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Got %s" % resp.text)
+
+        self._record_response(resp)
+
+        # a streamed response retried or raised gives its connection back
+        if streamed and resp.status_code >= 300:
+            self._release(resp)
 
-        logger.debug("Got %s" % resp.text)
+        # parse status code
+        if self._check_retry(resp):
+            return self.__retry_request(request or self.last_request, entry)
+
+        if resp.status_code == 304 and entry is not None:
+            return entry.content
+
+        if request is not None and request.raw:
+            return self._raw(resp, self._chunks(resp) if streamed else resp.content)
+
+        if streamed:
+            return self._stream(resp, content_type)
+
+        return self._decode(resp, content_type)
+
+    @staticmethod
+    def _release(resp: Response | FakeResponse) -> None:
+        """Read the short body of an error response and close it"""
+
+        resp.content
+        resp.close()
+
+    def _record_response(self, resp: Response | FakeResponse) -> None:
+        """Read rate limits of a response and pass them to the rate limiter"""
 
         # Record response for debug intent
         self.last_response = resp
 
+        # successful requests earn retries
+        if self.retry_budget is not None and resp.status_code < 400:
+            self.retry_budget.success()
+
         # Initialize some values. Check if I'm rate limited
         (
             self.rate_reset,
@@ -336,26 +1328,96 @@ class EnsemblRest(object):
             self.rate_remaining,
             self.retry_after,
             self.rate_period,
-        ) = self.__get_rate_limit(resp.headers)
+        ) = self._get_rate_limit(resp.headers)
+
+        # let the rate limiter adapt to what the server told us. Mirrors
+        # update their own
+        if self.mirrors is not None:
+            return
+
+        self.rate_limiter.update(
+            rate_reset=self.rate_reset,
+            rate_limit=self.rate_limit,
+            rate_remaining=self.rate_remaining,
+            retry_after=self.retry_after,
+        )
 
-        # parse status code
-        if self.__check_retry(resp):
-            return self.__retry_request()
+    def _decode(
+        self, resp: Response | FakeResponse, content_type: str | dict[str, Any]
+    ) -> Any:
+        """Decode response content relying on content-type"""
 
-        # Handle content in different way relying on content-type
+        # Handle content in different way relying on content-type. JSON is
+        # parsed from bytes, without building a str first
         if content_type == "application/json":
-            content = json.loads(resp.text)
+            content = self.json_decoder(resp.content)
         else:
             # Default
             content = resp.text
 
         return content
 
-    def __check_retry(self, resp: Response | FakeResponse) -> bool:
+    def _stream(
+        self, resp: Response | FakeResponse, content_type: str | dict[str, Any]
+    ) -> Iterator[Any]:
+        """
+        Decode response content as it is read: the elements of a JSON array,
+        (header, sequence_chunk) records of FASTA, or chunks of text for other
+        content types
+        """
+
+        chunks = resp.iter_content(chunk_size=self.stream_chunk_size)
+
+        try:
+            if content_type == "application/json":
+                yield from iter_json(chunks)
+            elif content_type == "text/x-fasta":
+                yield from iter_fasta(iter_text(chunks))
+            else:
+                yield from iter_text(chunks)
+
+        finally:
+            resp.close()
+
+    def _chunks(self, resp: Response | FakeResponse) -> Iterator[bytes]:
+        """Yield the body of a response as it is read, then close it"""
+
+        try:
+            yield from resp.iter_content(chunk_size=self.stream_chunk_size)
+
+        finally:
+            resp.close()
+
+    def _raw(
+        self,
+        resp: Response | FakeResponse,
+        content: bytes | Iterator[bytes] | AsyncIterator[bytes],
+    ) -> RawResponse:
+        """Describe an undecoded response"""
+
+        # read rate limits from this response, other threads may update ours
+        rate_reset, rate_limit, rate_remaining, retry_after, rate_period = (
+            self._get_rate_limit(resp.headers)
+        )
+
+        return RawResponse(
+            content,
+            resp.status_code,
+            resp.headers.get("Content-Type", ""),
+            rate_reset=rate_reset,
+            rate_limit=rate_limit,
+            rate_remaining=rate_remaining,
+            retry_after=retry_after,
+            rate_period=rate_period,
+        )
+
+    def _check_retry(self, resp: Response | FakeResponse) -> bool:
         """Parse status code and print warnings. Return True if a retry is needed"""
 
         # default status code
-        message = ensembl_http_status_codes[resp.status_code][1]
+        message = ensembl_http_status_codes.get(
+            resp.status_code, ensembl_unknown_status
+        )[1]
 
         # parse status codes
         if resp.status_code > 304:
@@ -375,27 +1437,34 @@ class EnsemblRest(object):
 
                     # return true if retry needed
                     return True
-            elif resp.status_code == 500:
+            elif resp.status_code in self.retry_policy.statuses:
                 # Retrying when we get a 500 error.
                 # Due to Ensembl's condition on randomly returning 500s on valid requests.
+                # Rate limited requests are retried once the server allows it
+                logger.warning("EnsEMBL REST Service returned: %s" % resp.status_code)
                 return True
             elif resp.status_code == 429:
                 ExceptionType = EnsemblRestRateLimitError
 
+            # read rate limits from this response, other threads may update ours
+            rate_reset, rate_limit, rate_remaining, retry_after, _ = (
+                self._get_rate_limit(resp.headers)
+            )
+
             raise ExceptionType(
                 message,
                 error_code=resp.status_code,
-                rate_reset=self.rate_reset,
-                rate_limit=self.rate_limit,
-                rate_remaining=self.rate_remaining,
-                retry_after=self.retry_after,
+                rate_reset=rate_reset,
+                rate_limit=rate_limit,
+                rate_remaining=rate_remaining,
+                retry_after=retry_after,
             )
 
         # return a flag if status is ok
         return False
 
     @staticmethod
-    def __get_rate_limit(
+    def _get_rate_limit(
         headers: CaseInsensitiveDict[str] | dict[str, Any],
     ) -> tuple[int | None, int | None, int | None, float | None, int | None]:
         """Read rate limited attributes"""
@@ -432,80 +1501,121 @@ class EnsemblRest(object):
 
         return rate_reset, rate_limit, rate_remaining, retry_after, rate_period
 
-    def __retry_request(self) -> Any:
-        """Retry last request in case of failure"""
+    def __retry_request(
+        self, request: EnsemblRequest, entry: CacheEntry | None = None
+    ) -> Any:
+        """Retry a request in case of failure"""
 
-        # update last attempt
-        self.last_attempt += 1
+        # update attempt
+        request = replace(request, attempt=request.attempt + 1)
 
         # a max of three attempts
-        if self.last_attempt > self.max_attempts:
-            # default status code
-            message = ensembl_http_status_codes[self.last_response.status_code][1]
+        if request.attempt > self.max_attempts:
+            raise self._retries_exhausted(self.last_response)
 
-            # parse error if possible
-            try:
-                json_message = json.loads(self.last_response.text)
-                if "error" in json_message:
-                    message = json_message["error"]
-            except ValueError:
-                # In this case we didn't even get a JSON back.
-                message = "Server returned invalid JSON."
-
-            raise EnsemblRestError(
-                "Max number of retries attempts reached. Last message was: %s"
-                % message,
-                error_code=self.last_response.status_code,
-                rate_reset=self.rate_reset,
-                rate_limit=self.rate_limit,
-                rate_remaining=self.rate_remaining,
-                retry_after=self.retry_after,
-            )
+        if not self._spend_retry():
+            raise self._retries_exhausted(self.last_response, "Retry budget exhausted")
 
-        # sleep a while. Increment on each attempt
-        to_sleep = (self.wall_time + 1) * self.last_attempt
+        # sleep a while, as the retry policy says
+        to_sleep = self._retry_delay(self.last_response, request.attempt)
 
         logger.debug("Sleeping %s" % to_sleep)
         time.sleep(to_sleep)
 
         # another request using the correct method
-        if self.last_method == "GET":
+        if request.method == "GET":
             # debug
             logger.debug(
                 "Retring last GET request (%s/%s): url = '%s', headers = %s, params = %s"
                 % (
-                    self.last_attempt,
+                    request.attempt,
                     self.max_attempts,
-                    self.last_url,
-                    self.last_headers,
-                    self.last_params,
+                    request.url,
+                    request.headers,
+                    request.params,
                 )
             )
 
-            resp = self.__get_response()
-
-        elif self.last_method == "POST":
+        elif request.method == "POST":
             # debug
             logger.debug(
                 "Retring last POST request (%s/%s): url = '%s', headers = %s, params = %s, data = %s"
                 % (
-                    self.last_attempt,
+                    request.attempt,
                     self.max_attempts,
-                    self.last_url,
-                    self.last_headers,
-                    self.last_params,
-                    self.last_data,
+                    request.url,
+                    request.headers,
+                    request.params,
+                    request.data,
                 )
             )
 
-            resp = self.__get_response()
         else:
             raise NotImplementedError(
-                "Method '%s' not yet implemented" % (self.last_method)
+                "Method '%s' not yet implemented" % (request.method)
             )
 
+        resp = self.__get_response(request)
+
         # call response and return content
-        return self.parseResponse(resp, self.last_headers["Content-Type"])
+        return self.parseResponse(resp, request.content_type, request, entry)
+
+    def _retry_delay(self, resp: Response | FakeResponse, attempt: int) -> float:
+        """Return the seconds to wait before retrying a failed response"""
+
+        rate_reset, _, rate_remaining, retry_after, _ = self._get_rate_limit(
+            resp.headers
+        )
+
+        return self.retry_policy.delay(
+            attempt,
+            retry_after=retry_after,
+            rate_reset=rate_reset,
+            rate_remaining=rate_remaining,
+        )
+
+    def _spend_retry(self) -> bool:
+        """Book a retry in the retry budget. Return False if it is exhausted"""
+        return self.retry_budget is None or self.retry_budget.spend()
+
+    def _retries_exhausted(
+        self,
+        resp: Response | FakeResponse,
+        reason: str = "Max number of retries attempts reached",
+    ) -> EnsemblRestError:
+        """Build the error raised when a request can't be retried anymore"""
+
+        # default status code
+        message = ensembl_http_status_codes.get(
+            resp.status_code, ensembl_unknown_status
+        )[1]
+
+        # parse error if possible
+        try:
+            json_message = json.loads(resp.text)
+            if "error" in json_message:
+                message = json_message["error"]
+        except ValueError:
+            # In this case we didn't even get a JSON back.
+            message = "Server returned invalid JSON."
+
+        rate_reset, rate_limit, rate_remaining, retry_after, _ = self._get_rate_limit(
+            resp.headers
+        )
+
+        ExceptionType = EnsemblRestError
+
+        if resp.status_code == 429:
+            ExceptionType = EnsemblRestRateLimitError
+
+        return ExceptionType(
+            "%s. Last message was: %s" % (reason, message),
+            error_code=resp.status_code,
+            rate_reset=rate_reset,
+            rate_limit=rate_limit,
+            rate_remaining=rate_remaining,
+            retry_after=retry_after,
+        )
 
     def get_user_agent(self) -> str:
         """Return the pyEnsemblRest user agent"""
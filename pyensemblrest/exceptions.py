@@ -63,3 +63,12 @@ class EnsemblRestServiceUnavailable(EnsemblRestError):
     """
 
     pass
+
+
+class EnsemblRestCircuitOpen(EnsemblRestServiceUnavailable):
+    """
+    Raised without sending the request when too many recent requests to the
+    same endpoint group failed.
+    """
+
+    pass
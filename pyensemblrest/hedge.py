@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections import deque
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# Hedger object
+class Hedger(object):
+    """
+    Decide when to hedge a request: send a duplicate if it hasn't answered
+    within the percentile of the latencies observed for the last samples
+    requests. Hedges are capped to budget times the number of requests, and
+    nothing is hedged before min_samples latencies are known.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        samples: int = 1000,
+    ) -> None:
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies: deque[float] = deque(maxlen=samples)
+        self.requests = 0
+        self.hedges = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a response"""
+
+        with self.lock:
+            self.latencies.append(latency)
+
+    def delay(self) -> float | None:
+        """
+        Return the seconds to wait for a request before hedging it, or None if
+        there are not enough samples. Count the request
+        """
+
+        with self.lock:
+            self.requests += 1
+
+            if len(self.latencies) < max(1, self.min_samples):
+                return None
+
+            latencies = sorted(self.latencies)
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+    def spend(self) -> bool:
+        """Book a hedge. Return False if the hedge budget is exhausted"""
+
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+
+            self.hedges += 1
+            return True
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Requests and hedges counters"""
+        return {"requests": self.requests, "hedges": self.hedges}
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from typing import Iterable
+
+from .ratelimit import RateLimiter, TokenBucket
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# Mirror object
+class Mirror(object):
+    """
+    An EnsEMBL REST server, with its own rate limiter and the moving averages
+    of the latency and error rate of its requests
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        rate_limiter: RateLimiter | None = None,
+        rate: float = 15,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or TokenBucket(rate=rate)
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.in_flight = 0
+        self.down_until = float("-inf")
+
+    @property
+    def up(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def __repr__(self) -> str:
+        return "Mirror(%r)" % self.base_url
+
+
+# MirrorPool object
+class MirrorPool(object):
+    """
+    Equivalent EnsEMBL REST servers. Each request goes to the server expected
+    to answer first: the one with the lowest average latency, weighted by its
+    requests in flight and its error rate. A server failing max_failures
+    requests in a row is taken down for down_time seconds, then tried again.
+    """
+
+    # weight of the last request in the moving averages
+    smoothing = 0.2
+
+    def __init__(
+        self,
+        mirrors: Iterable[str | Mirror],
+        max_failures: int = 3,
+        down_time: float = 30,
+    ) -> None:
+        self.mirrors = [
+            mirror if isinstance(mirror, Mirror) else Mirror(mirror)
+            for mirror in mirrors
+        ]
+
+        if not self.mirrors:
+            raise ValueError("A MirrorPool needs at least one mirror")
+
+        self.max_failures = max_failures
+        self.down_time = down_time
+        self.lock = threading.Lock()
+
+    def __score(self, mirror: Mirror) -> float:
+        """The expected time of a request. Call with lock held"""
+
+        # unknown servers are tried first
+        latency = mirror.latency or 0
+        return latency * (mirror.in_flight + 1) / max(0.01, 1 - mirror.error_rate)
+
+    def choose(
+        self, exclude: Iterable[Mirror] = (), avoid: Mirror | None = None
+    ) -> Mirror | None:
+        """
+        Book the best server not in exclude for a request, preferring servers
+        which are up, then servers other than avoid. Return None if there is
+        none. Release it once done
+        """
+
+        excluded = set(exclude)
+
+        with self.lock:
+            candidates = [mirror for mirror in self.mirrors if mirror not in excluded]
+
+            if not candidates:
+                return None
+
+            up = [mirror for mirror in candidates if mirror.up]
+            others = [mirror for mirror in up if mirror is not avoid]
+            mirror = min(others or up or candidates, key=self.__score)
+            mirror.in_flight += 1
+
+            return mirror
+
+    def release(self, mirror: Mirror) -> None:
+        """Release a server booked by choose"""
+
+        with self.lock:
+            mirror.in_flight -= 1
+
+    def find(self, url: str) -> Mirror | None:
+        """Return the server of a url"""
+
+        for mirror in self.mirrors:
+            if url.startswith(mirror.base_url + "/"):
+                return mirror
+
+        return None
+
+    def record(self, mirror: Mirror, success: bool, latency: float) -> None:
+        """Record the outcome of a request"""
+
+        with self.lock:
+            if mirror.latency is None:
+                mirror.latency = latency
+            else:
+                mirror.latency += self.smoothing * (latency - mirror.latency)
+
+            mirror.error_rate += self.smoothing * ((not success) - mirror.error_rate)
+
+            if success:
+                mirror.failures = 0
+                mirror.down_until = float("-inf")
+                return
+
+            mirror.failures += 1
+
+            if mirror.failures >= self.max_failures:
+                self.__take_down(mirror)
+
+    def take_down(self, mirror: Mirror) -> None:
+        """Stop sending requests to a server for down_time seconds"""
+
+        with self.lock:
+            mirror.failures = max(mirror.failures, self.max_failures)
+            self.__take_down(mirror)
+
+    def __take_down(self, mirror: Mirror) -> None:
+        """Call with lock held"""
+
+        logger.warning(
+            "%s failed %s requests: down for %s seconds"
+            % (mirror.base_url, mirror.failures, self.down_time)
+        )
+        mirror.down_until = time.monotonic() + self.down_time
+
+    @property
+    def stats(self) -> dict[str, dict[str, float | bool | None]]:
+        """Latency, error rate and state of each server"""
+
+        with self.lock:
+            return {
+                mirror.base_url: {
+                    "latency": mirror.latency,
+                    "error_rate": mirror.error_rate,
+                    "in_flight": mirror.in_flight,
+                    "up": mirror.up,
+                }
+                for mirror in self.mirrors
+            }
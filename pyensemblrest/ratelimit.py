@@ -0,0 +1,225 @@
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:  # pragma: no cover
+    # not available on Windows
+    HAS_FCNTL = False
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# RateLimiter object
+class RateLimiter(object):
+    """
+    Base class for rate limiters. A limiter hands out the delay to wait before
+    each request, so it can be used by both threads and coroutines.
+    """
+
+    rate: float
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Book tokens for a request. Return the seconds to wait before sending it"""
+        raise NotImplementedError
+
+    def update(
+        self,
+        rate_reset: int | None = None,
+        rate_limit: int | None = None,
+        rate_remaining: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Called with the X-RateLimit-* headers of every response"""
+        pass
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until a request can be sent"""
+
+        to_sleep = self.reserve(tokens)
+
+        if to_sleep > 0:
+            logger.debug("waiting %s" % to_sleep)
+            time.sleep(to_sleep)
+
+
+# TokenBucket object
+class TokenBucket(RateLimiter):
+    """
+    A thread-safe token bucket, refilled continuously at rate tokens per second
+    up to capacity tokens. Reservations may overdraw the bucket, so that waiting
+    requests are queued in the order they arrived.
+    """
+
+    def __init__(self, rate: float = 15, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last update. Call with lock held"""
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+
+            if self.tokens >= 0:
+                return 0
+
+            return -self.tokens / self.rate
+
+
+# AdaptiveRateLimiter object
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    A token bucket paced by the X-RateLimit-* headers of the server. The budget
+    remaining in the current period is spread over the seconds left until it is
+    reset, between min_rate and max_rate requests per second. The bucket is
+    drained when the server asks to retry later, or when the budget is spent.
+    """
+
+    def __init__(
+        self, max_rate: float = 15, min_rate: float = 0.1, capacity: float | None = None
+    ) -> None:
+        super(AdaptiveRateLimiter, self).__init__(rate=max_rate, capacity=capacity)
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+
+    def update(
+        self,
+        rate_reset: int | None = None,
+        rate_limit: int | None = None,
+        rate_remaining: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+
+            if rate_remaining is not None and rate_reset is not None:
+                if rate_remaining > 0:
+                    # spread what's left over the time left
+                    rate = rate_remaining / max(rate_reset, 1)
+                    self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+                    logger.debug(
+                        "%s requests left in %s seconds: pacing at %.2f requests per second"
+                        % (rate_remaining, rate_reset, self.rate)
+                    )
+
+                else:
+                    # the budget is spent, wait for the next period
+                    self.__pause(rate_reset)
+
+            # don't send anything before the time the server asked for
+            if retry_after is not None:
+                self.__pause(retry_after)
+
+    def __pause(self, seconds: float) -> None:
+        """Drain the bucket for seconds. Call with lock held"""
+
+        logger.debug("Rate limited: pausing requests for %s seconds" % seconds)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+# FileRateLimiter object
+class FileRateLimiter(RateLimiter):
+    """
+    A token bucket shared by every process of a host. Its state is kept in a
+    small file, locked with flock while a process reserves tokens. Processes
+    using the same path share rate tokens per second, whatever their number.
+    """
+
+    # tokens and time of the last update
+    state = struct.Struct("dd")
+
+    def __init__(
+        self,
+        path: str | None = None,
+        rate: float = 15,
+        capacity: float | None = None,
+    ) -> None:
+        if not HAS_FCNTL:
+            raise NotImplementedError("FileRateLimiter requires fcntl (POSIX only)")
+
+        # a file per user: others can't read it, nor plant it beforehand
+        self.path = path or os.path.join(
+            tempfile.gettempdir(), "pyensemblrest-ratelimit-%d" % os.getuid()
+        )
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.__open()
+
+    def __open(self) -> None:
+        """Open the state file. A forked process must not share the parent's"""
+
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+
+    def __del__(self) -> None:
+        if hasattr(self, "fd") and self.pid == os.getpid():
+            os.close(self.fd)
+
+    def reserve(self, tokens: float = 1) -> float:
+        if self.pid != os.getpid():
+            self.__open()
+
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+            try:
+                now = time.time()
+                data = os.pread(self.fd, self.state.size, 0)
+
+                if len(data) == self.state.size:
+                    available, updated = self.state.unpack(data)
+                    available = min(
+                        self.capacity, available + (now - updated) * self.rate
+                    )
+                else:
+                    # a new bucket is full
+                    available = self.capacity
+
+                available -= tokens
+                os.pwrite(self.fd, self.state.pack(available, now), 0)
+
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        if available >= 0:
+            return 0
+
+        return float(-available / self.rate)
+
+
+# Ensembl allows 15 requests per second per IP address. Every client in this
+# process shares this limiter, unless it is given its own
+shared_rate_limiter: RateLimiter = TokenBucket(rate=15)
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Return the rate limiter shared by clients of this process"""
+    return shared_rate_limiter
+
+
+def set_shared_rate_limiter(rate_limiter: RateLimiter) -> None:
+    """
+    Replace the rate limiter shared by clients created from now on, for example
+    with a FileRateLimiter to share it with other processes
+    """
+
+    global shared_rate_limiter
+    shared_rate_limiter = rate_limiter
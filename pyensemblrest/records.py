@@ -0,0 +1,215 @@
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, AsyncIterator, Iterator, TypeVar
+
+# Fields with few distinct values, shared by all the records holding them
+interned_fields = frozenset(
+    [
+        "species",
+        "biotype",
+        "seq_region_name",
+        "feature_type",
+        "assembly_name",
+        "object_type",
+        "source",
+        "logic_name",
+        "coord_system",
+        "var_class",
+        "most_severe_consequence",
+    ]
+)
+
+R = TypeVar("R", bound="Record")
+
+
+# the fields of each record class, but extra
+_record_fields: dict[type, frozenset[str]] = {}
+
+
+def _names(cls: type) -> frozenset[str]:
+    """The fields of a record class read from a response"""
+
+    if cls not in _record_fields:
+        _record_fields[cls] = frozenset(field.name for field in fields(cls)) - {"extra"}
+
+    return _record_fields[cls]
+
+
+def _intern(name: str, value: Any) -> Any:
+    """Intern the values of interned_fields"""
+
+    if name in interned_fields and isinstance(value, str):
+        return sys.intern(value)
+
+    return value
+
+
+# Record object
+class Record(object):
+    """
+    A compact decoded result. Values of the fields a record class declares
+    are kept in slots, others in its extra dictionary.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls: type[R], content: dict[str, Any]) -> R:
+        """Build a record from a decoded JSON object"""
+
+        names = _names(cls)
+        known: dict[str, Any] = {}
+        extra: dict[str, Any] = {}
+
+        for name, value in content.items():
+            if name in names:
+                known[name] = _intern(name, value)
+            else:
+                extra[name] = value
+
+        known["extra"] = extra or None
+
+        return cls(**known)
+
+
+# LookupRecord object
+@dataclass(slots=True)
+class LookupRecord(Record):
+    """A getLookupById result"""
+
+    id: str | None = None
+    species: str | None = None
+    object_type: str | None = None
+    db_type: str | None = None
+    display_name: str | None = None
+    description: str | None = None
+    biotype: str | None = None
+    logic_name: str | None = None
+    source: str | None = None
+    assembly_name: str | None = None
+    seq_region_name: str | None = None
+    start: int | None = None
+    end: int | None = None
+    strand: int | None = None
+    version: int | None = None
+    canonical_transcript: str | None = None
+    extra: dict[str, Any] | None = None
+
+
+# OverlapFeature object
+@dataclass(slots=True)
+class OverlapFeature(Record):
+    """A feature of a getOverlapByRegion result"""
+
+    id: str | None = None
+    feature_type: str | None = None
+    seq_region_name: str | None = None
+    start: int | None = None
+    end: int | None = None
+    strand: int | None = None
+    assembly_name: str | None = None
+    biotype: str | None = None
+    external_name: str | None = None
+    description: str | None = None
+    logic_name: str | None = None
+    source: str | None = None
+    version: int | None = None
+    extra: dict[str, Any] | None = None
+
+
+# VariationMapping object
+@dataclass(slots=True)
+class VariationMapping(Record):
+    """A location of a variation"""
+
+    location: str | None = None
+    assembly_name: str | None = None
+    coord_system: str | None = None
+    seq_region_name: str | None = None
+    start: int | None = None
+    end: int | None = None
+    strand: int | None = None
+    allele_string: str | None = None
+    ancestral_allele: str | None = None
+    extra: dict[str, Any] | None = None
+
+
+# VariationRecord object
+@dataclass(slots=True)
+class VariationRecord(Record):
+    """A getVariationById result"""
+
+    name: str | None = None
+    source: str | None = None
+    var_class: str | None = None
+    most_severe_consequence: str | None = None
+    MAF: float | None = None
+    minor_allele: str | None = None
+    ambiguity: str | None = None
+    synonyms: list[str] | None = None
+    evidence: list[str] | None = None
+    mappings: list[VariationMapping] | None = None
+    extra: dict[str, Any] | None = None
+
+    @classmethod
+    def from_dict(cls, content: dict[str, Any]) -> "VariationRecord":
+        if content.get("mappings") is not None:
+            content = dict(content)
+            content["mappings"] = [
+                VariationMapping.from_dict(mapping) for mapping in content["mappings"]
+            ]
+
+        return super(VariationRecord, cls).from_dict(content)
+
+
+# the record class of the results of an endpoint
+endpoint_records: dict[str, type[Record]] = {
+    "getLookupById": LookupRecord,
+    "getLookupByMultipleIds": LookupRecord,
+    "getOverlapById": OverlapFeature,
+    "getOverlapByRegion": OverlapFeature,
+    "getVariationById": VariationRecord,
+    "getVariationByMultipleIds": VariationRecord,
+}
+
+
+def to_records(api_call: str, content: Any) -> Any:
+    """
+    Decode the content of an endpoint as records: an object as a record, an
+    array or an iterator as records, and the objects of multiple identifier
+    endpoints as records by identifier (None for identifiers not found)
+    """
+
+    if api_call not in endpoint_records:
+        raise ValueError("No records for %s results" % api_call)
+
+    cls = endpoint_records[api_call]
+
+    if api_call.endswith("ByMultipleIds"):
+        return {
+            key: None if value is None else cls.from_dict(value)
+            for key, value in content.items()
+        }
+
+    if isinstance(content, dict):
+        return cls.from_dict(content)
+
+    if isinstance(content, list):
+        return [cls.from_dict(item) for item in content]
+
+    if isinstance(content, Iterator):
+        return map(cls.from_dict, content)
+
+    if isinstance(content, AsyncIterator):
+        return _arecords(cls, content)
+
+    raise ValueError("Can't decode %s as records" % type(content).__name__)
+
+
+async def _arecords(
+    cls: type[Record], content: AsyncIterator[dict[str, Any]]
+) -> AsyncIterator[Record]:
+    """Decode the items of an asynchronous iterator as records"""
+
+    async for item in content:
+        yield cls.from_dict(item)
@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+# Logger instance
+logger = logging.getLogger(__name__)
+
+
+# RetryPolicy object
+class RetryPolicy(object):
+    """
+    Decide which responses are retried and how long to wait before each retry.
+    Delays grow exponentially from backoff seconds, up to max_delay seconds,
+    and are drawn at random between 0 and that bound (full jitter), so that
+    many clients failing at once don't retry in lockstep. A Retry-After header,
+    or a spent X-RateLimit budget, sets the delay to the time the server asked
+    for instead.
+    """
+
+    def __init__(
+        self,
+        backoff: float = 1,
+        max_delay: float = 60,
+        jitter: bool = True,
+        statuses: tuple[int, ...] = (429, 500, 503),
+    ) -> None:
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.statuses = statuses
+
+    def delay(
+        self,
+        attempt: int,
+        retry_after: float | None = None,
+        rate_reset: int | None = None,
+        rate_remaining: int | None = None,
+    ) -> float:
+        """Return the seconds to wait before the attempt-th retry"""
+
+        # the earliest time the server allows
+        if retry_after is not None:
+            return retry_after
+
+        if (
+            rate_remaining is not None
+            and rate_remaining <= 0
+            and rate_reset is not None
+        ):
+            return float(rate_reset)
+
+        delay = min(self.max_delay, self.backoff * 2.0 ** (attempt - 1))
+
+        if self.jitter:
+            delay = random.uniform(0, delay)
+
+        return max(delay, 0)
+
+
+# RetryBudget object
+class RetryBudget(object):
+    """
+    A thread-safe budget capping retries to a ratio of the successful requests
+    done in the last window seconds, plus min_retries, so that retries can't
+    multiply the load on a failing server. Retries beyond the budget are not
+    done: the request fails at once.
+    """
+
+    def __init__(
+        self, ratio: float = 0.1, window: float = 10, min_retries: int = 10
+    ) -> None:
+        self.ratio = ratio
+        self.window = window
+        self.min_retries = min_retries
+        self.lock = threading.Lock()
+        self.successes: deque[float] = deque()
+        self.retries: deque[float] = deque()
+
+    def __prune(self, now: float) -> None:
+        """Forget events older than the window. Call with lock held"""
+
+        for events in (self.successes, self.retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def __allowed(self) -> float:
+        """The retries allowed in the current window. Call with lock held"""
+        return self.min_retries + self.ratio * len(self.successes)
+
+    def success(self) -> None:
+        """Record a successful request"""
+
+        with self.lock:
+            now = time.monotonic()
+            self.__prune(now)
+            self.successes.append(now)
+
+    def spend(self) -> bool:
+        """Book a retry. Return False if the budget is exhausted"""
+
+        with self.lock:
+            now = time.monotonic()
+            self.__prune(now)
+
+            if len(self.retries) + 1 > self.__allowed():
+                logger.warning(
+                    "Retry budget exhausted: %s retries for %s successful requests "
+                    "in %s seconds"
+                    % (len(self.retries), len(self.successes), self.window)
+                )
+                return False
+
+            self.retries.append(now)
+            return True
+
+    @property
+    def used(self) -> float:
+        """The part of the budget used in the current window, between 0 and 1"""
+
+        with self.lock:
+            self.__prune(time.monotonic())
+            return min(1.0, len(self.retries) / self.__allowed())
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Retries, successes and allowed retries of the current window"""
+
+        with self.lock:
+            self.__prune(time.monotonic())
+            return {
+                "retries": len(self.retries),
+                "successes": len(self.successes),
+                "allowed": self.__allowed(),
+            }
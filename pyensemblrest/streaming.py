@@ -0,0 +1,252 @@
+import codecs
+import io
+import json
+import os
+from types import TracebackType
+from typing import IO, Any, Iterable, Iterator
+
+# JSON insignificant whitespace
+WHITESPACE = " \t\n\r"
+
+# The characters ending an array element
+DELIMITERS = ",]" + WHITESPACE
+
+
+# JSONStream object
+class JSONStream(object):
+    """
+    Decode a JSON document read as chunks of bytes. The elements of a top
+    level array are yielded one at a time as soon as they are read, keeping
+    only the current element in memory. Any other document is yielded whole.
+    """
+
+    def __init__(
+        self, chunks: Iterable[bytes], decoder: json.JSONDecoder | None = None
+    ) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = decoder or json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+
+    def __fill(self, size: int = 1) -> bool:
+        """
+        Read chunks until at least size more characters, dropping decoded
+        text. Return False at the end
+        """
+
+        pieces = [self.buffer[self.pos :]]
+        read = 0
+
+        for chunk in self.chunks:
+            text = self.text.decode(chunk)
+
+            if text:
+                pieces.append(text)
+                read += len(text)
+
+                if read >= size:
+                    break
+
+        if not read:
+            return False
+
+        self.buffer = "".join(pieces)
+        self.pos = 0
+        return True
+
+    def __skip(self) -> str:
+        """Skip whitespace. Return the next character, or "" at the end"""
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.__fill():
+                return ""
+
+    def __value(self) -> Any:
+        """Decode the value at the current position"""
+
+        self.__skip()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+            except json.JSONDecodeError:
+                # an incomplete value, unless there is nothing more to read.
+                # Read three times as much before decoding it again, so large
+                # values are decoded a few times only
+                if not self.__fill(3 * (len(self.buffer) - self.pos)):
+                    raise
+
+                continue
+
+            # a number may go on in the next chunk, as 1 of "1." or "1e": it
+            # ends with a delimiter
+            if (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and (end == len(self.buffer) or self.buffer[end] not in DELIMITERS)
+                and self.__fill()
+            ):
+                continue
+
+            self.pos = end
+            return value
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.__skip() != "[":
+            # not an array: decode the whole document, joined once
+            pieces = [self.buffer[self.pos :]]
+            pieces.extend(self.text.decode(chunk) for chunk in self.chunks)
+            pieces.append(self.text.decode(b"", final=True))
+
+            yield json.loads("".join(pieces))
+            return
+
+        self.pos += 1
+
+        if self.__skip() == "]":
+            return
+
+        while True:
+            yield self.__value()
+
+            char = self.__skip()
+
+            if char == "]":
+                return
+
+            if char != ",":
+                raise json.JSONDecodeError(
+                    "Expecting ',' delimiter", self.buffer, self.pos
+                )
+
+            self.pos += 1
+
+
+def iter_json(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Yield the elements of a top level JSON array read as chunks of bytes"""
+    return iter(JSONStream(chunks))
+
+
+def iter_text(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield the text of chunks of UTF-8 bytes"""
+
+    text = codecs.getincrementaldecoder("utf-8")()
+
+    for chunk in chunks:
+        decoded = text.decode(chunk)
+
+        if decoded:
+            yield decoded
+
+    decoded = text.decode(b"", final=True)
+
+    if decoded:
+        yield decoded
+
+
+def iter_fasta(texts: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield (header, sequence_chunk) records of FASTA text read in chunks,
+    without the ">" of headers nor line breaks of sequences. A sequence comes
+    in as many chunks as the text it is read from
+    """
+
+    header = ""
+    in_header = False
+    line_start = True
+
+    for text in texts:
+        pos = 0
+        sequence: list[str] = []
+
+        while pos < len(text):
+            end = text.find("\n", pos)
+
+            if end == -1:
+                end = len(text)
+
+            if in_header:
+                header += text[pos:end]
+            elif line_start and text[pos] == ">":
+                # a new record: yield the sequence of the previous one
+                if sequence:
+                    yield header, "".join(sequence)
+                    sequence = []
+
+                header = text[pos + 1 : end]
+                in_header = True
+            else:
+                sequence.append(text[pos:end].rstrip("\r"))
+
+            # a line break ends the header
+            line_start = end < len(text)
+            in_header = in_header and not line_start
+
+            if not in_header:
+                header = header.rstrip("\r")
+
+            pos = end + 1
+
+        chunk = "".join(sequence)
+
+        if chunk:
+            yield header, chunk
+
+
+# ChunkWriter object
+class ChunkWriter(object):
+    """
+    Write chunks of bytes to a path, or to a binary or text file object, text
+    files getting them decoded from UTF-8. A path is opened and closed by the
+    writer, a file object is left open.
+    """
+
+    def __init__(self, target: str | os.PathLike[str] | IO[Any]) -> None:
+        self.file: IO[Any]
+        self.owned = isinstance(target, (str, os.PathLike))
+
+        if isinstance(target, (str, os.PathLike)):
+            self.file = open(target, "wb")
+        else:
+            self.file = target
+
+        self.text = (
+            codecs.getincrementaldecoder("utf-8")()
+            if isinstance(self.file, io.TextIOBase)
+            else None
+        )
+        self.written = 0
+
+    def write(self, chunk: bytes) -> None:
+        """Write a chunk"""
+
+        self.file.write(chunk if self.text is None else self.text.decode(chunk))
+        self.written += len(chunk)
+
+    def close(self) -> None:
+        """Flush the text decoder, and close the file it opened"""
+
+        if self.text is not None:
+            self.file.write(self.text.decode(b"", final=True))
+
+        if self.owned:
+            self.file.close()
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
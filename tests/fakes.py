@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+from typing import Any, Callable
+
+from pyensemblrest.ensemblrest import FakeResponse
+
+# A responder gets method, url, params and POST data and returns a FakeResponse
+Responder = Callable[[str, str, dict[str, Any], Any], FakeResponse]
+
+
+def echo(method: str, url: str, params: dict[str, Any], data: Any) -> FakeResponse:
+    """Answer with the requested url as JSON"""
+    return FakeResponse(headers={}, status_code=200, text=json.dumps({"url": url}))
+
+
+class FakeSession(object):
+    """Answer GET and POST requests without touching the network"""
+
+    def __init__(self, responder: Responder = echo, delay: float = 0) -> None:
+        self.responder = responder
+        self.delay = delay
+        self.calls: list[tuple[str, str, dict[str, Any], Any]] = []
+        self.headers: list[dict[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def install(self, client: Any) -> "FakeSession":
+        """Replace the session methods of an EnsemblRest object"""
+        client.session.get = self.get
+        client.session.post = self.post
+        return self
+
+    def __respond(self, method: str, url: str, **kwargs: Any) -> FakeResponse:
+        params = kwargs.get("params") or {}
+        data = json.loads(kwargs["data"]) if "data" in kwargs else None
+
+        with self.lock:
+            self.calls.append((method, url, params, data))
+            self.headers.append(kwargs.get("headers") or {})
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            time.sleep(self.delay)
+            return self.responder(method, url, params, data)
+
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def get(self, url: str, **kwargs: Any) -> FakeResponse:
+        return self.__respond("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> FakeResponse:
+        return self.__respond("POST", url, **kwargs)
+
+
+def status(code: int, text: str = "{}") -> Responder:
+    """Always answer with the same status code"""
+
+    def responder(
+        method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        return FakeResponse(headers={}, status_code=code, text=text)
+
+    return responder
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pyensemblrest
+from pyensemblrest.cache import CacheEntry, MemoryCache
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestError
+from pyensemblrest.hedge import Hedger
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+
+from .fakes import FakeSession, status
+
+
+class AsyncEnsemblRest(unittest.IsolatedAsyncioTestCase):
+    """A class to test AsyncEnsemblRest methods"""
+
+    def setUp(self) -> None:
+        """Create an AsyncEnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.AsyncEnsemblRest(
+            max_concurrency=4, rate_limiter=TokenBucket(rate=1000)
+        )
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.session = FakeSession(delay=0.05).install(self.EnsEMBL)
+
+    def tearDown(self) -> None:
+        self.EnsEMBL.close()
+
+    async def test_awaitableMethods(self) -> None:
+        """Every api_table entry is a coroutine function"""
+
+        for fun_name in pyensemblrest.ensembl_config.ensembl_api_table:
+            self.assertTrue(
+                asyncio.iscoroutinefunction(getattr(self.EnsEMBL, fun_name))
+            )
+
+        self.assertEqual(
+            self.EnsEMBL.getLookupById.__name__,  # type: ignore[attr-defined]
+            "getLookupById",
+        )
+
+    async def test_getLookupById(self) -> None:
+        """Resolve the url as EnsemblRest does"""
+
+        test = await self.EnsEMBL.getLookupById(id="ENSG00000157764")  # type: ignore[attr-defined]
+
+        self.assertEqual(
+            test, {"url": "https://rest.ensembl.org/lookup/id/ENSG00000157764"}
+        )
+
+    async def test_concurrency(self) -> None:
+        """Requests are in flight at once, up to max_concurrency"""
+
+        results = await asyncio.gather(
+            *[
+                self.EnsEMBL.getLookupById(id="ENSG%011d" % i)  # type: ignore[attr-defined]
+                for i in range(12)
+            ]
+        )
+
+        self.assertEqual(len(results), 12)
+        self.assertGreater(self.session.max_in_flight, 1)
+        self.assertLessEqual(self.session.max_in_flight, 4)
+
+    async def test_hedgeThreads(self) -> None:
+        """The asyncio client has no thread pool for hedged requests"""
+
+        self.EnsEMBL.hedger = Hedger(min_samples=1)
+
+        for i in range(3):
+            await self.EnsEMBL.getLookupById(id="ENSG%011d" % i)  # type: ignore[attr-defined]
+
+        pools = [
+            value
+            for value in vars(self.EnsEMBL).values()
+            if isinstance(value, ThreadPoolExecutor)
+        ]
+        self.assertEqual(pools, [self.EnsEMBL.executor])
+
+    async def test_retry(self) -> None:
+        """Retry on 500 errors, then give up"""
+
+        self.EnsEMBL.max_attempts = 2
+        self.session.responder = status(500)
+
+        with self.assertRaisesRegex(
+            EnsemblRestError, "Max number of retries attempts reached.*"
+        ):
+            await self.EnsEMBL.getArchiveById(id="ENSG00000157764")  # type: ignore[attr-defined]
+
+        self.assertEqual(len(self.session.calls), 3)
+
+    async def test_negativeCache(self) -> None:
+        """Not found errors are cached, if enabled"""
+
+        self.EnsEMBL.cache = MemoryCache()
+        self.EnsEMBL.negative_cache_ttl = 3600
+        self.session.responder = status(400, json.dumps({"error": "ID not found"}))
+
+        for _ in range(2):
+            with self.assertRaisesRegex(EnsemblRestError, "ID not found"):
+                await self.EnsEMBL.getLookupById(id="meow")  # type: ignore[attr-defined]
+
+        self.assertEqual(len(self.session.calls), 1)
+
+    async def test_cacheThreads(self) -> None:
+        """The cache is read and written out of the event loop"""
+
+        threads: set[int] = set()
+
+        class ThreadCache(MemoryCache):
+            def _get(self, key: str) -> CacheEntry | None:
+                threads.add(threading.get_ident())
+                return super(ThreadCache, self)._get(key)
+
+            def _set(self, key: str, entry: CacheEntry) -> None:
+                threads.add(threading.get_ident())
+                super(ThreadCache, self)._set(key, entry)
+
+        self.EnsEMBL.cache = ThreadCache()
+        self.EnsEMBL.release_check_interval = None
+
+        for _ in range(2):
+            await self.EnsEMBL.getLookupById(id="ENSG00000157764")  # type: ignore[attr-defined]
+
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_notModified(self) -> None:
+        """Expired entries are revalidated by conditional requests"""
+
+        cache = MemoryCache()
+        self.EnsEMBL.cache = cache
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={"ETag": '"v1"'}, status_code=200, text='{"version": 1}'
+        )
+        first = await self.EnsEMBL.getInfoSpecies()  # type: ignore[attr-defined]
+
+        for entry in cache.entries.values():
+            entry.expires = 0
+
+        self.session.responder = status(304, "")
+        second = await self.EnsEMBL.getInfoSpecies()  # type: ignore[attr-defined]
+
+        self.assertIs(second, first)
+        self.assertEqual(self.session.headers[-1]["If-None-Match"], '"v1"')
+        self.assertTrue(next(iter(cache.entries.values())).fresh)
+
+    async def test_map(self) -> None:
+        """Results are yielded in input order"""
+
+        ids = [{"id": "ENSG%011d" % i} for i in range(20)]
+        results = [result async for result in self.EnsEMBL.map("getLookupById", ids)]
+
+        self.assertEqual([result.position for result in results], list(range(20)))
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertGreater(self.session.max_in_flight, 1)
+
+    async def test_mapWorkers(self) -> None:
+        """Up to max_workers calls are in flight"""
+
+        ids = [{"id": "ENSG%011d" % i} for i in range(8)]
+        results = [
+            result
+            async for result in self.EnsEMBL.map("getLookupById", ids, max_workers=2)
+        ]
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.session.max_in_flight, 2)
+
+    async def test_mapErrors(self) -> None:
+        """Errors are collected instead of stopping the batch"""
+
+        self.session.responder = status(404)
+
+        results = [
+            result
+            async for result in self.EnsEMBL.map(
+                "getLookupById", [{"id": "meow"}, {}], ordered=False
+            )
+        ]
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(result.error is not None for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
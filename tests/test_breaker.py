@@ -0,0 +1,181 @@
+import time
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestCircuitOpen, EnsemblRestError
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+
+from .fakes import FakeSession, echo
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """A class to test the circuit breaker"""
+
+    def test_trip(self) -> None:
+        """A circuit opens once enough requests failed"""
+
+        breaker = CircuitBreaker(failure_rate=0.5, min_requests=4)
+
+        for success in [True, False, True]:
+            breaker.record("key", success)
+
+        self.assertTrue(breaker.allow("key"))
+
+        breaker.record("key", False)
+
+        self.assertFalse(breaker.allow("key"))
+        self.assertTrue(breaker.allow("other"))
+        self.assertEqual(breaker.states, {"key": OPEN})
+        self.assertGreater(breaker.retry_in("key"), 0)
+
+    def test_healthy(self) -> None:
+        """Occasional failures don't open a circuit"""
+
+        breaker = CircuitBreaker(failure_rate=0.5, min_requests=4)
+
+        for _ in range(10):
+            breaker.record("key", True)
+            breaker.record("key", True)
+            breaker.record("key", False)
+
+        self.assertEqual(breaker.states, {"key": CLOSED})
+
+    def test_window(self) -> None:
+        """Only failures of the last window seconds count"""
+
+        breaker = CircuitBreaker(min_requests=2, window=0.05)
+        breaker.record("key", False)
+        time.sleep(0.06)
+        breaker.record("key", True)
+
+        self.assertEqual(breaker.states, {"key": CLOSED})
+
+    def test_halfOpen(self) -> None:
+        """After cooldown, a single probe decides whether to close the circuit"""
+
+        breaker = CircuitBreaker(min_requests=1, cooldown=0.05)
+        breaker.record("key", False)
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow("key"))
+        self.assertFalse(breaker.allow("key"))
+        self.assertEqual(breaker.states, {"key": HALF_OPEN})
+
+        # a failed probe opens it again
+        breaker.record("key", False)
+        self.assertFalse(breaker.allow("key"))
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow("key"))
+        breaker.record("key", True)
+
+        self.assertEqual(breaker.states, {"key": CLOSED})
+        self.assertTrue(breaker.allow("key"))
+
+
+class EnsemblRestCircuit(unittest.TestCase):
+    """A class to test requests to failing endpoints"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object whose VEP endpoints fail"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.EnsEMBL.circuit_breaker = CircuitBreaker(min_requests=4, cooldown=0.1)
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+        self.healthy = False
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Fail VEP requests, unless healthy"""
+
+        if "/vep/" in url and not self.healthy:
+            return FakeResponse(headers={}, status_code=500, text="{}")
+
+        return echo(method, url, params, data)
+
+    def test_disabled(self) -> None:
+        """Without a breaker, retried server errors don't fail other calls"""
+
+        EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        session = FakeSession().install(EnsEMBL)
+        responder = session.responder
+
+        # five 500 errors for each url, then a success
+        session.responder = lambda method, url, params, data: (
+            FakeResponse(headers={}, status_code=500, text="{}")
+            if [call[1] for call in session.calls].count(url) <= 5
+            else responder(method, url, params, data)
+        )
+
+        self.assertIsNone(EnsEMBL.circuit_breaker)
+
+        for id in ("ENSG00000157764", "ENSG00000157765"):
+            self.assertIn(id, EnsEMBL.getLookupById(id=id)["url"])
+
+    def test_failFast(self) -> None:
+        """Requests of an open circuit are not sent, other groups are"""
+
+        with self.assertRaises(EnsemblRestCircuitOpen):
+            self.EnsEMBL.getVariantConsequencesById(species="human", id="rs56116432")
+
+        self.assertEqual(len(self.session.calls), 4)
+
+        # no retry either
+        self.assertRaisesRegex(
+            EnsemblRestCircuitOpen,
+            "https://rest.ensembl.org/vep",
+            self.EnsEMBL.getVariantConsequencesByHGVSNotation,
+            species="human",
+            hgvs_notation="AGT:c.803T>C",
+        )
+        self.assertEqual(len(self.session.calls), 4)
+
+        self.EnsEMBL.getLookupById(id="ENSG00000157764")
+        self.assertEqual(len(self.session.calls), 5)
+
+    def test_recovery(self) -> None:
+        """A successful probe closes the circuit"""
+
+        self.EnsEMBL.max_attempts = 0
+
+        for _ in range(4):
+            with self.assertRaises(EnsemblRestError):
+                self.EnsEMBL.getVariantConsequencesById(
+                    species="human", id="rs56116432"
+                )
+
+        self.assertEqual(
+            list(self.EnsEMBL.circuit_breaker.states.values()),  # type: ignore[union-attr]
+            [OPEN],
+        )
+
+        self.healthy = True
+        time.sleep(0.11)
+
+        self.EnsEMBL.getVariantConsequencesById(species="human", id="rs56116432")
+        self.EnsEMBL.getVariantConsequencesById(species="human", id="rs56116433")
+
+        self.assertEqual(len(self.session.calls), 6)
+
+    def test_clientErrors(self) -> None:
+        """Bad requests don't open a circuit"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=400, text='{"error": "bad"}'
+        )
+
+        for _ in range(10):
+            with self.assertRaises(EnsemblRestError) as context:
+                self.EnsEMBL.getLookupById(id="meow")
+
+            self.assertNotIsInstance(context.exception, EnsemblRestCircuitOpen)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,473 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.cache import MemoryCache, SQLiteCache
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestError
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+
+from .fakes import FakeSession, status
+
+
+class MemoryCacheTest(unittest.TestCase):
+    """A class to test the in-memory response cache"""
+
+    def test_lru(self) -> None:
+        """The least recently used entries are evicted first"""
+
+        cache = MemoryCache(maxsize=2)
+        cache.set("first", 1)
+        cache.set("second", 2)
+
+        # use first, so second is the least recently used
+        self.assertEqual(cache.get("first").content, 1)  # type: ignore[union-attr]
+        cache.set("third", 3)
+
+        self.assertIsNone(cache.get("second"))
+        self.assertEqual(cache.get("third").content, 3)  # type: ignore[union-attr]
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self) -> None:
+        """Expired entries are not returned"""
+
+        cache = MemoryCache(ttl=0.05)
+        cache.set("default", 1)
+        cache.set("longer", 2, ttl=60)
+        time.sleep(0.06)
+
+        self.assertIsNone(cache.get("default"))
+        self.assertEqual(cache.get("longer").content, 2)  # type: ignore[union-attr]
+
+    def test_namespace(self) -> None:
+        """Changing namespace removes entries of other namespaces"""
+
+        cache = MemoryCache()
+        cache.set_namespace("112")
+        cache.set("old", 1)
+        cache.set_namespace("113")
+        cache.set("new", 2)
+
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(cache.get("new").content, 2)  # type: ignore[union-attr]
+        self.assertEqual(len(cache), 1)
+
+    def test_stats(self) -> None:
+        """Hits and misses are counted"""
+
+        cache = MemoryCache()
+        cache.get("missing")
+        cache.set("key", 1)
+        cache.get("key")
+        cache.get("key")
+
+        self.assertEqual(cache.stats, {"hits": 2, "misses": 1, "size": 1})
+
+    def test_stale(self) -> None:
+        """Expired entries with validators may be revalidated"""
+
+        cache = MemoryCache()
+        cache.set("etag", 1, ttl=-1, etag='"v1"')
+        cache.set("plain", 2, ttl=-1)
+
+        self.assertIsNone(cache.get("etag"))
+        entry = cache.get("etag", stale=True)
+        self.assertEqual(entry.validators, {"If-None-Match": '"v1"'})  # type: ignore[union-attr]
+        self.assertIsNone(cache.get("plain", stale=True))
+
+        cache.refresh("etag", entry)  # type: ignore[arg-type]
+        self.assertEqual(cache.get("etag").content, 1)  # type: ignore[union-attr]
+
+
+def read_entry(
+    cache: SQLiteCache, key: str, found: "multiprocessing.Queue[bool]"
+) -> None:
+    """Read an entry from a child process"""
+    found.put(cache.get(key) is not None)
+
+
+class SQLiteCacheTest(unittest.TestCase):
+    """A class to test the persistent response cache"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_persistence(self) -> None:
+        """Entries outlive the cache object that stored them"""
+
+        content = {"id": "ENSG00000157764", "seq": "ACGT" * 1000}
+        SQLiteCache(self.path).set("key", content)
+
+        cache = SQLiteCache(self.path)
+        self.assertEqual(cache.get("key").content, content)  # type: ignore[union-attr]
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 0, "size": 1})
+
+        # payloads are compressed
+        size = cache.connection.execute("SELECT size FROM entries").fetchone()[0]
+        self.assertLess(size, 200)
+
+    def test_ttl(self) -> None:
+        """Expired entries are not returned"""
+
+        cache = SQLiteCache(self.path, ttl=0.05)
+        cache.set("key", "ACGT")
+        time.sleep(0.06)
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_namespace(self) -> None:
+        """Entries of other namespaces are removed in bulk"""
+
+        cache = SQLiteCache(self.path)
+        cache.set_namespace("112")
+        cache.set("old", 1)
+
+        # a new run, once it learnt the release
+        cache = SQLiteCache(self.path)
+        cache.set_namespace("113")
+
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(len(cache), 0)
+
+    def test_error(self) -> None:
+        """Negative entries keep their error message"""
+
+        SQLiteCache(self.path).set("key", None, error="ID 'meow' not found")
+
+        entry = SQLiteCache(self.path).get("key")
+        self.assertEqual(entry.error, "ID 'meow' not found")  # type: ignore[union-attr]
+
+    def test_refresh(self) -> None:
+        """Refreshed entries are fresh again, with the same content"""
+
+        cache = SQLiteCache(self.path)
+        cache.set("key", "ACGT", ttl=-1, last_modified="Tue, 01 Jul 2025 00:00:00 GMT")
+
+        entry = cache.get("key", stale=True)
+        self.assertIsNotNone(entry)
+        self.assertFalse(entry.fresh)  # type: ignore[union-attr]
+
+        cache.refresh("key", entry)  # type: ignore[arg-type]
+
+        entry = SQLiteCache(self.path).get("key")
+        self.assertEqual(entry.content, "ACGT")  # type: ignore[union-attr]
+        self.assertEqual(
+            entry.validators,  # type: ignore[union-attr]
+            {"If-Modified-Since": "Tue, 01 Jul 2025 00:00:00 GMT"},
+        )
+
+    def test_evict(self) -> None:
+        """The least recently used entries are evicted beyond max_size"""
+
+        cache = SQLiteCache(self.path, max_size=100)
+        cache.evict_every = 1
+        cache.touch_interval = 0
+
+        # incompressible payloads of about 40 bytes
+        for key in ["first", "second", "third", "fourth"]:
+            cache.set(key, os.urandom(20).hex())
+            cache.get("first")
+
+        self.assertIsNotNone(cache.get("first"))
+        self.assertIsNone(cache.get("second"))
+        self.assertIsNotNone(cache.get("fourth"))
+
+    def test_processes(self) -> None:
+        """Other processes read the same entries"""
+
+        cache = SQLiteCache(self.path)
+        cache.set("key", [1, 2, 3])
+        cache.get("key")
+
+        context = multiprocessing.get_context("fork")
+        found: "multiprocessing.Queue[bool]" = context.Queue()
+        processes = [
+            context.Process(target=read_entry, args=(cache, "key", found))
+            for _ in range(4)
+        ]
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+        self.assertEqual([found.get() for _ in processes], [True] * 4)
+
+
+class EnsemblRestCache(unittest.TestCase):
+    """A class to test cached responses"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.cache = MemoryCache()
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            rate_limiter=TokenBucket(rate=1000), cache=self.cache
+        )
+        self.session = FakeSession().install(self.EnsEMBL)
+
+    def test_hit(self) -> None:
+        """The same request is sent once"""
+
+        first = self.EnsEMBL.getLookupById(
+            id="ENSG00000157764", expand=1, format="full"
+        )
+        second = self.EnsEMBL.getLookupById(
+            format="full", id="ENSG00000157764", expand=1
+        )
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_miss(self) -> None:
+        """Requests differing by params, data or content type are sent"""
+
+        self.EnsEMBL.getLookupById(id="ENSG00000157764")
+        self.EnsEMBL.getLookupById(id="ENSG00000157764", expand=1)
+        self.EnsEMBL.getLookupById(id="ENSG00000157764", content_type="text/xml")
+        self.EnsEMBL.getLookupByMultipleIds(ids=["ENSG00000157764"])
+        self.EnsEMBL.getLookupByMultipleIds(ids=["ENSG00000248378"])
+
+        self.assertEqual(len(self.session.calls), 5)
+        self.assertEqual(self.cache.stats["hits"], 0)
+
+    def test_endpointTtl(self) -> None:
+        """Endpoints may set their own ttl, or never be cached"""
+
+        self.EnsEMBL.getInfoPing()
+        self.EnsEMBL.getInfoPing()
+        self.EnsEMBL.getInfoSpecies()
+
+        self.assertEqual(len(self.session.calls), 3)
+        self.assertEqual(len(self.cache), 1)
+
+        entry = next(iter(self.cache.entries.values()))
+        self.assertGreater(entry.expires, time.time() + 3600)
+
+    def test_sqlite(self) -> None:
+        """A new client is served by the persistent cache of a previous one"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+
+            self.EnsEMBL.cache = SQLiteCache(path)
+            first = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+            EnsEMBL = pyensemblrest.EnsemblRest(cache=SQLiteCache(path))
+            session = FakeSession().install(EnsEMBL)
+
+            self.assertEqual(EnsEMBL.getLookupById(id="ENSG00000157764"), first)
+            self.assertEqual(len(session.calls), 0)
+
+
+class EnsemblRestRelease(unittest.TestCase):
+    """A class to test cached responses across Ensembl releases"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object checking the release at each request"""
+        self.cache = MemoryCache()
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            rate_limiter=TokenBucket(rate=1000), cache=self.cache
+        )
+        self.EnsEMBL.release_check_interval = 0
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+        self.release = 112
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer with the current release"""
+
+        if url.endswith("/info/data"):
+            content: Any = {"releases": [self.release]}
+        else:
+            content = {"url": url, "release": self.release}
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps(content))
+
+    def test_release(self) -> None:
+        """A new release invalidates cached responses"""
+
+        first = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+        second = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.namespace, "112")
+
+        self.release = 113
+        third = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertEqual(third["release"], 113)
+        self.assertEqual(self.cache.namespace, "113")
+
+        lookups = [call for call in self.session.calls if "/lookup/" in call[1]]
+        self.assertEqual(len(lookups), 2)
+
+    def test_interval(self) -> None:
+        """The release is checked once per interval"""
+
+        self.EnsEMBL.release_check_interval = 3600
+
+        for _ in range(3):
+            self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        releases = [call for call in self.session.calls if "/info/data" in call[1]]
+        self.assertEqual(len(releases), 1)
+
+
+class EnsemblRestConditional(unittest.TestCase):
+    """A class to test expired responses revalidated by conditional requests"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a server sending ETags"""
+        self.cache = MemoryCache()
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            rate_limiter=TokenBucket(rate=1000), cache=self.cache
+        )
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+        self.version = "v1"
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer 304 if the client has the current version"""
+
+        headers = {"ETag": '"%s"' % self.version}
+
+        if self.session.headers[-1].get("If-None-Match") == headers["ETag"]:
+            return FakeResponse(headers=headers, status_code=304, text="")
+
+        content = {"version": self.version}
+        return FakeResponse(headers=headers, status_code=200, text=json.dumps(content))
+
+    def __expire(self) -> None:
+        for entry in self.cache.entries.values():
+            entry.expires = time.time() - 1
+
+    def test_notModified(self) -> None:
+        """A 304 response refreshes the expired entry"""
+
+        first = self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+        self.__expire()
+        second = self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+
+        self.assertIs(second, first)
+        self.assertEqual(self.session.headers[1]["If-None-Match"], '"v1"')
+        self.assertEqual(self.EnsEMBL.last_response.status_code, 304)
+
+        # fresh again
+        self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_modified(self) -> None:
+        """A changed response replaces the expired entry"""
+
+        self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+        self.__expire()
+        self.version = "v2"
+
+        test = self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+
+        self.assertEqual(test, {"version": "v2"})
+        self.assertEqual(
+            next(iter(self.cache.entries.values())).etag,
+            '"v2"',
+        )
+
+    def test_fresh(self) -> None:
+        """Requests without an expired entry are not conditional"""
+
+        self.EnsEMBL.getGeneTreeById(id="ENSGT00390000003602")
+
+        self.assertNotIn("If-None-Match", self.session.headers[0])
+
+
+class EnsemblRestNegativeCache(unittest.TestCase):
+    """A class to test cached "not found" errors"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object caching errors"""
+        self.cache = MemoryCache()
+        self.limiter = TokenBucket(rate=1000)
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            rate_limiter=self.limiter, cache=self.cache
+        )
+        self.EnsEMBL.negative_cache_ttl = 3600
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.session = FakeSession(
+            status(400, json.dumps({"error": "ID 'meow' not found"}))
+        ).install(self.EnsEMBL)
+
+    def test_notFound(self) -> None:
+        """A not found error is raised again without sending the request"""
+
+        for _ in range(3):
+            with self.assertRaisesRegex(EnsemblRestError, "ID 'meow' not found"):
+                self.EnsEMBL.getLookupById(id="meow")
+
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertEqual(self.cache.stats["hits"], 2)
+
+        # no rate limit token was spent by cached errors
+        tokens = self.limiter.tokens
+        with self.assertRaises(EnsemblRestError):
+            self.EnsEMBL.getLookupById(id="meow")
+        self.assertGreaterEqual(self.limiter.tokens, tokens)
+
+    def test_disabled(self) -> None:
+        """Errors are not cached by default"""
+
+        self.EnsEMBL.negative_cache_ttl = None
+
+        for _ in range(2):
+            with self.assertRaises(EnsemblRestError):
+                self.EnsEMBL.getLookupById(id="meow")
+
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_otherErrors(self) -> None:
+        """Errors which may go away are never cached"""
+
+        self.EnsEMBL.max_attempts = 1
+
+        for responder in [
+            status(400, json.dumps({"error": "something bad has happened"})),
+            status(400, json.dumps({"error": "Missing parameter"})),
+            status(404),
+            status(500),
+        ]:
+            self.session.responder = responder
+            self.session.calls.clear()
+
+            for _ in range(2):
+                with self.assertRaises(EnsemblRestError):
+                    self.EnsEMBL.getArchiveById(id="meow")
+
+            self.assertGreaterEqual(len(self.session.calls), 2)
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_release(self) -> None:
+        """Cached errors are dropped with the release they belong to"""
+
+        with self.assertRaises(EnsemblRestError):
+            self.EnsEMBL.getLookupById(id="meow")
+
+        self.cache.set_namespace("113")
+        self.session.responder = FakeSession().responder
+
+        self.assertIn("/meow", self.EnsEMBL.getLookupById(id="meow")["url"])
+
+
+if __name__ == "__main__":
+    unittest.main()
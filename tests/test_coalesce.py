@@ -0,0 +1,376 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.cache import MemoryCache
+from pyensemblrest.coalesce import Coalescer, SingleFlight
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestError
+from pyensemblrest.ratelimit import TokenBucket
+
+from .fakes import FakeSession, status
+
+
+def batch(method: str, url: str, params: dict[str, Any], data: Any) -> FakeResponse:
+    """Answer as POST lookup and VEP endpoints do. Unknown ids are not found"""
+
+    ids = [id for id in data["ids"] if not id.startswith("unknown")]
+
+    if "/vep/" in url:
+        content: Any = [{"input": id, "most_severe_consequence": "?"} for id in ids]
+    else:
+        content = {id: {"id": id} for id in ids}
+
+    return FakeResponse(headers={}, status_code=200, text=json.dumps(content))
+
+
+class CoalescerTest(unittest.TestCase):
+    """A class to test the coalescer"""
+
+    def test_window(self) -> None:
+        """Items submitted within the window are dispatched together"""
+
+        batches: list[list[Any]] = []
+
+        def dispatch(items: list[Any]) -> dict[Any, Any]:
+            batches.append(items)
+            return {item: item * 2 for item in items}
+
+        coalescer = Coalescer(window=0.05)
+        futures = [coalescer.submit("group", i, dispatch) for i in range(10)]
+        futures.append(coalescer.submit("group", 1, dispatch))
+
+        self.assertEqual(
+            [future.result() for future in futures], [i * 2 for i in range(10)] + [2]
+        )
+        self.assertEqual(batches, [list(range(10))])
+
+    def test_maxSize(self) -> None:
+        """A full batch is dispatched at once"""
+
+        batches: list[list[Any]] = []
+
+        def dispatch(items: list[Any]) -> dict[Any, Any]:
+            batches.append(items)
+            return {item: item for item in items}
+
+        coalescer = Coalescer(window=10, max_size=5)
+        futures = [coalescer.submit("group", i, dispatch, max_size=3) for i in range(6)]
+
+        self.assertEqual(
+            [future.result(timeout=1) for future in futures], list(range(6))
+        )
+        # full batches are dispatched by their own threads, in any order
+        self.assertEqual(sorted(batches), [[0, 1, 2], [3, 4, 5]])
+
+    def test_maxSizeThreads(self) -> None:
+        """Batches of concurrent callers never grow over max_size"""
+
+        batches: list[list[Any]] = []
+        lock = threading.Lock()
+
+        def dispatch(items: list[Any]) -> dict[Any, Any]:
+            time.sleep(0.001)
+
+            with lock:
+                batches.append(items)
+
+            return {item: item for item in items}
+
+        coalescer = Coalescer(window=0.05, max_size=3)
+
+        def submit(start: int) -> list[Any]:
+            futures = [
+                coalescer.submit("group", start + i, dispatch) for i in range(30)
+            ]
+            return [future.result(timeout=5) for future in futures]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(submit, range(0, 240, 30)))
+
+        self.assertEqual(sum(results, []), list(range(240)))
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+
+    def test_errors(self) -> None:
+        """A failed batch fails each caller, missing items fail alone"""
+
+        def dispatch(items: list[Any]) -> dict[Any, Any]:
+            if "boom" in items:
+                raise ValueError("boom")
+            return {"found": 1}
+
+        coalescer = Coalescer(window=0.01)
+        found = coalescer.submit("first", "found", dispatch)
+        missing = coalescer.submit("first", "missing", dispatch)
+        boom = coalescer.submit("second", "boom", dispatch)
+
+        self.assertEqual(found.result(), 1)
+        self.assertRaises(KeyError, missing.result)
+        self.assertRaises(ValueError, boom.result)
+
+
+class SingleFlightTest(unittest.TestCase):
+    """A class to test calls shared between concurrent callers"""
+
+    def test_shared(self) -> None:
+        """Concurrent callers of the same key share one call"""
+
+        single_flight = SingleFlight()
+        future, leader = single_flight.join("key")
+        waiting, follower = single_flight.join("key")
+
+        self.assertTrue(leader)
+        self.assertFalse(follower)
+        self.assertIs(waiting, future)
+
+        single_flight.finish("key", future, 42)
+        self.assertEqual(waiting.result(), 42)
+
+        # the call is over, the next caller makes a new one
+        self.assertTrue(single_flight.join("key")[1])
+
+    def test_error(self) -> None:
+        """Waiting callers get the exception of the call"""
+
+        single_flight = SingleFlight()
+        future, _ = single_flight.join("key")
+        waiting, _ = single_flight.join("key")
+
+        self.assertRaises(ValueError, single_flight.call, "other", lambda: int("meow"))
+
+        single_flight.finish("key", future, error=ValueError("boom"))
+        self.assertRaises(ValueError, waiting.result)
+        self.assertEqual(single_flight.calls, {})
+
+
+class EnsemblRestSingleFlight(unittest.TestCase):
+    """A class to test identical requests sent at once"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a slow fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.session = FakeSession(delay=0.1).install(self.EnsEMBL)
+
+    def __call(self, species: str) -> Any:
+        return self.EnsEMBL.getInfoAssembly(species=species)
+
+    def test_shared(self) -> None:
+        """Identical concurrent requests are sent once"""
+
+        species = ["homo_sapiens"] * 10 + ["mus_musculus"] * 10
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(self.__call, species))
+
+        self.assertEqual(len(self.session.calls), 2)
+        self.assertEqual(results[0], results[9])
+        self.assertNotEqual(results[0], results[10])
+
+    def test_error(self) -> None:
+        """Every caller of a failed request gets its error"""
+
+        self.session.responder = status(404)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(self.__call, "meow") for _ in range(10)]
+
+        for future in futures:
+            self.assertIsInstance(future.exception(), EnsemblRestError)
+
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_disabled(self) -> None:
+        """Without single flight, every request is sent"""
+
+        self.EnsEMBL.single_flight = None
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            list(executor.map(self.__call, ["homo_sapiens"] * 5))
+
+        self.assertEqual(len(self.session.calls), 5)
+
+
+class EnsemblRestCoalesce(unittest.TestCase):
+    """A class to test single identifier requests sent in batches"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            rate_limiter=TokenBucket(rate=1000), coalescer=Coalescer(window=0.05)
+        )
+        self.session = FakeSession(batch).install(self.EnsEMBL)
+
+    def test_lookup(self) -> None:
+        """Concurrent lookups are sent in a single POST request"""
+
+        ids = ["ENSG%011d" % i for i in range(20)]
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(
+                executor.map(
+                    lambda id: self.EnsEMBL.getLookupById(id=id, expand=1), ids
+                )
+            )
+
+        self.assertEqual(results, [{"id": id} for id in ids])
+        self.assertEqual(len(self.session.calls), 1)
+
+        method, url, params, data = self.session.calls[0]
+        self.assertEqual(method, "POST")
+        self.assertEqual(url, "https://rest.ensembl.org/lookup/id")
+        self.assertEqual(params, {"expand": 1})
+        self.assertEqual(sorted(data["ids"]), ids)
+
+    def test_cache(self) -> None:
+        """Coalesced results are cached under the request of each identifier"""
+
+        self.EnsEMBL.cache = MemoryCache()
+        self.EnsEMBL.release_check_interval = None
+        self.EnsEMBL.negative_cache_ttl = 3600
+        ids = ["A", "B", "C", "unknown"]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self.__lookup, ids))
+
+        self.assertEqual(
+            [self.__lookup(id) for id in ids],
+            [{"id": "A"}, {"id": "B"}, {"id": "C"}, None],
+        )
+        self.assertEqual(len(self.session.calls), 1)
+
+    def __lookup(self, id: str) -> Any:
+        """Look up an identifier, None if it is not found"""
+
+        try:
+            return self.EnsEMBL.getLookupById(id=id)
+
+        except EnsemblRestError:
+            return None
+
+    def test_notFound(self) -> None:
+        """An identifier missing from the batch response raises an error"""
+
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "ID 'unknown' not found",
+            self.EnsEMBL.getLookupById,
+            id="unknown",
+        )
+
+    def test_variantConsequences(self) -> None:
+        """VEP results are found by input, and returned in a list"""
+
+        test = self.EnsEMBL.getVariantConsequencesById(species="human", id="rs56116432")
+
+        self.assertEqual(
+            test, [{"input": "rs56116432", "most_severe_consequence": "?"}]
+        )
+        self.assertEqual(
+            self.session.calls[0][1], "https://rest.ensembl.org/vep/human/id"
+        )
+
+    def test_sequences(self) -> None:
+        """Several sequences of an identifier are returned in a list"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={},
+            status_code=200,
+            text=json.dumps(
+                [
+                    {"query": "ENSG00000157764", "id": "ENST1", "seq": "ACGT"},
+                    {"query": "ENSG00000157764", "id": "ENST2", "seq": "TTGA"},
+                ]
+            ),
+        )
+
+        test = self.EnsEMBL.getSequenceById(id="ENSG00000157764", type="cdna")
+
+        self.assertEqual([item["id"] for item in test], ["ENST1", "ENST2"])
+        self.assertEqual(self.session.calls[0][0], "POST")
+
+    def test_multipleSequences(self) -> None:
+        """Requests of multiple sequences are sent as they are"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=200, text=json.dumps([{"id": "ENST1"}])
+        )
+
+        test = self.EnsEMBL.getSequenceById(id="ENSG00000157764", multiple_sequences=1)
+
+        self.assertEqual(test, [{"id": "ENST1"}])
+        self.assertEqual(self.session.calls[0][0], "GET")
+
+    def test_contentType(self) -> None:
+        """Requests with a content type are sent as they are"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=200, text="<xml/>"
+        )
+
+        self.EnsEMBL.getLookupById(id="ENSG00000157764", content_type="text/xml")
+
+        self.assertEqual(self.session.calls[0][0], "GET")
+
+
+class AsyncEnsemblRestCoalesce(unittest.IsolatedAsyncioTestCase):
+    """A class to test coalescing with the asyncio client"""
+
+    async def test_lookup(self) -> None:
+        """Concurrent tasks are sent in a single POST request"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(
+            rate_limiter=TokenBucket(rate=1000), coalescer=Coalescer(window=0.05)
+        )
+        session = FakeSession(batch).install(EnsEMBL)
+
+        ids = ["ENSG%011d" % i for i in range(20)]
+        results = await asyncio.gather(
+            *[EnsEMBL.getLookupById(id=id) for id in ids]  # type: ignore[attr-defined]
+        )
+        EnsEMBL.close()
+
+        self.assertEqual(list(results), [{"id": id} for id in ids])
+        self.assertEqual(len(session.calls), 1)
+
+    async def test_cache(self) -> None:
+        """Coalesced results are cached under the request of each identifier"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(
+            rate_limiter=TokenBucket(rate=1000),
+            coalescer=Coalescer(window=0.05),
+            cache=MemoryCache(),
+        )
+        EnsEMBL.release_check_interval = None
+        session = FakeSession(batch).install(EnsEMBL)
+
+        await asyncio.gather(
+            *[EnsEMBL.getLookupById(id=id) for id in "ABC"]  # type: ignore[attr-defined]
+        )
+        results = [await EnsEMBL.getLookupById(id=id) for id in "AB"]  # type: ignore[attr-defined]
+        EnsEMBL.close()
+
+        self.assertEqual(results, [{"id": "A"}, {"id": "B"}])
+        self.assertEqual(len(session.calls), 1)
+
+    async def test_singleFlight(self) -> None:
+        """Identical concurrent tasks share one request"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        session = FakeSession(delay=0.05).install(EnsEMBL)
+
+        results = await asyncio.gather(
+            *[EnsEMBL.getInfoAssembly(species="homo_sapiens") for _ in range(10)]  # type: ignore[attr-defined]
+        )
+        EnsEMBL.close()
+
+        self.assertEqual(len(set(json.dumps(result) for result in results)), 1)
+        self.assertEqual(len(session.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+import importlib.util
+import json
+import math
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.cache import MemoryCache
+from pyensemblrest.columnar import Categorical, Columns, to_columns
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.streaming import iter_json
+
+from .fakes import FakeSession
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PANDAS = importlib.util.find_spec("pandas") is not None
+
+OVERLAP = [
+    {
+        "id": "ENSG%011d" % i,
+        "feature_type": "gene",
+        "seq_region_name": "7",
+        "start": 140424943 + i,
+        "end": 140624564 + i,
+        "strand": -1 if i % 2 else 1,
+        "biotype": "protein_coding",
+        "version": 14,
+    }
+    for i in range(3)
+]
+
+LD = [
+    {
+        "variation1": "rs1042779",
+        "variation2": "rs%d" % (1042780 + i),
+        "r2": "0.%d" % (i + 1),
+        "d_prime": "1.000000",
+        "population_name": "1000GENOMES:phase_3:KHV",
+    }
+    for i in range(3)
+]
+
+
+class ColumnsTest(unittest.TestCase):
+    """A class to test columnar results"""
+
+    def test_types(self) -> None:
+        """Integers, floats and strings go to typed and encoded columns"""
+
+        columns = to_columns("getOverlapByRegion", OVERLAP)
+
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns["start"].typecode, "q")  # type: ignore[union-attr]
+        self.assertEqual(columns["strand"].typecode, "b")  # type: ignore[union-attr]
+        self.assertEqual(list(columns["strand"]), [1, -1, 1])
+        self.assertIsInstance(columns["biotype"], Categorical)
+        self.assertEqual(columns["biotype"].categories, ["protein_coding"])  # type: ignore[union-attr]
+        self.assertEqual(list(columns.rows()), OVERLAP)
+
+    def test_ld(self) -> None:
+        """r2 and d_prime strings of LD endpoints are floats"""
+
+        columns = to_columns("getLdId", LD)
+
+        self.assertEqual(columns["r2"].typecode, "f")  # type: ignore[union-attr]
+        self.assertAlmostEqual(columns["r2"][2], 0.3, places=6)  # type: ignore[arg-type]
+        self.assertEqual(list(columns["population_name"].codes), [0, 0, 0])  # type: ignore[union-attr]
+
+    def test_missing(self) -> None:
+        """Missing values are NaN floats, -1 codes or None"""
+
+        columns = Columns().extend(
+            [
+                {"name": "a", "count": 1, "tags": ["x"]},
+                {"count": None},
+                {"name": None, "MAF": 0.25},
+                {"name": "a", "count": 2, "tags": None},
+            ]
+        )
+
+        self.assertEqual(columns.names, ["name", "count", "tags", "MAF"])
+        self.assertEqual(list(columns["name"].codes), [0, -1, -1, 0])  # type: ignore[union-attr]
+        self.assertEqual(columns["count"].typecode, "d")  # type: ignore[union-attr]
+        self.assertTrue(math.isnan(columns["count"][1]))  # type: ignore[arg-type]
+        self.assertEqual(columns["count"][3], 2.0)
+        self.assertEqual(columns["tags"], [["x"], None, None, None])
+        self.assertTrue(math.isnan(columns["MAF"][0]))  # type: ignore[arg-type]
+        self.assertEqual(columns["MAF"][2], 0.25)
+
+    def test_mixed(self) -> None:
+        """Columns of values of several types keep the values"""
+
+        columns = Columns().extend(
+            [{"a": 1, "b": "x"}, {"a": "one", "b": 2}, {"a": True, "b": "x"}]
+        )
+
+        self.assertEqual(columns["a"], [1, "one", True])
+        self.assertEqual(columns["b"], ["x", 2, "x"])
+
+    def test_promoted(self) -> None:
+        """Integer columns getting floats are float64, bools are kept as they are"""
+
+        columns = Columns().extend(
+            [
+                {"score": 1, "flag": 1, "strand": 1},
+                {"score": 2.5, "flag": True, "strand": 300},
+                {"flag": 0, "strand": -1},
+            ]
+        )
+
+        self.assertEqual(columns["score"].typecode, "d")  # type: ignore[union-attr]
+        self.assertEqual(list(columns["score"])[:2], [1.0, 2.5])
+        self.assertTrue(math.isnan(columns["score"][2]))  # type: ignore[arg-type]
+        self.assertEqual(columns["flag"], [1, True, 0])
+        self.assertIs(columns["flag"][1], True)
+        self.assertEqual(columns["strand"].typecode, "q")  # type: ignore[union-attr]
+        self.assertEqual(list(columns["strand"]), [1, 300, -1])
+
+    def test_content(self) -> None:
+        """Single objects, objects by identifier and iterators are tables"""
+
+        single = to_columns("getLookupById", OVERLAP[0])
+        multiple = to_columns(
+            "getLookupByMultipleIds", {"a": OVERLAP[0], "b": None, "c": OVERLAP[1]}
+        )
+        streamed = to_columns(
+            "getOverlapByRegion", iter_json([json.dumps(OVERLAP).encode()])
+        )
+
+        self.assertEqual(len(single), 1)
+        self.assertEqual(list(multiple["id"]), [OVERLAP[0]["id"], OVERLAP[1]["id"]])
+        self.assertEqual(list(streamed.rows()), OVERLAP)
+        self.assertRaises(ValueError, to_columns, "getSequenceById", "ACGT")
+        self.assertRaises(ValueError, to_columns, "getSequenceById", iter(["ACGT"]))
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_numpy(self) -> None:
+        """Typed columns are NumPy arrays"""
+
+        arrays = to_columns("getOverlapByRegion", OVERLAP).to_numpy()
+
+        self.assertEqual(str(arrays["start"].dtype), "int64")
+        self.assertEqual(list(arrays["biotype"]), [0, 0, 0])
+
+    @unittest.skipUnless(HAS_PANDAS, "pandas is not installed")
+    def test_pandas(self) -> None:
+        """Encoded strings are categorical columns of a DataFrame"""
+
+        frame = to_columns("getLdId", LD).to_pandas()
+
+        self.assertEqual(str(frame["population_name"].dtype), "category")
+        self.assertEqual(list(frame["variation2"]), [row["variation2"] for row in LD])
+
+
+class EnsemblRestColumns(unittest.TestCase):
+    """A class to test columns with a client"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer overlaps, LD and lookups"""
+
+        if "/overlap/" in url:
+            content: Any = OVERLAP
+        elif "/ld/" in url:
+            content = LD
+        else:
+            content = {feature["id"]: feature for feature in OVERLAP}
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps(content))
+
+    def test_output(self) -> None:
+        """Columns are built from streamed arrays"""
+
+        columns = self.EnsEMBL.getOverlapByRegion(
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            output="columns",
+        )
+        ld = self.EnsEMBL.getLdId(
+            species="human",
+            id="rs1042779",
+            population_name="1000GENOMES:phase_3:KHV",
+            output="columns",
+        )
+
+        self.assertIsInstance(columns, Columns)
+        self.assertEqual(list(columns["start"]), [f["start"] for f in OVERLAP])
+        self.assertEqual(ld["d_prime"].typecode, "f")
+        self.assertNotIn("output", self.session.calls[0][2])
+
+    def test_cached(self) -> None:
+        """With a cache, columns are built from cached responses, not streamed"""
+
+        self.EnsEMBL.cache = MemoryCache()
+        self.EnsEMBL.release_check_interval = None
+
+        for _ in range(2):
+            columns = self.EnsEMBL.getOverlapByRegion(
+                species="human",
+                region="7:140424943-140624564",
+                feature="gene",
+                output="columns",
+            )
+            self.assertEqual(list(columns.rows()), OVERLAP)
+
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_streamed(self) -> None:
+        """Only arrays of overlap and LD endpoints are streamed by default"""
+
+        stream = self.EnsEMBL._stream_output
+
+        self.assertTrue(stream("getLdRegion", "columns", {}))
+        self.assertFalse(stream("getLdRegion", "columns", {"stream": False}))
+        self.assertFalse(stream("getLdRegion", "records", {}))
+        self.assertFalse(stream("getVariationById", "columns", {}))
+        self.assertFalse(stream("getLookupByMultipleIds", "columns", {}))
+
+    def test_multiple(self) -> None:
+        """Objects of multiple identifier endpoints are rows"""
+
+        columns = self.EnsEMBL.getLookupByMultipleIds(
+            ids=[feature["id"] for feature in OVERLAP], output="columns"
+        )
+
+        self.assertEqual(list(columns["id"]), [f["id"] for f in OVERLAP])
+
+
+class AsyncEnsemblRestColumns(unittest.IsolatedAsyncioTestCase):
+    """A class to test columns with the asyncio client"""
+
+    async def test_output(self) -> None:
+        """Columns are built from streamed arrays"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        FakeSession(
+            lambda method, url, params, data: FakeResponse(
+                headers={}, status_code=200, text=json.dumps(OVERLAP)
+            )
+        ).install(EnsEMBL)
+
+        for stream in (True, False):
+            columns = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+                species="human",
+                region="7:140424943-140624564",
+                feature="gene",
+                output="columns",
+                stream=stream,
+            )
+            self.assertEqual(list(columns.rows()), OVERLAP)
+
+        EnsEMBL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
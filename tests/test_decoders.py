@@ -0,0 +1,80 @@
+import json
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.decoders import (
+    HAS_ORJSON,
+    default_decoder,
+    orjson_decoder,
+    stdlib_decoder,
+)
+from pyensemblrest.ratelimit import TokenBucket
+
+from .fakes import FakeSession
+
+DOCUMENT = {
+    "rs56116432": {
+        "name": "rs56116432",
+        "MAF": 0.0002,
+        "mappings": [{"start": 133256042, "strand": 1, "ancestral_allele": None}],
+        "synonyms": ["COSM3762", "café ☃"],
+        "failed": False,
+    }
+}
+
+
+class DecodersTest(unittest.TestCase):
+    """A class to test JSON decoders"""
+
+    def test_stdlib(self) -> None:
+        """The standard library decodes UTF-8 bytes"""
+
+        content = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+        self.assertEqual(stdlib_decoder(content), DOCUMENT)
+
+    @unittest.skipUnless(HAS_ORJSON, "orjson is not installed")
+    def test_orjson(self) -> None:
+        """orjson decodes as the standard library"""
+
+        content = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+        self.assertEqual(orjson_decoder(content), stdlib_decoder(content))
+        self.assertIs(default_decoder(), orjson_decoder)
+
+    def test_default(self) -> None:
+        """The default decoder falls back to the standard library"""
+
+        if not HAS_ORJSON:
+            self.assertIs(default_decoder(), stdlib_decoder)
+
+        self.assertEqual(default_decoder()(b"[1, 2.5, null]"), [1, 2.5, None])
+
+
+class EnsemblRestDecoder(unittest.TestCase):
+    """A class to test the JSON decoder of a client"""
+
+    def test_hook(self) -> None:
+        """Response bodies are given as bytes to the JSON decoder"""
+
+        EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        FakeSession().install(EnsEMBL)
+        bodies: list[Any] = []
+
+        def decoder(content: bytes) -> Any:
+            bodies.append(content)
+            return stdlib_decoder(content)
+
+        EnsEMBL.json_decoder = decoder
+        test = EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertIn("ENSG00000157764", test["url"])
+        self.assertEqual(len(bodies), 1)
+        self.assertIsInstance(bodies[0], bytes)
+
+        # other content types are not decoded
+        EnsEMBL.getSequenceById(id="ENSG00000157764", content_type="text/x-fasta")
+        self.assertEqual(len(bodies), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
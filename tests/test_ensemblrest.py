@@ -6,6 +6,7 @@ import subprocess
 import time
 import unittest
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import pytest
@@ -13,6 +14,11 @@ from requests import Response
 
 import pyensemblrest
 from pyensemblrest.ensemblrest import FakeResponse, ensembl_user_agent
+from pyensemblrest.exceptions import EnsemblRestError
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+
+from .fakes import FakeSession
 
 # logger instance
 logger = logging.getLogger(__name__)
@@ -364,13 +370,15 @@ class EnsemblRestBase(EnsemblRest):
     def test_wait4request(self) -> None:
         """Simulating max request per second"""
 
+        # a bucket holding a single token, refilled every half second
+        self.EnsEMBL.rate_limiter = TokenBucket(rate=2, capacity=1)
+
+        start = time.monotonic()
         self.EnsEMBL.getArchiveById(id="ENSG00000157764")
-        self.EnsEMBL.req_count = 15
-        self.EnsEMBL.last_req += 2
         self.EnsEMBL.getArchiveById(id="ENSG00000157764")
 
-        # check request count has reset to zero
-        self.assertEqual(self.EnsEMBL.req_count, 0)
+        # check the second request waited for a new token
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
 
     @pytest.mark.live
     def test_methodNotImplemented(self) -> None:
@@ -491,6 +499,165 @@ class EnsemblRestBase(EnsemblRest):
         self.assertGreaterEqual(self.EnsEMBL.last_attempt, 1)
 
 
+class EnsemblRestThreads(unittest.TestCase):
+    """A class to deal with a client shared between threads"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.session = FakeSession(self.__flaky, delay=0.01).install(self.EnsEMBL)
+        self.failed: set[str] = set()
+
+    def __flaky(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Fail once with a known error for each odd identifier"""
+
+        if url.endswith(("1", "3", "5", "7", "9")) and url not in self.failed:
+            self.failed.add(url)
+            return FakeResponse(
+                headers={},
+                status_code=400,
+                text="""{"error":"something bad has happened"}""",
+            )
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps({"url": url}))
+
+    def test_sharedClient(self) -> None:
+        """Each thread gets the response to its own request"""
+
+        ids = ["ENSG%011d" % i for i in range(200)]
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(
+                executor.map(lambda id: self.EnsEMBL.getLookupById(id=id), ids)
+            )
+
+        for id, result in zip(ids, results):
+            self.assertEqual(result["url"], "https://rest.ensembl.org/lookup/id/" + id)
+
+        # one retry for each odd identifier
+        self.assertEqual(len(self.session.calls), 300)
+
+    def test_lastRequest(self) -> None:
+        """Last request is recorded per thread"""
+
+        self.EnsEMBL.getLookupById(id="ENSG00000157764", expand=1)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(self.EnsEMBL.getArchiveById, id="ENSG00000248378").result()
+
+        self.assertEqual(
+            self.EnsEMBL.last_url, "https://rest.ensembl.org/lookup/id/ENSG00000157764"
+        )
+        self.assertEqual(self.EnsEMBL.last_params, {"expand": 1})
+        self.assertEqual(self.EnsEMBL.last_method, "GET")
+        self.assertEqual(self.EnsEMBL.last_attempt, 0)
+
+
+class EnsemblRestMap(unittest.TestCase):
+    """A class to deal with the bulk map method"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.session = FakeSession(self.__notFound, delay=0.01).install(self.EnsEMBL)
+
+    @staticmethod
+    def __notFound(
+        method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Identifiers ending with 0 are not found"""
+
+        if url.endswith("0"):
+            return FakeResponse(
+                headers={}, status_code=400, text="""{"error":"ID not found"}"""
+            )
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps({"url": url}))
+
+    def test_mapOrdered(self) -> None:
+        """Results are yielded in input order, errors are collected"""
+
+        ids = [{"id": "ENSG%011d" % i} for i in range(50)]
+        results = list(self.EnsEMBL.map("getLookupById", ids, max_workers=8))
+
+        self.assertEqual([result.position for result in results], list(range(50)))
+
+        for result in results:
+            if result.position % 10 == 0:
+                self.assertIsInstance(result.error, EnsemblRestError)
+                self.assertIsNone(result.result)
+            else:
+                self.assertIsNone(result.error)
+                self.assertTrue(result.result["url"].endswith(result.kwargs["id"]))
+
+        self.assertLessEqual(self.session.max_in_flight, 8)
+
+    def test_mapUnordered(self) -> None:
+        """All results are yielded as they finish"""
+
+        ids = ({"id": "ENSG%011d" % i} for i in range(50))
+        results = list(self.EnsEMBL.map("getLookupById", ids, ordered=False))
+
+        self.assertEqual(sorted(result.position for result in results), list(range(50)))
+        self.assertEqual(len([result for result in results if result.error]), 5)
+
+
+class EnsemblRestChunks(unittest.TestCase):
+    """A class to deal with POST requests split in chunks"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.session = FakeSession(self.__lookup).install(self.EnsEMBL)
+
+    @staticmethod
+    def __lookup(
+        method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer as POST lookup and sequence endpoints do"""
+
+        if "/lookup/" in url:
+            content: Any = {id: {"id": id} for id in data["ids"]}
+        else:
+            content = [{"id": id, "seq": "ACGT"} for id in data["ids"]]
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps(content))
+
+    def test_dictChunks(self) -> None:
+        """Dictionaries returned by each chunk are merged"""
+
+        ids = ["ENSG%011d" % i for i in range(2500)]
+        test = self.EnsEMBL.getLookupByMultipleIds(ids=ids, expand=1)
+
+        self.assertEqual(list(test.keys()), ids)
+        self.assertEqual(
+            sorted(len(data["ids"]) for _, _, _, data in self.session.calls),
+            [500, 1000, 1000],
+        )
+        self.assertTrue(
+            all(params == {"expand": 1} for _, _, params, _ in self.session.calls)
+        )
+
+    def test_listChunks(self) -> None:
+        """Lists returned by each chunk are concatenated, in order"""
+
+        ids = ["ENSG%011d" % i for i in range(120)]
+        test = self.EnsEMBL.getSequenceByMultipleIds(ids=ids)
+
+        self.assertEqual([item["id"] for item in test], ids)
+        self.assertEqual(len(self.session.calls), 3)
+
+    def test_smallPost(self) -> None:
+        """Small POST requests are sent as they are"""
+
+        self.EnsEMBL.getSequenceByMultipleIds(ids=["ENSG00000157764"])
+
+        self.assertEqual(len(self.session.calls), 1)
+
+
 class EnsemblRestArchive(EnsemblRest):
     """A class to deal with ensemblrest archive methods"""
 
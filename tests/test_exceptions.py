@@ -106,6 +106,9 @@ class EnsemblRest(unittest.TestCase):
         # set a different status code
         response.status_code = 429
 
+        # don't wait for the retry the server asks for
+        self.EnsEMBL.max_attempts = 0
+
         # now parse request. headers is a reference to response.headers
         self.assertRaisesRegex(
             EnsemblRestRateLimitError,
@@ -193,13 +196,10 @@ class EnsemblRest(unittest.TestCase):
 
     @pytest.mark.live
     def test_MaximumPOSTSize(self) -> None:
-        """Deal with maximum post size errors"""
+        """Split POST requests larger than the maximum post size"""
 
-        # verify exception
-        self.assertRaisesRegex(
-            EnsemblRestError,
-            "POST message too large.*",
-            self.EnsEMBL.getSequenceByMultipleIds,
+        # 60 identifiers, sent in chunks of 50
+        test = self.EnsEMBL.getSequenceByMultipleIds(
             ids=[
                 "ENSG00000157764",
                 "ENSG00000248378",
@@ -264,6 +264,9 @@ class EnsemblRest(unittest.TestCase):
             ],
         )
 
+        self.assertIsInstance(test, list)
+        self.assertGreater(len(test), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
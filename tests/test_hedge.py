@@ -0,0 +1,148 @@
+import time
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.hedge import Hedger
+from pyensemblrest.ratelimit import TokenBucket
+
+from .fakes import FakeSession, echo
+
+
+class CountingBucket(TokenBucket):
+    """A token bucket counting reserved tokens"""
+
+    reserved = 0.0
+
+    def reserve(self, tokens: float = 1) -> float:
+        self.reserved += tokens
+        return super(CountingBucket, self).reserve(tokens)
+
+
+class HedgerTest(unittest.TestCase):
+    """A class to test hedging decisions"""
+
+    def test_delay(self) -> None:
+        """Requests are hedged after the latency percentile"""
+
+        hedger = Hedger(percentile=90, min_samples=10)
+
+        for latency in range(9):
+            hedger.record(latency)
+
+        self.assertIsNone(hedger.delay())
+
+        hedger.record(9)
+        self.assertEqual(hedger.delay(), 9)
+
+        for latency in range(10, 100):
+            hedger.record(latency)
+
+        self.assertEqual(hedger.delay(), 90)
+
+    def test_budget(self) -> None:
+        """Hedges are capped to a share of requests"""
+
+        hedger = Hedger(budget=0.1)
+
+        for _ in range(20):
+            hedger.delay()
+
+        self.assertEqual([hedger.spend() for _ in range(3)], [True, True, False])
+        self.assertEqual(hedger.stats, {"requests": 20, "hedges": 2})
+
+
+class EnsemblRestHedge(unittest.TestCase):
+    """A class to test hedged GET requests"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object whose first request is slow"""
+        self.limiter = CountingBucket(rate=1000)
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=self.limiter)
+        self.EnsEMBL.single_flight = None
+        self.EnsEMBL.hedger = Hedger(budget=1, min_samples=5)
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+
+        for _ in range(5):
+            self.EnsEMBL.hedger.record(0.01)
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer the first request after a second"""
+
+        if len(self.session.calls) == 1:
+            time.sleep(1)
+
+        return echo(method, url, params, data)
+
+    def test_hedge(self) -> None:
+        """A slow request is answered by its duplicate"""
+
+        start = time.monotonic()
+        test = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIn("ENSG00000157764", test["url"])
+        self.assertEqual(len(self.session.calls), 2)
+        self.assertEqual(self.EnsEMBL.hedger.stats["hedges"], 1)  # type: ignore[union-attr]
+
+        # both requests took a token
+        self.assertEqual(self.limiter.reserved, 2)
+
+    def test_budget(self) -> None:
+        """Without budget, slow requests are waited for"""
+
+        self.EnsEMBL.hedger.budget = 0  # type: ignore[union-attr]
+
+        start = time.monotonic()
+        self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertGreaterEqual(time.monotonic() - start, 1)
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_post(self) -> None:
+        """POST requests are never hedged"""
+
+        self.EnsEMBL.getLookupByMultipleIds(ids=["ENSG00000157764"])
+
+        self.assertEqual(len(self.session.calls), 1)
+
+
+class AsyncEnsemblRestHedge(unittest.IsolatedAsyncioTestCase):
+    """A class to test hedged requests with the asyncio client"""
+
+    async def test_hedge(self) -> None:
+        """A slow request is answered by its duplicate"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        EnsEMBL.hedger = Hedger(budget=1, min_samples=5)
+        calls = []
+
+        def server(
+            method: str, url: str, params: dict[str, Any], data: Any
+        ) -> FakeResponse:
+            calls.append(url)
+
+            if len(calls) == 1:
+                time.sleep(1)
+
+            return echo(method, url, params, data)
+
+        FakeSession(server).install(EnsEMBL)
+
+        for _ in range(5):
+            EnsEMBL.hedger.record(0.01)
+
+        start = time.monotonic()
+        await EnsEMBL.getLookupById(id="ENSG00000157764")  # type: ignore[attr-defined]
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(len(calls), 2)
+
+        EnsEMBL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
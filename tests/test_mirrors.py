@@ -0,0 +1,215 @@
+import time
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestServiceUnavailable
+from pyensemblrest.mirrors import Mirror, MirrorPool
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+
+from .fakes import FakeSession, echo
+from .test_hedge import CountingBucket
+
+MAIN = "https://rest.ensembl.org"
+MIRROR = "https://mirror.example.org"
+
+
+class MirrorPoolTest(unittest.TestCase):
+    """A class to test the choice of mirrors"""
+
+    def test_choose(self) -> None:
+        """Requests go to the fastest server, unknown servers first"""
+
+        pool = MirrorPool([MAIN, MIRROR + "/"])
+        main, mirror = pool.mirrors
+
+        self.assertEqual(mirror.base_url, MIRROR)
+
+        pool.record(main, True, 0.5)
+        self.assertIs(pool.choose(), mirror)
+
+        pool.release(mirror)
+        pool.record(mirror, True, 0.1)
+        self.assertIs(pool.choose(), mirror)
+        self.assertIs(pool.choose(exclude=[mirror]), main)
+        self.assertEqual(mirror.in_flight, 1)
+
+        pool.release(mirror)
+        self.assertIs(pool.choose(avoid=mirror), main)
+        self.assertIs(pool.choose(exclude=[main], avoid=mirror), mirror)
+        self.assertIsNone(pool.choose(exclude=[main, mirror]))
+
+    def test_load(self) -> None:
+        """Requests in flight spread the load"""
+
+        pool = MirrorPool([MAIN, MIRROR])
+        main, mirror = pool.mirrors
+        pool.record(main, True, 0.2)
+        pool.record(mirror, True, 0.1)
+
+        self.assertEqual([pool.choose() for _ in range(3)], [mirror, main, mirror])
+
+    def test_down(self) -> None:
+        """A failing server is taken down for down_time seconds"""
+
+        pool = MirrorPool([MAIN, MIRROR], max_failures=2, down_time=0.05)
+        main, mirror = pool.mirrors
+        pool.record(main, True, 1)
+
+        pool.record(mirror, False, 0.1)
+        self.assertTrue(mirror.up)
+
+        pool.record(mirror, False, 0.1)
+        self.assertFalse(mirror.up)
+        self.assertIs(pool.choose(), main)
+
+        # all servers down: try anyway
+        pool.take_down(main)
+        self.assertIsNotNone(pool.choose())
+
+        time.sleep(0.06)
+        self.assertTrue(pool.stats[MIRROR]["up"])
+
+        pool.record(mirror, True, 0.1)
+        self.assertEqual(mirror.failures, 0)
+
+    def test_empty(self) -> None:
+        """A pool needs a server"""
+        self.assertRaises(ValueError, MirrorPool, [])
+
+
+class EnsemblRestMirrors(unittest.TestCase):
+    """A class to test requests sent to several mirrors"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by two fake servers"""
+        self.limiters = [CountingBucket(rate=1000), CountingBucket(rate=1000)]
+        self.pool = MirrorPool(
+            [
+                Mirror(MAIN, rate_limiter=self.limiters[0]),
+                Mirror(MIRROR, rate_limiter=self.limiters[1]),
+            ]
+        )
+        self.EnsEMBL = pyensemblrest.EnsemblRest(
+            base_url=self.pool, rate_limiter=TokenBucket(rate=1000)
+        )
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.EnsEMBL.single_flight = None
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+        self.down: set[str] = set()
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer, unless the server is down"""
+
+        if url.startswith(MIRROR) and MIRROR in self.down:
+            raise pyensemblrest.ensemblrest.requests.ConnectionError("down")
+
+        if url.startswith(MAIN) and MAIN in self.down:
+            return FakeResponse(headers={}, status_code=503, text="{}")
+
+        return echo(method, url, params, data)
+
+    def test_list(self) -> None:
+        """A list of base urls makes a pool"""
+
+        EnsEMBL = pyensemblrest.EnsemblRest(base_url=[MAIN, MIRROR])
+
+        self.assertEqual(
+            [mirror.base_url for mirror in EnsEMBL.mirrors.mirrors],  # type: ignore[union-attr]
+            [MAIN, MIRROR],
+        )
+        self.assertEqual(EnsEMBL.session.base_url, MAIN)  # type: ignore[attr-defined]
+
+    def test_spread(self) -> None:
+        """Requests are spread over mirrors, each with its own rate limit"""
+
+        for i in range(4):
+            self.EnsEMBL.getLookupById(id="ENSG0000015775%s" % i)
+
+        servers = {url.split("/lookup")[0] for _, url, _, _ in self.session.calls}
+
+        self.assertEqual(servers, {MAIN, MIRROR})
+        self.assertEqual(sum(limiter.reserved for limiter in self.limiters), 4)
+        self.assertTrue(all(limiter.reserved for limiter in self.limiters))
+
+    def test_connectionError(self) -> None:
+        """A request failing to connect is sent to another mirror"""
+
+        self.down.add(MIRROR)
+
+        for i in range(4):
+            test = self.EnsEMBL.getLookupById(id="ENSG0000015775%s" % i)
+            self.assertTrue(test["url"].startswith(MAIN))
+
+        # the failures were recorded
+        self.assertGreater(self.pool.stats[MIRROR]["error_rate"], 0)  # type: ignore[operator]
+        self.assertEqual(self.pool.mirrors[1].failures, len(self.session.calls) - 4)
+
+    def test_serverError(self) -> None:
+        """A server error is retried on another mirror"""
+
+        self.down.add(MAIN)
+        self.pool.record(self.pool.mirrors[1], True, 1)
+
+        test = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertTrue(test["url"].startswith(MIRROR))
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_allDown(self) -> None:
+        """Requests fail when no mirror answers"""
+
+        def server(
+            method: str, url: str, params: dict[str, Any], data: Any
+        ) -> FakeResponse:
+            raise pyensemblrest.ensemblrest.requests.ConnectionError("down")
+
+        self.session.responder = server
+
+        self.assertRaises(
+            EnsemblRestServiceUnavailable,
+            self.EnsEMBL.getLookupById,
+            id="ENSG00000157764",
+        )
+
+    def test_checkMirrors(self) -> None:
+        """Pinging mirrors takes down those not answering"""
+
+        self.down.add(MIRROR)
+
+        self.assertEqual(self.EnsEMBL.check_mirrors(), {MAIN: True, MIRROR: False})
+        self.assertFalse(self.pool.mirrors[1].up)
+        self.assertEqual(pyensemblrest.EnsemblRest().check_mirrors(), {})
+
+
+class AsyncEnsemblRestMirrors(unittest.IsolatedAsyncioTestCase):
+    """A class to test mirrors with the asyncio client"""
+
+    async def test_failover(self) -> None:
+        """A request failing to connect is sent to another mirror"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(base_url=[MIRROR, MAIN])
+
+        def server(
+            method: str, url: str, params: dict[str, Any], data: Any
+        ) -> FakeResponse:
+            if url.startswith(MIRROR):
+                raise pyensemblrest.ensemblrest.requests.ConnectionError("down")
+
+            return echo(method, url, params, data)
+
+        session = FakeSession(server).install(EnsEMBL)
+        test = await EnsEMBL.getLookupById(id="ENSG00000157764")  # type: ignore[attr-defined]
+
+        self.assertTrue(test["url"].startswith(MAIN))
+        self.assertEqual(len(session.calls), 2)
+
+        EnsEMBL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
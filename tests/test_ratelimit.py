@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import pyensemblrest
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.ratelimit import (
+    HAS_FCNTL,
+    AdaptiveRateLimiter,
+    FileRateLimiter,
+    TokenBucket,
+    get_shared_rate_limiter,
+    set_shared_rate_limiter,
+)
+
+
+class TokenBucketTest(unittest.TestCase):
+    """A class to test the token bucket rate limiter"""
+
+    def test_burst(self) -> None:
+        """A full bucket lets capacity requests through at once"""
+
+        bucket = TokenBucket(rate=10, capacity=5)
+
+        self.assertEqual([bucket.reserve() for _ in range(5)], [0] * 5)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def test_refill(self) -> None:
+        """Tokens are refilled continuously"""
+
+        bucket = TokenBucket(rate=100, capacity=1)
+
+        self.assertEqual(bucket.reserve(), 0)
+        time.sleep(0.02)
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_throughput(self) -> None:
+        """Threads sharing a bucket are held to its rate"""
+
+        bucket = TokenBucket(rate=50, capacity=1)
+
+        def worker() -> None:
+            for _ in range(5):
+                bucket.acquire()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        start = time.monotonic()
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # 20 requests, the first one is free
+        self.assertGreaterEqual(time.monotonic() - start, 19 / 50 - 0.01)
+
+    def test_shared(self) -> None:
+        """Clients share the process rate limiter by default"""
+
+        first = pyensemblrest.EnsemblRest()
+        second = pyensemblrest.EnsemblRest()
+
+        self.assertIs(first.rate_limiter, get_shared_rate_limiter())
+        self.assertIs(second.rate_limiter, get_shared_rate_limiter())
+        self.assertEqual(first.reqs_per_sec, 15)
+
+    def test_setShared(self) -> None:
+        """The shared rate limiter can be replaced"""
+
+        old = get_shared_rate_limiter()
+        limiter = TokenBucket(rate=5)
+
+        try:
+            set_shared_rate_limiter(limiter)
+            self.assertIs(pyensemblrest.EnsemblRest().rate_limiter, limiter)
+
+        finally:
+            set_shared_rate_limiter(old)
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    """A class to test the rate limiter driven by X-RateLimit-* headers"""
+
+    def test_spreadBudget(self) -> None:
+        """The remaining budget is spread over the time left"""
+
+        limiter = AdaptiveRateLimiter(max_rate=15)
+
+        limiter.update(rate_reset=1000, rate_limit=55000, rate_remaining=5000)
+        self.assertAlmostEqual(limiter.rate, 5)
+
+        # speed up when the server reports headroom
+        limiter.update(rate_reset=1000, rate_limit=55000, rate_remaining=50000)
+        self.assertEqual(limiter.rate, 15)
+
+        # but never stop entirely
+        limiter.update(rate_reset=3600, rate_limit=55000, rate_remaining=1)
+        self.assertEqual(limiter.rate, limiter.min_rate)
+
+    def test_retryAfter(self) -> None:
+        """Nothing is sent before Retry-After seconds"""
+
+        limiter = AdaptiveRateLimiter(max_rate=10)
+        limiter.update(retry_after=2.0)
+
+        self.assertGreaterEqual(limiter.reserve(), 2.0)
+
+    def test_budgetSpent(self) -> None:
+        """Wait for the reset when no request is left"""
+
+        limiter = AdaptiveRateLimiter(max_rate=10)
+        limiter.update(rate_reset=30, rate_limit=55000, rate_remaining=0)
+
+        self.assertGreaterEqual(limiter.reserve(), 30)
+
+    def test_parseResponse(self) -> None:
+        """Clients pass response headers to their rate limiter"""
+
+        limiter = AdaptiveRateLimiter(max_rate=15)
+        EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=limiter)
+
+        EnsEMBL.parseResponse(
+            FakeResponse(
+                headers={
+                    "X-RateLimit-Limit": "55000",
+                    "X-RateLimit-Reset": "1000",
+                    "X-RateLimit-Remaining": "2000",
+                    "X-RateLimit-Period": "3600",
+                },
+                status_code=200,
+                text="{}",
+            )
+        )
+
+        self.assertAlmostEqual(limiter.rate, 2)
+
+
+def acquire_many(limiter: FileRateLimiter, times: int) -> None:
+    """Acquire tokens from a child process"""
+
+    for _ in range(times):
+        limiter.acquire()
+
+
+@unittest.skipUnless(HAS_FCNTL, "requires fcntl")
+class FileRateLimiterTest(unittest.TestCase):
+    """A class to test the rate limiter shared between processes"""
+
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_burst(self) -> None:
+        """Limiters using the same file share the same bucket"""
+
+        first = FileRateLimiter(self.path, rate=10, capacity=2)
+        second = FileRateLimiter(self.path, rate=10, capacity=2)
+
+        self.assertEqual(first.reserve(), 0)
+        self.assertEqual(second.reserve(), 0)
+        self.assertAlmostEqual(first.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(second.reserve(), 0.2, places=2)
+
+    def test_path(self) -> None:
+        """The default file is per user, and links are not followed"""
+
+        limiter = FileRateLimiter()
+        self.assertTrue(limiter.path.endswith("-%d" % os.getuid()))
+
+        link = self.path + ".link"
+        os.symlink(self.path, link)
+        self.addCleanup(os.remove, link)
+
+        self.assertRaises(OSError, FileRateLimiter, link)
+
+    def test_processes(self) -> None:
+        """Processes are held to the rate of the shared bucket"""
+
+        limiter = FileRateLimiter(self.path, rate=40, capacity=1)
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=acquire_many, args=(limiter, 5)) for _ in range(4)
+        ]
+
+        start = time.monotonic()
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+        # 20 requests, the first one is free
+        self.assertGreaterEqual(time.monotonic() - start, 19 / 40 - 0.01)
+        self.assertTrue(all(process.exitcode == 0 for process in processes))
+
+
+if __name__ == "__main__":
+    unittest.main()
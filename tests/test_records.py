@@ -0,0 +1,209 @@
+import json
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.records import (
+    LookupRecord,
+    OverlapFeature,
+    VariationMapping,
+    VariationRecord,
+    to_records,
+)
+
+from .fakes import FakeSession
+
+LOOKUP = {
+    "id": "ENSG00000157764",
+    "species": "homo_sapiens",
+    "object_type": "Gene",
+    "display_name": "BRAF",
+    "biotype": "protein_coding",
+    "seq_region_name": "7",
+    "start": 140719327,
+    "end": 140924929,
+    "strand": -1,
+    "assembly_name": "GRCh38",
+    "version": 14,
+    "Transcript": [{"id": "ENST00000646891"}],
+}
+
+OVERLAP = [
+    {
+        "id": "ENSG%011d" % i,
+        "feature_type": "gene",
+        "seq_region_name": "7",
+        "start": 140424943 + i,
+        "end": 140624564 + i,
+        "strand": 1,
+        "biotype": "protein_coding",
+        "gene_id": "ENSG%011d" % i,
+    }
+    for i in range(3)
+]
+
+VARIATION = {
+    "name": "rs56116432",
+    "var_class": "SNP",
+    "source": "Variants (including SNPs and indels) imported from dbSNP",
+    "MAF": None,
+    "synonyms": ["COSM3762"],
+    "mappings": [
+        {
+            "location": "9:133256042-133256042",
+            "seq_region_name": "9",
+            "start": 133256042,
+            "end": 133256042,
+            "strand": 1,
+            "allele_string": "C/T",
+        }
+    ],
+}
+
+
+class RecordsTest(unittest.TestCase):
+    """A class to test result records"""
+
+    def test_lookup(self) -> None:
+        """Known fields are slots, others go to extra"""
+
+        record = to_records("getLookupById", json.loads(json.dumps(LOOKUP)))
+
+        self.assertIsInstance(record, LookupRecord)
+        self.assertEqual(record.display_name, "BRAF")
+        self.assertEqual(record.strand, -1)
+        self.assertIsNone(record.description)
+        self.assertEqual(record.extra, {"Transcript": [{"id": "ENST00000646891"}]})
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_interned(self) -> None:
+        """Repeated values of interned fields are shared"""
+
+        records = to_records("getOverlapByRegion", json.loads(json.dumps(OVERLAP)))
+
+        self.assertTrue(all(isinstance(record, OverlapFeature) for record in records))
+        self.assertIs(records[0].biotype, records[2].biotype)
+        self.assertIs(records[0].seq_region_name, records[1].seq_region_name)
+        self.assertIs(records[0].feature_type, records[1].feature_type)
+        self.assertEqual(records[1].extra, {"gene_id": "ENSG00000000001"})
+
+    def test_variation(self) -> None:
+        """Mappings of variations are records too"""
+
+        record = to_records("getVariationById", VARIATION)
+
+        self.assertIsInstance(record, VariationRecord)
+        self.assertIsInstance(record.mappings[0], VariationMapping)
+        self.assertEqual(record.mappings[0].allele_string, "C/T")
+        self.assertIsNone(record.extra)
+
+    def test_multiple(self) -> None:
+        """Results of several identifiers are records by identifier"""
+
+        records = to_records(
+            "getLookupByMultipleIds", {"ENSG00000157764": LOOKUP, "meow": None}
+        )
+
+        self.assertEqual(records["ENSG00000157764"].id, "ENSG00000157764")
+        self.assertIsNone(records["meow"])
+
+    def test_unknown(self) -> None:
+        """Endpoints without records raise"""
+        self.assertRaises(ValueError, to_records, "getInfoPing", {"ping": 1})
+
+
+class EnsemblRestRecords(unittest.TestCase):
+    """A class to test records with a client"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer lookups and overlaps"""
+
+        content = OVERLAP if "/overlap/" in url else LOOKUP
+        return FakeResponse(headers={}, status_code=200, text=json.dumps(content))
+
+    def test_output(self) -> None:
+        """Records are selected per call"""
+
+        record = self.EnsEMBL.getLookupById(id="ENSG00000157764", output="records")
+        test = self.EnsEMBL.getLookupById(id="ENSG00000157764")
+
+        self.assertIsInstance(record, LookupRecord)
+        self.assertIsInstance(test, dict)
+        self.assertNotIn("output", self.session.calls[0][2])
+
+    def test_stream(self) -> None:
+        """Streamed results are decoded as records one at a time"""
+
+        records = self.EnsEMBL.getOverlapByRegion(
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            stream=True,
+            output="records",
+        )
+
+        self.assertEqual(
+            [record.start for record in records], [140424943, 140424944, 140424945]
+        )
+
+    def test_unknownOutput(self) -> None:
+        """Unknown outputs and endpoints without records raise, before a request"""
+
+        self.assertRaises(
+            ValueError, self.EnsEMBL.getLookupById, id="ENSG00000157764", output="xml"
+        )
+        self.assertRaisesRegex(
+            ValueError, "getInfoPing", self.EnsEMBL.getInfoPing, output="records"
+        )
+        self.assertEqual(self.session.calls, [])
+
+
+class AsyncEnsemblRestRecords(unittest.IsolatedAsyncioTestCase):
+    """A class to test records with the asyncio client"""
+
+    async def test_output(self) -> None:
+        """Records are selected per call"""
+
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        FakeSession(
+            lambda method, url, params, data: FakeResponse(
+                headers={}, status_code=200, text=json.dumps(OVERLAP)
+            )
+        ).install(EnsEMBL)
+
+        records = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            output="records",
+        )
+        self.assertEqual([record.id for record in records], [f["id"] for f in OVERLAP])
+
+        records = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            output="records",
+            stream=True,
+        )
+        self.assertEqual(
+            [record.id async for record in records], [f["id"] for f in OVERLAP]
+        )
+
+        with self.assertRaises(ValueError):
+            await EnsEMBL.getInfoPing(output="records")  # type: ignore[attr-defined]
+
+        EnsEMBL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
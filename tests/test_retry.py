@@ -0,0 +1,185 @@
+import json
+import time
+import unittest
+from typing import Any
+
+import pyensemblrest
+from pyensemblrest.ensemblrest import FakeResponse
+from pyensemblrest.exceptions import EnsemblRestError, EnsemblRestRateLimitError
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryBudget, RetryPolicy
+
+from .fakes import FakeSession, echo, status
+
+
+class RetryPolicyTest(unittest.TestCase):
+    """A class to test retry delays"""
+
+    def test_backoff(self) -> None:
+        """Delays double at each attempt, up to max_delay"""
+
+        policy = RetryPolicy(backoff=0.5, max_delay=3, jitter=False)
+
+        self.assertEqual(
+            [policy.delay(attempt) for attempt in range(1, 6)], [0.5, 1, 2, 3, 3]
+        )
+
+    def test_jitter(self) -> None:
+        """Delays are spread between 0 and the backoff"""
+
+        policy = RetryPolicy(backoff=1, max_delay=60)
+        delays = [policy.delay(4) for _ in range(100)]
+
+        self.assertTrue(all(0 <= delay <= 8 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_serverDelay(self) -> None:
+        """The delay asked by the server is honoured, even over max_delay"""
+
+        policy = RetryPolicy(max_delay=1)
+
+        self.assertEqual(policy.delay(1, retry_after=40.0), 40.0)
+        self.assertEqual(policy.delay(1, rate_reset=30, rate_remaining=0), 30)
+        self.assertLessEqual(policy.delay(1, rate_reset=30, rate_remaining=10), 1)
+
+
+class RetryBudgetTest(unittest.TestCase):
+    """A class to test the retry budget"""
+
+    def test_ratio(self) -> None:
+        """Retries are allowed in proportion of successes"""
+
+        budget = RetryBudget(ratio=0.1, min_retries=2)
+
+        for _ in range(30):
+            budget.success()
+
+        self.assertEqual(budget.stats["allowed"], 5)
+        self.assertEqual([budget.spend() for _ in range(6)], [True] * 5 + [False])
+        self.assertEqual(budget.used, 1)
+
+    def test_window(self) -> None:
+        """Retries older than the window are forgotten"""
+
+        budget = RetryBudget(ratio=0, window=0.05, min_retries=1)
+
+        self.assertEqual(budget.used, 0)
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+
+        time.sleep(0.06)
+        self.assertTrue(budget.spend())
+        self.assertEqual(budget.stats["retries"], 1)
+
+
+class EnsemblRestRetry(unittest.TestCase):
+    """A class to test retried requests"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.session = FakeSession(self.__rateLimited).install(self.EnsEMBL)
+
+    def __rateLimited(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer 429 to the first request"""
+
+        if len(self.session.calls) == 1:
+            return FakeResponse(
+                headers={"Retry-After": "0.2"},
+                status_code=429,
+                text=json.dumps({"error": "Too many requests"}),
+            )
+
+        return FakeResponse(headers={}, status_code=200, text=json.dumps({"url": url}))
+
+    def test_retryAfter(self) -> None:
+        """A rate limited request is sent again once the server allows it"""
+
+        start = time.monotonic()
+        test = self.EnsEMBL.getArchiveById(id="ENSG00000157764")
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertIn("ENSG00000157764", test["url"])
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_rateLimitExhausted(self) -> None:
+        """A request still rate limited after max_attempts raises a rate limit error"""
+
+        self.EnsEMBL.max_attempts = 2
+        self.session.responder = status(429, json.dumps({"error": "Too many"}))
+
+        self.assertRaises(
+            EnsemblRestRateLimitError, self.EnsEMBL.getArchiveById, id="ENSG00000157764"
+        )
+        self.assertEqual(len(self.session.calls), 3)
+
+    def test_budget(self) -> None:
+        """Retries beyond the budget fail at once"""
+
+        self.EnsEMBL.retry_budget = RetryBudget(ratio=0, min_retries=2)
+        self.session.responder = status(500)
+
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "Retry budget exhausted",
+            self.EnsEMBL.getArchiveById,
+            id="ENSG00000157764",
+        )
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "Retry budget exhausted",
+            self.EnsEMBL.getArchiveById,
+            id="ENSG00000157764",
+        )
+
+        # one request and two retries, then a single request
+        self.assertEqual(len(self.session.calls), 4)
+        self.assertEqual(self.EnsEMBL.retry_budget.used, 1)
+
+    def test_statuses(self) -> None:
+        """Only the statuses of the policy are retried"""
+
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0, statuses=(500,))
+        self.session.responder = status(503)
+
+        self.assertRaises(
+            EnsemblRestError, self.EnsEMBL.getArchiveById, id="ENSG00000157764"
+        )
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_otherStatuses(self) -> None:
+        """Statuses missing from the status table are retried or raised"""
+
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0, statuses=(502, 504))
+        self.session.responder = lambda method, url, params, data: (
+            status(504)(method, url, params, data)
+            if len(self.session.calls) == 1
+            else echo(method, url, params, data)
+        )
+
+        test = self.EnsEMBL.getArchiveById(id="ENSG00000157764")
+        self.assertIn("ENSG00000157764", test["url"])
+
+        self.session.responder = status(418)
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "unexpected status code",
+            self.EnsEMBL.getArchiveById,
+            id="ENSG00000157765",
+        )
+
+        self.EnsEMBL.max_attempts = 1
+        self.session.responder = status(504)
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "Max number of retries",
+            self.EnsEMBL.getArchiveById,
+            id="ENSG00000157766",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
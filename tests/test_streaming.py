@@ -0,0 +1,489 @@
+import io
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from typing import Any, Iterable, Iterator
+
+import pyensemblrest
+from pyensemblrest.cache import MemoryCache
+from pyensemblrest.ensemblrest import FakeResponse, RawResponse
+from pyensemblrest.exceptions import EnsemblRestError
+from pyensemblrest.ratelimit import TokenBucket
+from pyensemblrest.retry import RetryPolicy
+from pyensemblrest.streaming import JSONStream, iter_fasta, iter_json, iter_text
+
+from .fakes import FakeSession
+
+FASTA = (
+    ">chromosome:GRCh38:X:1000000:1000019:1\nACGTACGTAC\nGTACGTACGT\n"
+    ">ENSG00000157764.14 chromosome:GRCh38:7:140719327:140730665:-1\r\n"
+    "TTTTCCCCGG\r\nGGAA\r\n"
+)
+RECORDS = [
+    ("chromosome:GRCh38:X:1000000:1000019:1", "ACGTACGTACGTACGTACGT"),
+    ("ENSG00000157764.14 chromosome:GRCh38:7:140719327:140730665:-1", "TTTTCCCCGGGGAA"),
+]
+
+
+def records(chunks: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Join the sequence chunks of FASTA records"""
+
+    joined: list[tuple[str, str]] = []
+
+    for header, chunk in chunks:
+        if joined and joined[-1][0] == header:
+            joined[-1] = (header, joined[-1][1] + chunk)
+        else:
+            joined.append((header, chunk))
+
+    return joined
+
+
+def chunked(text: str, size: int) -> list[bytes]:
+    """Split the UTF-8 encoding of text in chunks of size bytes"""
+    content = text.encode()
+    return [content[start : start + size] for start in range(0, len(content), size)]
+
+
+class ClosedResponse(FakeResponse):
+    """A response recording whether it was closed"""
+
+    def __init__(self, status_code: int, text: str) -> None:
+        super(ClosedResponse, self).__init__(
+            headers={}, status_code=status_code, text=text
+        )
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class EndlessResponse(FakeResponse):
+    """A response whose body is a JSON array never ending"""
+
+    def __init__(self) -> None:
+        super(EndlessResponse, self).__init__(headers={}, status_code=200, text="")
+        self.read = 0
+        self.closed = False
+
+    def iter_content(
+        self, chunk_size: int = 1, decode_unicode: bool = False
+    ) -> Iterator[bytes]:
+        yield b"["
+
+        for i in itertools.count():
+            self.read += 1
+            yield b'{"start": %d},' % i
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class StreamingTest(unittest.TestCase):
+    """A class to test the incremental JSON decoder"""
+
+    def test_array(self) -> None:
+        """Array elements are decoded whatever the chunk boundaries"""
+
+        document = [
+            {"id": "ENSG00000157764", "start": 140719327, "strand": -1},
+            [1.5e3, -2, True, None],
+            "café ☃",
+            12345,
+            {},
+        ]
+        text = json.dumps(document, ensure_ascii=False, indent=1)
+
+        for size in [1, 2, 3, 7, 64, 4096]:
+            self.assertEqual(list(iter_json(chunked(text, size))), document)
+
+    def test_numbers(self) -> None:
+        """Numbers are decoded whatever the offset they are split at"""
+
+        text = "[1.25, -2e3, 0.5E-2, 12345, -0, 3.0e+1 ,7]"
+        content = text.encode()
+
+        for split in range(1, len(content)):
+            self.assertEqual(
+                list(iter_json([content[:split], content[split:]])),
+                json.loads(text),
+                "split at %s" % split,
+            )
+
+    def test_empty(self) -> None:
+        """An empty array yields nothing"""
+        self.assertEqual(list(iter_json(chunked(" [ \n ] ", 1))), [])
+
+    def test_document(self) -> None:
+        """Other documents are yielded whole"""
+
+        document = {"id": "ENSG00000157764", "seq": "ACGT"}
+        self.assertEqual(list(iter_json(chunked(json.dumps(document), 5))), [document])
+
+    def test_large(self) -> None:
+        """Large values are decoded a few times, not once per chunk"""
+
+        attempts = []
+
+        class CountingDecoder(json.JSONDecoder):
+            def raw_decode(self, s: str, idx: int = 0) -> tuple[Any, int]:
+                attempts.append(idx)
+                return super(CountingDecoder, self).raw_decode(s, idx)
+
+        document = [{"seq": "ACGT" * 25000}, 1]
+        text = json.dumps(document)
+        stream = JSONStream(chunked(text, 100), CountingDecoder())
+
+        self.assertEqual(list(stream), document)
+        self.assertLess(len(attempts), 20)
+
+    def test_malformed(self) -> None:
+        """Truncated or malformed arrays raise"""
+
+        self.assertRaises(ValueError, list, iter_json(chunked('[{"a": 1}, {"b"', 4)))
+        self.assertRaises(ValueError, list, iter_json(chunked("[1 2]", 1)))
+        self.assertRaises(ValueError, list, iter_json(chunked("[1, 2", 1)))
+
+    def test_fasta(self) -> None:
+        """FASTA records are read whatever the chunk boundaries"""
+
+        for size in [1, 2, 5, 64]:
+            texts = [
+                FASTA[start : start + size] for start in range(0, len(FASTA), size)
+            ]
+            self.assertEqual(records(iter_fasta(texts)), RECORDS)
+
+        # a sequence comes in chunks
+        chunks = list(iter_fasta([">1 chromosome\nACGT", "ACGT\nAC", "GT\n"]))
+        self.assertEqual(
+            chunks,
+            [
+                ("1 chromosome", "ACGT"),
+                ("1 chromosome", "ACGTAC"),
+                ("1 chromosome", "GT"),
+            ],
+        )
+
+    def test_text(self) -> None:
+        """Text is decoded across chunk boundaries"""
+
+        text = ">seq ☃\nACGT\n"
+        self.assertEqual("".join(iter_text(chunked(text, 1))), text)
+
+
+class EnsemblRestStreaming(unittest.TestCase):
+    """A class to test streamed responses"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.EnsEMBL.stream_chunk_size = 16
+        self.features = [
+            {"id": "ENSG%011d" % i, "start": i * 100, "end": i * 100 + 50}
+            for i in range(50)
+        ]
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer the features of a region"""
+        return FakeResponse(headers={}, status_code=200, text=json.dumps(self.features))
+
+    def test_stream(self) -> None:
+        """A streamed response is an iterator of its array elements"""
+
+        test = self.EnsEMBL.getOverlapByRegion(
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+
+        self.assertIsInstance(test, Iterator)
+        self.assertEqual(list(test), self.features)
+
+        # stream is not a parameter of the request
+        self.assertNotIn("stream", self.session.calls[0][2])
+
+    def test_lazy(self) -> None:
+        """Elements are read as they are consumed, and the response closed"""
+
+        response = EndlessResponse()
+        self.session.responder = lambda method, url, params, data: response
+
+        test = self.EnsEMBL.getOverlapByRegion(
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+
+        self.assertEqual(
+            [feature["start"] for feature in itertools.islice(test, 3)], [0, 1, 2]
+        )
+        self.assertLessEqual(response.read, 4)
+
+        test.close()
+        self.assertTrue(response.closed)
+
+    def test_retry(self) -> None:
+        """Streamed requests are retried before reading them"""
+
+        self.session.responder = lambda method, url, params, data: (
+            FakeResponse(headers={}, status_code=500, text="{}")
+            if len(self.session.calls) == 1
+            else self.__server(method, url, params, data)
+        )
+
+        test = self.EnsEMBL.getOverlapByRegion(
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+
+        self.assertEqual(list(test), self.features)
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_closed(self) -> None:
+        """Retried and failed streamed responses are closed"""
+
+        responses = [
+            ClosedResponse(500, "{}"),
+            ClosedResponse(503, "{}"),
+            ClosedResponse(200, json.dumps(self.features)),
+            ClosedResponse(404, '{"error": "not found"}'),
+        ]
+        self.session.responder = lambda method, url, params, data: responses[
+            len(self.session.calls) - 1
+        ]
+
+        test = self.EnsEMBL.getOverlapByRegion(
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+        self.assertEqual(
+            [response.closed for response in responses[:3]], [True, True, False]
+        )
+
+        self.assertEqual(list(test), self.features)
+        self.assertRaises(
+            EnsemblRestError,
+            self.EnsEMBL.getOverlapByRegion,
+            species="human",
+            region="7:1-0",
+            feature="gene",
+            stream=True,
+        )
+        self.assertTrue(all(response.closed for response in responses))
+
+    def test_error(self) -> None:
+        """Errors are raised by the call, not by the iteration"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=400, text='{"error": "bad region"}'
+        )
+
+        self.assertRaisesRegex(
+            EnsemblRestError,
+            "bad region",
+            self.EnsEMBL.getOverlapByRegion,
+            species="human",
+            region="7:1-0",
+            feature="gene",
+            stream=True,
+        )
+
+    def test_text(self) -> None:
+        """Other content types are streamed as text"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=200, text="ACGT☃" * 10
+        )
+
+        test = self.EnsEMBL.getSequenceById(
+            id="ENSG00000157764", content_type="text/plain", stream=True
+        )
+
+        self.assertEqual("".join(test), "ACGT☃" * 10)
+
+    def test_fasta(self) -> None:
+        """FASTA is streamed as (header, sequence_chunk) records"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=200, text=FASTA
+        )
+
+        test = self.EnsEMBL.getSequenceByRegion(
+            species="human",
+            region="X:1000000..1000100",
+            content_type="text/x-fasta",
+            stream=True,
+        )
+
+        self.assertEqual(records(test), RECORDS)
+
+    def test_streamTo(self) -> None:
+        """A response is written to a path or a file as it is read"""
+
+        self.session.responder = lambda method, url, params, data: FakeResponse(
+            headers={}, status_code=200, text=FASTA
+        )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "region.fa")
+            test = self.EnsEMBL.getSequenceByRegion(
+                species="human",
+                region="X:1000000..1000100",
+                content_type="text/x-fasta",
+                stream_to=path,
+            )
+
+            self.assertEqual(test, len(FASTA.encode()))
+
+            with open(path, "rb") as handle:
+                self.assertEqual(handle.read(), FASTA.encode())
+
+        binary = io.BytesIO()
+        self.EnsEMBL.getSequenceById(id="ENSG00000157764", stream_to=binary)
+        self.assertEqual(binary.getvalue(), FASTA.encode())
+
+        # text files get text
+        text = io.StringIO()
+        self.EnsEMBL.getSequenceById(id="ENSG00000157764", stream_to=text)
+        self.assertEqual(text.getvalue(), FASTA)
+        self.assertFalse(text.closed)
+
+
+class EnsemblRestRaw(unittest.TestCase):
+    """A class to test undecoded responses"""
+
+    def setUp(self) -> None:
+        """Create a EnsemblRest object backed by a fake session"""
+        self.EnsEMBL = pyensemblrest.EnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        self.EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        self.EnsEMBL.stream_chunk_size = 8
+        self.body = json.dumps({"id": "ENSG00000157764", "seq": "ACGT" * 10})
+        self.session = FakeSession(self.__server).install(self.EnsEMBL)
+
+    def __server(
+        self, method: str, url: str, params: dict[str, Any], data: Any
+    ) -> FakeResponse:
+        """Answer the same body, with rate limits"""
+        return FakeResponse(
+            headers={
+                "Content-Type": "application/json",
+                "X-RateLimit-Limit": "55000",
+                "X-RateLimit-Remaining": "54999",
+                "X-RateLimit-Reset": "892",
+                "X-RateLimit-Period": "3600",
+            },
+            status_code=200,
+            text=self.body,
+        )
+
+    def test_raw(self) -> None:
+        """A raw response is the undecoded body, its status and rate limits"""
+
+        self.EnsEMBL.json_decoder = lambda content: self.fail("decoded")
+        test = self.EnsEMBL.getSequenceById(id="ENSG00000157764", raw=True)
+
+        self.assertIsInstance(test, RawResponse)
+        self.assertEqual(test.content, self.body.encode())
+        self.assertEqual(test.status_code, 200)
+        self.assertEqual(test.content_type, "application/json")
+        self.assertEqual(test.rate_remaining, 54999)
+        self.assertEqual(test.rate_period, 3600)
+        self.assertNotIn("raw", self.session.calls[0][2])
+
+    def test_stream(self) -> None:
+        """A streamed raw response is an iterator of bytes"""
+
+        test = self.EnsEMBL.getSequenceById(id="ENSG00000157764", raw=True, stream=True)
+
+        self.assertIsInstance(test.content, Iterator)
+        self.assertEqual(b"".join(test.content), self.body.encode())  # type: ignore[arg-type]
+
+    def test_notCached(self) -> None:
+        """Raw responses are not cached"""
+
+        self.EnsEMBL.cache = MemoryCache()
+        self.EnsEMBL.getSequenceById(id="ENSG00000157764", raw=True)
+        test = self.EnsEMBL.getSequenceById(id="ENSG00000157764")
+
+        self.assertEqual(test["id"], "ENSG00000157764")
+        self.assertEqual(len(self.session.calls), 2)
+
+
+class AsyncEnsemblRestStreaming(unittest.IsolatedAsyncioTestCase):
+    """A class to test streamed responses with the asyncio client"""
+
+    async def test_closed(self) -> None:
+        """Retried and failed streamed responses are closed"""
+
+        responses = [
+            ClosedResponse(500, "{}"),
+            ClosedResponse(200, "[1, 2]"),
+            ClosedResponse(404, '{"error": "not found"}'),
+        ]
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        EnsEMBL.retry_policy = RetryPolicy(backoff=0)
+        session = FakeSession(
+            lambda method, url, params, data: responses[len(session.calls) - 1]
+        ).install(EnsEMBL)
+
+        test = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+        self.assertEqual([item async for item in test], [1, 2])
+
+        with self.assertRaises(EnsemblRestError):
+            await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+                species="human", region="7:1-0", feature="gene", stream=True
+            )
+
+        self.assertTrue(all(response.closed for response in responses))
+        EnsEMBL.close()
+
+    async def test_stream(self) -> None:
+        """A streamed response is an asynchronous iterator of its array elements"""
+
+        features = [{"id": "ENSG%011d" % i} for i in range(250)]
+        EnsEMBL = pyensemblrest.AsyncEnsemblRest(rate_limiter=TokenBucket(rate=1000))
+        FakeSession(
+            lambda method, url, params, data: FakeResponse(
+                headers={}, status_code=200, text=json.dumps(features)
+            )
+        ).install(EnsEMBL)
+
+        test = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human", region="7:140424943-140624564", feature="gene", stream=True
+        )
+
+        self.assertEqual([feature async for feature in test], features)
+
+        # undecoded, read as it comes
+        test = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            stream=True,
+            raw=True,
+        )
+
+        self.assertEqual(
+            b"".join([chunk async for chunk in test.content]),
+            json.dumps(features).encode(),
+        )
+
+        # written to a file
+        binary = io.BytesIO()
+        test = await EnsEMBL.getOverlapByRegion(  # type: ignore[attr-defined]
+            species="human",
+            region="7:140424943-140624564",
+            feature="gene",
+            stream_to=binary,
+        )
+
+        self.assertEqual(binary.getvalue(), json.dumps(features).encode())
+        self.assertEqual(test, len(binary.getvalue()))
+
+        EnsEMBL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()